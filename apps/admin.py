@@ -2,15 +2,23 @@ from django.contrib import admin
 from django.db.models import Avg, F
 from django.urls import reverse
 from django.utils.html import format_html
+from django.utils.timezone import now
+from django.utils.safestring import mark_safe
 
-from apps.models import Homework, Submission, SubmissionFile, Grade
+from apps.grading import enqueue_grading
+from apps.highlight import render_file, stylesheet
+from apps.leaderboard import refresh_for_grades
+from apps.models import Homework, Submission, SubmissionFile, Grade, LeaderboardEntry, StoredBlob, ProcessingTask, \
+    GradingJob
+from apps.versions import bump_group_version
 
 
 class SubmissionFileInline(admin.TabularInline):
     model = SubmissionFile
     extra = 0
-    readonly_fields = ('file_name', 'line_count')
-    fields = ('file_name', 'content', 'line_count')
+    # kontent blob manzili (sha256) bilan bog'liq, almashtirilmaydi
+    readonly_fields = ('file_name', 'content', 'line_count', 'size_bytes')
+    fields = ('file_name', 'content', 'line_count', 'size_bytes')
 
     def has_add_permission(self, request, obj=None):
         return False
@@ -237,20 +245,53 @@ class SubmissionAdmin(admin.ModelAdmin):
     actions = ['regrade_with_ai', 'mark_as_final']
 
     def regrade_with_ai(self, request, queryset):
-        # Bu yerda AI qayta baholash logikasi bo'lishi kerak
-        self.message_user(request, f"{queryset.count()} ta topshiriq AI bilan qayta baholandi.")
+        # baholash grading_worker'da bajariladi, bu yerda faqat navbatga qo'yiladi
+        queued = enqueue_grading(queryset.values_list('id', flat=True), use_cache=False, regrade=True)
+        self.message_user(request, f"{queued} ta topshiriq AI bilan qayta baholash navbatiga qo'yildi.")
 
     regrade_with_ai.short_description = "AI bilan qayta baholash"
 
     def mark_as_final(self, request, queryset):
-        updated = queryset.filter(ai_grade__isnull=False, final_grade__isnull=True).update(
-            final_grade=F('ai_grade')
-        )
+        queryset = queryset.filter(ai_grade__isnull=False, final_grade__isnull=True)
+        group_ids = set(queryset.values_list('homework__group_id', flat=True))
+        updated = queryset.update(final_grade=F('ai_grade'))
+        for group_id in group_ids:
+            bump_group_version(group_id)
         self.message_user(request, f"{updated} ta topshiriq final bahosi belgilandi.")
 
     mark_as_final.short_description = "AI bahosini final qilib belgilash"
 
 
+class FileSizeFilter(admin.SimpleListFilter):
+    title = 'Fayl hajmi'
+    parameter_name = 'size'
+    ranges = {
+        'tiny': ('< 1 KB', 0, 1024),
+        'small': ('1 KB - 100 KB', 1024, 100 * 1024),
+        'medium': ('100 KB - 1 MB', 100 * 1024, 1024 * 1024),
+        'large': ('> 1 MB', 1024 * 1024, None),
+    }
+
+    def lookups(self, request, model_admin):
+        return [(key, label) for key, (label, _, _) in self.ranges.items()]
+
+    def queryset(self, request, queryset):
+        if self.value() not in self.ranges:
+            return queryset
+        _, low, high = self.ranges[self.value()]
+        queryset = queryset.filter(size_bytes__gte=low)
+        return queryset.filter(size_bytes__lt=high) if high else queryset
+
+
+def human_size(size):
+    if size < 1024:
+        return f"{size} B"
+    elif size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    else:
+        return f"{size / (1024 * 1024):.1f} MB"
+
+
 @admin.register(SubmissionFile)
 class SubmissionFileAdmin(admin.ModelAdmin):
     list_display = (
@@ -262,32 +303,40 @@ class SubmissionFileAdmin(admin.ModelAdmin):
     list_filter = (
         'submission__homework__teacher',
         'submission__homework__group',
-        'line_count'
+        'line_count',
+        FileSizeFilter
     )
     search_fields = (
         'file_name',
-        'submission__student__username',
+        'sha256',
+        'submission__student__full_name',
         'submission__homework__title'
     )
     ordering = ('submission', 'file_name')
+    list_select_related = ('submission__homework', 'submission__student')
+
+    readonly_fields = ('content', 'line_count', 'file_size_info', 'sha256', 'code_preview')
 
-    readonly_fields = ('line_count', 'file_size_info')
+    def code_preview(self, obj):
+        try:
+            html = render_file(obj)['html']
+        except OSError:
+            return '-'
+        return format_html('<style>{}</style>{}', mark_safe(stylesheet()), mark_safe(html))
+
+    code_preview.short_description = 'Kod'
 
     def submission_info(self, obj):
-        return f"{obj.submission.homework.title} - {obj.submission.student.username}"
+        return f"{obj.submission.homework.title} - {obj.submission.student.full_name}"
 
     submission_info.short_description = 'Topshiriq ma\'lumoti'
 
     def file_size_info(self, obj):
-        size = len(obj.content.encode('utf-8'))
-        if size < 1024:
-            return f"{size} B"
-        elif size < 1024 * 1024:
-            return f"{size / 1024:.1f} KB"
-        else:
-            return f"{size / (1024 * 1024):.1f} MB"
+        # diskdagi faylni ochmaydi: hajm yuklash paytida saqlangan
+        return human_size(obj.size_bytes)
 
     file_size_info.short_description = 'Fayl hajmi'
+    file_size_info.admin_order_field = 'size_bytes'
 
 
 @admin.register(Grade)
@@ -422,11 +471,81 @@ class GradeAdmin(admin.ModelAdmin):
             final_correctness=None,
             modified_by_teacher=None
         )
+        # update() signal yubormaydi, reytingni qo'lda yangilaymiz
+        refresh_for_grades(queryset)
         self.message_user(request, f"{updated} ta o'qituvchi bahosi tozalandi.")
 
     reset_teacher_grades.short_description = "O'qituvchi baholarini tozalash"
 
 
+@admin.register(LeaderboardEntry)
+class LeaderboardEntryAdmin(admin.ModelAdmin):
+    list_display = ('rank', 'student', 'group', 'total_points', 'graded_count', 'updated_at')
+    list_filter = ('group',)
+    search_fields = ('student__full_name', 'student__phone', 'group__name')
+    ordering = ('group', 'rank')
+    readonly_fields = ('student', 'group', 'total_points', 'graded_count', 'rank', 'updated_at')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'size_bytes', 'ref_count', 'created_at', 'updated_at')
+    search_fields = ('sha256',)
+    ordering = ('-updated_at',)
+    readonly_fields = ('sha256', 'size_bytes', 'ref_count', 'created_at', 'updated_at')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ProcessingTask)
+class ProcessingTaskAdmin(admin.ModelAdmin):
+    list_display = ('stage', 'file', 'status', 'attempts', 'duration_ms', 'available_at', 'finished_at')
+    list_filter = ('stage', 'status')
+    search_fields = ('file__file_name', 'last_error')
+    ordering = ('-created_at',)
+    readonly_fields = ('file', 'stage', 'attempts', 'started_at', 'finished_at', 'duration_ms', 'last_error',
+                       'created_at')
+    actions = ['retry_tasks']
+
+    def retry_tasks(self, request, queryset):
+        updated = queryset.exclude(status=ProcessingTask.Status.RUNNING).update(
+            status=ProcessingTask.Status.PENDING, available_at=now(), attempts=0)
+        self.message_user(request, f"{updated} ta vazifa qayta navbatga qo'yildi.")
+
+    retry_tasks.short_description = "Qayta ishga tushirish"
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(GradingJob)
+class GradingJobAdmin(admin.ModelAdmin):
+    list_display = ('submission', 'group', 'status', 'regrade', 'attempts', 'duration_ms', 'available_at',
+                    'finished_at')
+    list_filter = ('status', 'regrade', 'group')
+    search_fields = ('submission__student__full_name', 'last_error')
+    ordering = ('-created_at',)
+    list_select_related = ('submission__student', 'group')
+    readonly_fields = ('submission', 'group', 'teacher', 'sort_key', 'attempts', 'started_at', 'finished_at',
+                       'duration_ms', 'last_error', 'created_at')
+    actions = ['retry_jobs']
+
+    def retry_jobs(self, request, queryset):
+        # ochiq vazifasi bor topshiriq uchun ikkinchisi ochilmaydi
+        queued = enqueue_grading(queryset.exclude(status__in=(GradingJob.Status.PENDING, GradingJob.Status.RUNNING))
+                                 .values_list('submission_id', flat=True))
+        self.message_user(request, f"{queued} ta topshiriq qayta navbatga qo'yildi.")
+
+    retry_jobs.short_description = "Qayta baholash"
+
+    def has_add_permission(self, request):
+        return False
+
+
 admin.site.site_header = "Homework Management System"
 admin.site.site_title = "HMS Admin"
 admin.site.index_title = "Boshqaruv Paneli"
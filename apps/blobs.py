@@ -0,0 +1,143 @@
+from collections import Counter
+from datetime import timedelta
+from hashlib import sha256
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils.timezone import now as current_time
+
+from apps.models import StoredBlob, SubmissionFile
+from apps.storage import submission_storage, blob_name, BLOB_PREFIX
+
+
+def _by_increment(counts):
+    # bir xil sondagi hashlar bitta UPDATE bilan yangilanadi
+    groups = {}
+    for digest, count in counts.items():
+        groups.setdefault(count, []).append(digest)
+    return groups.items()
+
+
+def is_blob(file):
+    # eski yuklamalar cas/ ostida emas, ular hisoblagichga kirmaydi
+    return bool(file.sha256) and file.content.name == blob_name(file.sha256)
+
+
+def retain_blobs(files):
+    """``files`` are ``(sha256, size_bytes)`` pairs, one per new SubmissionFile row."""
+    files = [(digest, size) for digest, size in files if digest]
+    if not files:
+        return
+    sizes = dict(files)
+    StoredBlob.objects.bulk_create([StoredBlob(sha256=digest, size_bytes=size) for digest, size in sizes.items()],
+                                   ignore_conflicts=True)
+    for count, digests in _by_increment(Counter(digest for digest, _ in files)):
+        StoredBlob.objects.filter(sha256__in=digests).update(ref_count=F('ref_count') + count,
+                                                             updated_at=current_time())
+
+
+def restore_blobs(files):
+    """
+    ``files`` are ``(sha256, file)`` pairs already counted by ``retain_blobs``. An upload that found
+    its blob on disk may have lost it to ``collect_garbage`` before counting it; such blobs are
+    written again. Once counted, the blob is safe: GC only deletes rows it removes with ref_count=0.
+    """
+    for digest, file in files:
+        name = blob_name(digest)
+        if digest and not submission_storage.exists(name):
+            file.seek(0)
+            submission_storage.save(name, file)
+
+
+def release_blobs(digests):
+    counts = Counter(digest for digest in digests if digest)
+    for count, group in _by_increment(counts):
+        StoredBlob.objects.filter(sha256__in=group).update(ref_count=Greatest(F('ref_count') - count, Value(0)),
+                                                           updated_at=current_time())
+
+
+def _stored_files():
+    if not submission_storage.exists(BLOB_PREFIX):
+        return
+    for directory in submission_storage.listdir(BLOB_PREFIX)[0]:
+        for name in submission_storage.listdir(f'{BLOB_PREFIX}/{directory}')[1]:
+            yield name
+
+
+def collect_garbage(grace=timedelta(hours=1), dry_run=False):
+    """
+    Deletes blobs nobody references any more, plus files under ``cas/`` that never got
+    a StoredBlob row (interrupted uploads). Anything touched within ``grace`` is kept so
+    an upload that is reusing a blob right now is not raced.
+    """
+    cutoff = current_time() - grace
+    deleted, freed = 0, 0
+    unused = StoredBlob.objects.filter(ref_count=0, updated_at__lt=cutoff).values_list('sha256', 'size_bytes')
+    for digest, size in unused.iterator():
+        if not dry_run:
+            # qator o'chirilib fayl o'chguncha tranzaksiya ochiq: shu blobni hisoblayotgan yuklash kutib turadi
+            with transaction.atomic():
+                if not StoredBlob.objects.filter(sha256=digest, ref_count=0).delete()[0]:
+                    continue
+                submission_storage.delete(blob_name(digest))
+        deleted, freed = deleted + 1, freed + size
+
+    for digest in _stored_files():
+        name = blob_name(digest)
+        if submission_storage.get_modified_time(name) >= cutoff or StoredBlob.objects.filter(sha256=digest).exists():
+            continue
+        size = submission_storage.size(name)
+        if not dry_run:
+            submission_storage.delete(name)
+        deleted, freed = deleted + 1, freed + size
+    return deleted, freed
+
+
+def _measure(name):
+    digest, size = sha256(), 0
+    with submission_storage.open(name) as source:
+        for chunk in source.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _relocate(file):
+    name = blob_name(file.sha256)
+    if not submission_storage.exists(name):
+        with submission_storage.open(file.content.name) as source:
+            submission_storage.save(name, source)
+    old_name, file.content.name = file.content.name, name
+    return old_name
+
+
+def backfill_file_metadata(chunk_size=500, start_after=0, relocate=False):
+    """
+    Fills sha256/size_bytes for rows uploaded before they were recorded, streaming each
+    file once. With ``relocate`` the file is also moved into content-addressed storage.
+    Yields ``(last_id, processed, updated, missing)`` per chunk so a run can be resumed.
+    """
+    files = SubmissionFile.objects.filter(sha256='').order_by('pk').only('id', 'content', 'sha256', 'size_bytes')
+    last_id = start_after
+    while chunk := list(files.filter(pk__gt=last_id)[:chunk_size]):
+        updated, moved, missing = [], [], 0
+        for file in chunk:
+            try:
+                file.sha256, file.size_bytes = _measure(file.content.name)
+                if relocate:
+                    moved.append((file.sha256, _relocate(file)))
+            except (OSError, ValueError):
+                missing += 1
+                continue
+            updated.append(file)
+        SubmissionFile.objects.bulk_update(updated, ['sha256', 'size_bytes', 'content'], batch_size=chunk_size)
+        retain_blobs([(file.sha256, file.size_bytes) for file in updated if is_blob(file)])
+        for digest, name in moved:
+            if not submission_storage.exists(blob_name(digest)):
+                with submission_storage.open(name) as source:
+                    restore_blobs([(digest, source)])
+            if not SubmissionFile.objects.filter(content=name).exists():
+                submission_storage.delete(name)
+        last_id = chunk[-1].pk
+        yield last_id, len(chunk), len(updated), missing
@@ -0,0 +1,86 @@
+import re
+import zipfile
+from collections import deque
+
+from django.db import connection
+from django.utils.timezone import localtime
+
+from apps.models import SubmissionFile
+from apps.storage import submission_storage
+
+UNSAFE = re.compile(r'[\\/:*?"<>|\x00-\x1f]+')
+
+
+class ChunkSink:
+    """Write-only file for ZipFile: no tell/seek, so zipfile writes data descriptors and never rewinds."""
+
+    def __init__(self):
+        self.chunks = deque()
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        while self.chunks:
+            yield self.chunks.popleft()
+
+
+def safe_name(value):
+    return UNSAFE.sub('_', str(value)).strip(' .') or '_'
+
+
+def submission_manifest(files, with_homework=False):
+    """
+    Everything the archive needs, read up front in one query so the transfer itself
+    never touches the database: ``(arcname, blob name, size, modified)`` per file.
+    """
+    rows = files.order_by('submission__homework_id', 'submission__student__full_name', 'submission_id', 'id')
+    manifest = []
+    for row in rows.values_list('submission__homework_id', 'submission__homework__title', 'submission__student_id',
+                                'submission__student__full_name', 'submission_id', 'submission__created_at',
+                                'file_name', 'content', 'size_bytes').iterator():
+        homework_id, title, student_id, full_name, submission_id, created_at, file_name, content, size = row
+        parts = [f'{safe_name(full_name)} ({student_id})', f'submission-{submission_id}',
+                 *[safe_name(part) for part in file_name.replace('\\', '/').split('/') if part not in ('', '.', '..')]]
+        if with_homework:
+            parts.insert(0, f'{safe_name(title)} ({homework_id})')
+        manifest.append(('/'.join(parts), content, size, localtime(created_at)))
+    return manifest
+
+
+def release_connection():
+    # uzatish davomida gunicorn workerining DB ulanishi band turmasin
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+def stream_zip(manifest, chunk_size=64 * 1024):
+    """Yields the ZIP piece by piece; only one chunk of one member is in memory at a time."""
+    sink = ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for arcname, name, size, modified in manifest:
+            info = zipfile.ZipInfo(arcname, date_time=modified.timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.file_size = size
+            try:
+                source = submission_storage.open(name)
+            except FileNotFoundError:
+                continue
+            with source, archive.open(info, 'w', force_zip64=size > zipfile.ZIP64_LIMIT) as target:
+                for chunk in source.chunks(chunk_size):
+                    target.write(chunk)
+                    yield from sink.drain()
+            yield from sink.drain()
+    yield from sink.drain()
+
+
+def homework_files(homework_id):
+    return SubmissionFile.objects.filter(submission__homework_id=homework_id)
+
+
+def group_files(group_id):
+    return SubmissionFile.objects.filter(submission__homework__group_id=group_id)
@@ -0,0 +1,10 @@
+from apps.grading.errors import *
+from apps.grading.prompts import *
+from apps.grading.backends import *
+from apps.grading.cache import *
+from apps.grading.batching import *
+from apps.grading.scheduling import *
+from apps.grading.streaming import *
+from apps.grading.jobs import *
+from apps.grading.worker import *
+from apps.grading.benchmark import *
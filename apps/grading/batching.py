@@ -0,0 +1,46 @@
+from apps.grading.prompts import BATCH_SYSTEM_PROMPT
+
+__all__ = ('estimate_tokens', 'pack_batches')
+
+CHARS_PER_TOKEN = 4
+# fayl sarlavhasi ("--- name ---") va "=== Submission id ===" qatori
+FILE_OVERHEAD = 8
+SUBMISSION_OVERHEAD = 12
+# eski yozuvlarda size_bytes yo'q
+AVERAGE_LINE_BYTES = 40
+
+
+def _tokens(chars):
+    return -(-chars // CHARS_PER_TOKEN)
+
+
+def estimate_tokens(submission, response_tokens=0):
+    """
+    Prompt size of one submission from ``line_count``/``size_bytes`` alone (nothing is read).
+    Code has many short tokens, so every line adds one on top of bytes / 4.
+    """
+    tokens = SUBMISSION_OVERHEAD + response_tokens
+    for file in submission.files.all():
+        size = file.size_bytes or file.line_count * AVERAGE_LINE_BYTES
+        tokens += FILE_OVERHEAD + _tokens(size) + file.line_count
+    return tokens
+
+
+def pack_batches(entries, max_submissions, max_tokens, response_tokens=0):
+    """
+    Greedy, in claim order: ``entries`` are ``(job, request, ...)``; each batch holds
+    submissions of one homework whose estimated prompt (task text once + every submission)
+    fits ``max_tokens``. A submission too big for the budget still goes alone.
+    """
+    batches, open_batches = [], {}
+    for entry in entries:
+        job, request = entry[0], entry[1]
+        tokens = estimate_tokens(job.submission, response_tokens)
+        batch = open_batches.get(request.homework_id)
+        if batch is None or len(batch[1]) >= max_submissions or batch[0] + tokens > max_tokens:
+            base = _tokens(len(BATCH_SYSTEM_PROMPT) + len(request.instructions))
+            batch = open_batches[request.homework_id] = [base, []]
+            batches.append(batch[1])
+        batch[0] += tokens
+        batch[1].append(entry)
+    return batches
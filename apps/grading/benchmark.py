@@ -0,0 +1,330 @@
+import json
+import math
+import random
+import re
+import time
+from collections import Counter
+from datetime import timedelta
+from hashlib import sha256
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread, Lock
+from time import perf_counter, monotonic
+from uuid import uuid4
+
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils.timezone import now as current_time
+
+from apps.blobs import retain_blobs
+from apps.grading.backends import OpenAIGradingBackend
+from apps.grading.jobs import grading_config, enqueue_grading
+from apps.grading.prompts import SCORE_FIELDS, BATCH_SYSTEM_PROMPT, SCORES_MARKER
+from apps.grading.worker import GradingWorker
+from apps.models import GradingJob, Homework, Submission, SubmissionFile
+from apps.storage import submission_storage, blob_name
+from authenticate.models import Group, User
+
+__all__ = ('FakeModelServer', 'create_benchmark_homework', 'delete_benchmark_homework', 'run_benchmark',
+           'percentiles')
+
+Status = GradingJob.Status
+OPEN = (Status.PENDING, Status.RUNNING)
+_SUBMISSION = re.compile(r'^=== Submission (\d+) ===$', re.MULTILINE)
+
+
+class FakeModelServer:
+    """
+    OpenAI-compatible ``/chat/completions`` on 127.0.0.1 for benchmarks and tests: no network,
+    no API key. Every call waits ``latency`` plus up to ``jitter`` seconds; ``error_rate`` of the
+    calls answer 500 and more than ``rate_limit`` calls per second answer 429 with Retry-After,
+    like a real provider. Batched and streamed requests are answered in the format the
+    grading prompts ask for, with deterministic scores.
+    """
+
+    def __init__(self, latency=0.5, jitter=0.0, error_rate=0.0, rate_limit=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.stats = Counter()
+        self._random = random.Random(seed)
+        self._lock = Lock()
+        self._tokens = rate_limit or 0
+        self._refilled = monotonic()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.model = self
+        Thread(target=self._server.serve_forever, name='fake-model', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def admit(self):
+        """``(status, retry_after)``: 200, 429 (over the rate limit) or 500 (simulated failure)."""
+        with self._lock:
+            self.stats['requests'] += 1
+            if self.rate_limit:
+                # token bucket: sekundiga rate_limit ta so'rov, ko'pi bilan bir sekundlik zaxira
+                now = monotonic()
+                self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+                self._refilled = now
+                if self._tokens < 1:
+                    self.stats['rate_limited'] += 1
+                    return 429, math.ceil((1 - self._tokens) / self.rate_limit * 100) / 100
+                self._tokens -= 1
+            if self._random.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return 500, None
+            return 200, None
+
+    def delay(self):
+        with self._lock:
+            return self.latency + self._random.random() * self.jitter
+
+    def _scores(self, text):
+        digest = sha256(text.encode()).digest()
+        return {field: 50 + digest[i] % 51 for i, field in enumerate(SCORE_FIELDS)}
+
+    def reply(self, system, user):
+        if system == BATCH_SYSTEM_PROMPT:
+            sections = _SUBMISSION.split(user)
+            results = [{'submission': int(submission_id), **self._scores(text), 'feedback': 'Yaxshi ish.'}
+                       for submission_id, text in zip(sections[1::2], sections[2::2])]
+            return json.dumps({'results': results})
+        return json.dumps({**self._scores(user), 'feedback': 'Yaxshi ish.'})
+
+    def stream_reply(self, user):
+        feedback = 'Yaxshi ish, lekin chegaraviy holatlar tekshirilmagan.'
+        return f'{feedback}\n{SCORES_MARKER} {json.dumps(self._scores(user))}'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, payload, headers=()):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        model = self.server.model
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            messages = payload['messages']
+        except (ValueError, KeyError, TypeError):
+            return self._json(400, {'error': {'message': 'Invalid request'}})
+        status, retry_after = model.admit()
+        if status == 429:
+            return self._json(429, {'error': {'message': 'Rate limit reached'}}, [('Retry-After', str(retry_after))])
+        delay = model.delay()
+        if status == 500:
+            time.sleep(delay)
+            return self._json(500, {'error': {'message': 'Simulated failure'}})
+        system, user = messages[0]['content'], messages[-1]['content']
+        if payload.get('stream'):
+            return self._stream(model.stream_reply(user), delay)
+        time.sleep(delay)
+        self._json(200, {'choices': [{'message': {'role': 'assistant', 'content': model.reply(system, user)}}]})
+
+    def _stream(self, text, delay):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        words = text.split(' ')
+        for number, word in enumerate(words):
+            time.sleep(delay / len(words))
+            delta = {'choices': [{'delta': {'content': word if number == 0 else f' {word}'}}]}
+            self.wfile.write(f'data: {json.dumps(delta)}\n\n'.encode())
+            self.wfile.flush()
+        self.wfile.write(b'data: [DONE]\n\n')
+
+
+def _source(rng, lines):
+    names = ('total', 'count', 'items', 'result', 'value', 'index')
+    body = [f'def solve_{rng.randrange(10_000)}(data):', *(f'    {name} = 0' for name in names)]
+    while len(body) < lines - 1:
+        name = rng.choice(names)
+        body.append(rng.choice((f'    {name} = {name} + {rng.randrange(100)}',
+                                f'    print({name}, {rng.randrange(1000)})',
+                                f'    data = [item * {rng.randrange(2, 9)} for item in data if item > {name}]')))
+    body.append('    return data')
+    return '\n'.join(body) + '\n'
+
+
+def create_benchmark_homework(count, files=1, lines=40, duplicates=0.0, seed=None):
+    """
+    A throwaway teacher, group and homework with ``count`` synthetic submissions (one student
+    each). ``duplicates`` of them copy an earlier submission, so the grading cache has
+    something to find. Files are stored like a bulk upload; post-upload analysis is skipped.
+    """
+    rng = random.Random(seed)
+    tag = uuid4().hex[:8]
+    teacher = User.objects.create(full_name='Benchmark teacher', phone=f'b{tag}t', role=User.RoleType.Teacher)
+    group = Group.objects.create(name=f'benchmark-{tag}', teacher=teacher)
+    homework = Homework.objects.create(
+        title=f'Benchmark {tag}', description='Sonlar ro\'yxatini qayta ishlovchi funksiya yozing.', points=100,
+        start_date=current_time().date(), deadline=current_time() + timedelta(days=7), line_limit=lines * 2,
+        teacher=teacher, group=group, file_extensions=Homework.FileType.PYTHON,
+        ai_grading_prompt='Funksiya to\'g\'riligi va kod sifatini baholang.')
+    students = User.objects.bulk_create([
+        User(full_name=f'Benchmark student {number}', phone=f'b{tag}{number:07d}', group=group)
+        for number in range(count)
+    ])
+
+    contents = []
+    for number in range(count):
+        if contents and rng.random() < duplicates:
+            contents.append(rng.choice(contents))
+        else:
+            contents.append([_source(rng, lines).encode() for _ in range(files)])
+    digests = {data: sha256(data).hexdigest() for submission in contents for data in submission}
+
+    with transaction.atomic():
+        submissions = Submission.objects.bulk_create([Submission(homework=homework, student=student)
+                                                      for student in students])
+        rows = SubmissionFile.objects.bulk_create([
+            SubmissionFile(submission=submission, file_name=f'solution_{index}.py', content=blob_name(digests[data]),
+                           line_count=data.count(b'\n'), sha256=digests[data], size_bytes=len(data))
+            for submission, files_data in zip(submissions, contents) for index, data in enumerate(files_data)
+        ])
+        # yuklash kabi: avval hisoblanadi, keyin yoziladi
+        retain_blobs([(row.sha256, row.size_bytes) for row in rows])
+        for data, digest in digests.items():
+            submission_storage.save(blob_name(digest), ContentFile(data))
+    return homework
+
+
+def delete_benchmark_homework(homework):
+    """Removes what ``create_benchmark_homework`` made; unreferenced blobs are left to gc_blobs."""
+    group, teacher_id = homework.group, homework.teacher_id
+    User.objects.filter(group=group).delete()
+    group.delete()
+    User.objects.filter(pk=teacher_id).delete()
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """Nearest-rank percentiles; ``None`` for an empty sample."""
+    values = sorted(values)
+    if not values:
+        return {point: None for point in points}
+    return {point: values[max(math.ceil(point / 100 * len(values)), 1) - 1] for point in points}
+
+
+class _TimedWorker(GradingWorker):
+    """Records how long saving each result (grade, submission, job row and their signals) takes."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.db_writes = []
+        self.flush_seconds = 0.0
+
+    def _finish(self, *args, **kwargs):
+        started = perf_counter()
+        super()._finish(*args, **kwargs)
+        self.db_writes.append(perf_counter() - started)
+
+    def _flush(self):
+        started = perf_counter()
+        super()._flush()
+        self.flush_seconds += perf_counter() - started
+
+
+def _drive(worker, jobs, deadline, threaded):
+    # run(once=True) qaytadi, agar hozir navbat bo'sh bo'lsa - qayta urinishlar available_at'ni kutadi
+    try:
+        while monotonic() < deadline and jobs.filter(status__in=OPEN).exists():
+            worker.run(once=True, idle=0.05)
+            time.sleep(0.05)
+    finally:
+        if threaded:
+            connection.close()
+
+
+def run_benchmark(homework, server, workers=1, concurrency=None, batch=None, stream=None, retry_delay=None,
+                  use_cache=False, timeout=600):
+    """
+    Queues every submission of ``homework`` at once (an exam deadline burst) and grades them
+    with ``workers`` GradingWorkers talking to ``server`` over HTTP. ``batch``, ``stream`` and
+    ``retry_delay`` override AI_GRADING for this run only.
+
+    The workers claim from the shared queue, so anything else queued would be sent to the
+    fake model too: run it on an empty queue with no grading_worker service running.
+    """
+    jobs = GradingJob.objects.filter(submission__homework=homework)
+    enqueue_grading(homework.submissions.values_list('id', flat=True), use_cache=use_cache)
+
+    config = grading_config()
+    stream = config['STREAM'] if stream is None else stream
+    batch = batch or config['BATCH']['MAX_SUBMISSIONS']
+    backend = OpenAIGradingBackend(url=server.url, model='benchmark', timeout=max(30, server.latency * 10))
+    pool = []
+    for _ in range(workers):
+        worker = _TimedWorker(backend=backend, concurrency=concurrency)
+        worker.stream = stream
+        worker.batch_size = 1 if stream else batch
+        if retry_delay is not None:
+            worker.retry_delay = retry_delay
+        pool.append(worker)
+
+    deadline = monotonic() + timeout
+    started = perf_counter()
+    if workers == 1:
+        # bitta worker shu oqimda: test tranzaksiyasi va SQLite ulanishi o'zgarmaydi
+        _drive(pool[0], jobs, deadline, threaded=False)
+    else:
+        threads = [Thread(target=_drive, args=(worker, jobs, deadline, True), name=f'benchmark-{number}')
+                   for number, worker in enumerate(pool)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = perf_counter() - started
+
+    rows = list(jobs.values_list('status', 'created_at', 'started_at', 'finished_at', 'duration_ms', 'cache_hit'))
+    done = [row for row in rows if row[0] == Status.DONE]
+    stats = sum((worker.stats for worker in pool), Counter())
+    db_writes = [seconds for worker in pool for seconds in worker.db_writes]
+    return {
+        'submissions': len(rows),
+        'workers': workers,
+        'concurrency': pool[0].concurrency,
+        'batch': pool[0].batch_size,
+        'stream': bool(pool[0].stream),
+        'seconds': wall,
+        'done': len(done),
+        'failed': sum(row[0] == Status.FAILED for row in rows),
+        'unfinished': sum(row[0] in OPEN for row in rows),
+        'retried': stats['retried'],
+        'batched': stats['batched'],
+        'cache_hits': stats['cache_hits'],
+        'throughput': len(done) / wall if wall else 0.0,
+        # navbatga qo'yilgandan baho saqlangunicha
+        'latency': percentiles([(finished - created).total_seconds() for _, created, _, finished, _, _ in done]),
+        'model': percentiles([duration / 1000 for *_, duration, cache_hit in done if not cache_hit]),
+        'queue_wait': percentiles([(started_at - created).total_seconds() for _, created, started_at, *_ in done]),
+        'db_write': percentiles(db_writes),
+        'db_seconds': sum(db_writes) + sum(worker.flush_seconds for worker in pool),
+        'server': dict(server.stats),
+    }
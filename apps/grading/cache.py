@@ -0,0 +1,47 @@
+import json
+import re
+from hashlib import sha256
+
+from django.core.cache import caches
+
+from apps.grading.jobs import grading_config
+from apps.grading.prompts import SYSTEM_PROMPT
+
+__all__ = ('cache_enabled', 'grading_key', 'cached_result', 'cache_result')
+
+_SPACES = re.compile(r'\s+')
+
+
+def cache_enabled():
+    return bool(grading_config()['CACHE'])
+
+
+def _cache():
+    alias = grading_config()['CACHE']
+    return caches[alias] if alias else None
+
+
+def _normalize(text):
+    return _SPACES.sub(' ', text).strip()
+
+
+def grading_key(request, backend):
+    """
+    Same rubric + same file contents + same model = same key. File names and order do not
+    matter, so a resubmission of identical files (or a copy of a templated homework) hits.
+    """
+    files = sorted(sha256(text.encode()).hexdigest() for _, text in request.files)
+    model = f"{type(backend).__name__}:{getattr(backend, 'model', '')}"
+    payload = json.dumps([model, _normalize(SYSTEM_PROMPT), _normalize(request.instructions), files])
+    return 'grade:' + sha256(payload.encode()).hexdigest()
+
+
+def cached_result(key):
+    cache = _cache()
+    return cache.get(key) if cache is not None else None
+
+
+def cache_result(key, result):
+    cache = _cache()
+    if cache is not None:
+        cache.set(key, result)
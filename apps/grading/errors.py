@@ -0,0 +1,13 @@
+__all__ = ('GradingError', 'RetryableGradingError')
+
+
+class GradingError(Exception):
+    """The model answered but the answer cannot be used; retrying the same request will not help."""
+
+
+class RetryableGradingError(GradingError):
+    """Rate limit, timeout or server error: the job is retried later."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
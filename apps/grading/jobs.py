@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Avg, Q
+from django.utils.timezone import now as current_time
+
+from apps import queue
+from apps.grading.prompts import score_total
+from apps.grading.scheduling import scheduling_config, sort_key, pick_jobs, queue_stats
+from apps.models import GradingJob, Grade, Submission
+
+__all__ = ('grading_config', 'enqueue_grading', 'claim_jobs', 'requeue_stale_jobs', 'save_result', 'grading_stats')
+
+Status = GradingJob.Status
+OPEN = (Status.PENDING, Status.RUNNING)
+
+
+BATCH_DEFAULTS = {'MAX_SUBMISSIONS': 8, 'MAX_TOKENS': 12_000, 'RESPONSE_TOKENS': 300}
+
+
+def grading_config():
+    config = {
+        'CONCURRENCY': 8,
+        'MAX_ATTEMPTS': 5,
+        'RETRY_DELAY': 10,
+        'STALE_AFTER': 900,
+        'AUTO_ENQUEUE': False,
+        'CACHE': 'grading',
+        'STREAM': False,
+        'STREAM_FLUSH_INTERVAL': 0.3,
+        **getattr(settings, 'AI_GRADING', {}),
+    }
+    config['BATCH'] = {**BATCH_DEFAULTS, **config.get('BATCH', {})}
+    return config
+
+
+def enqueue_grading(submission_ids, use_cache=True, regrade=False):
+    """
+    Queues each submission once: one that already has an open job is left alone. Returns how many were queued.
+    ``use_cache=False`` asks the model again even if identical content was graded before; ``regrade``
+    (a teacher asked for it) moves the submission ahead in the queue, including an already pending job.
+    """
+    submission_ids = set(submission_ids)
+    config = scheduling_config()
+    open_jobs = GradingJob.objects.filter(submission_id__in=submission_ids, status__in=OPEN)
+    queued = set(open_jobs.values_list('submission_id', flat=True))
+    if regrade:
+        waiting = list(open_jobs.filter(status=Status.PENDING, regrade=False).select_related('submission__homework'))
+        for job in waiting:
+            job.regrade, job.use_cache = True, job.use_cache and use_cache
+            job.sort_key = sort_key(job.submission.homework.deadline, job.submission.submitted_at, True, config)
+        GradingJob.objects.bulk_update(waiting, ['regrade', 'use_cache', 'sort_key'])
+
+    now = current_time()
+    submissions = Submission.objects.filter(pk__in=submission_ids - queued).select_related('homework').only(
+        'id', 'submitted_at', 'homework__deadline', 'homework__group_id', 'homework__teacher_id')
+    jobs = [GradingJob(submission=submission, group_id=submission.homework.group_id,
+                       teacher_id=submission.homework.teacher_id, available_at=now, use_cache=use_cache,
+                       regrade=regrade, sort_key=sort_key(submission.homework.deadline, submission.submitted_at,
+                                                          regrade, config))
+            for submission in submissions]
+    GradingJob.objects.bulk_create(jobs, ignore_conflicts=True)
+    return len(jobs)
+
+
+def claim_jobs(limit, now=None):
+    now = now or current_time()
+    claimed = queue.claim_ids(GradingJob, pick_jobs(limit, now), now, Status.PENDING, Status.RUNNING)
+    return list(GradingJob.objects.filter(pk__in=claimed).select_related('submission__homework')
+                .prefetch_related('submission__files'))
+
+
+def requeue_stale_jobs(now=None):
+    config = grading_config()
+    return queue.requeue_stale(GradingJob.objects.all(), now or current_time(), config['STALE_AFTER'],
+                               Status.PENDING, Status.RUNNING, Status.FAILED, config['MAX_ATTEMPTS'])
+
+
+def save_result(submission, result):
+    """The newest Grade gets the AI scores (teacher fields are kept); the Submission mirrors the total."""
+    total = score_total(result)
+    values = {
+        'ai_task_completeness': result['task_completeness'],
+        'ai_code_quality': result['code_quality'],
+        'ai_correctness': result['correctness'],
+        'ai_total': total,
+        'ai_feedback': result['feedback'],
+    }
+    with transaction.atomic():
+        grade = submission.grades.order_by('-created_at', '-id').first() or Grade(submission=submission)
+        for field, value in values.items():
+            setattr(grade, field, value)
+        grade.save()
+        submission.ai_grade = round(total)
+        submission.ai_feedback = result['feedback']
+        submission.save(update_fields=['ai_grade', 'ai_feedback'])
+    return grade
+
+
+def grading_stats():
+    row = GradingJob.objects.aggregate(
+        total=Count('id'),
+        **{status: Count('id', filter=Q(status=status)) for status in Status.values},
+        avg_ms=Avg('duration_ms', filter=Q(status=Status.DONE, cache_hit=False)),
+        cache_hits=Count('id', filter=Q(status=Status.DONE, cache_hit=True)),
+        cache_misses=Count('id', filter=Q(status=Status.DONE, cache_hit=False)),
+    )
+    # keshdan olingan har bir baho - o'rtacha bitta model so'rovi tejaldi
+    row['saved_ms'] = round(row['cache_hits'] * (row['avg_ms'] or 0))
+    row['groups'] = queue_stats()
+    return row
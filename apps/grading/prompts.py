@@ -0,0 +1,184 @@
+import json
+import re
+from collections import namedtuple
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+
+from apps.grading.errors import GradingError
+
+__all__ = ('GradingRequest', 'SCORE_FIELDS', 'build_request', 'build_messages', 'parse_result', 'score_total',
+           'build_batch_messages', 'parse_batch_result', 'build_stream_messages', 'stream_feedback',
+           'parse_stream_result')
+
+SCORE_FIELDS = ('task_completeness', 'code_quality', 'correctness')
+
+# files: [(file_name, text), ...]
+GradingRequest = namedtuple('GradingRequest', 'submission_id homework_id instructions files')
+
+SYSTEM_PROMPT = (
+    "You are a programming teacher grading a student's homework. Score the submission on three criteria, "
+    "each from 0 to 100: task_completeness (does it do what the task asks), code_quality (readability, "
+    "structure, naming) and correctness (does it work, edge cases). Reply with a single JSON object only: "
+    '{"task_completeness": <0-100>, "code_quality": <0-100>, "correctness": <0-100>, "feedback": "<text>"}. '
+    "Write the feedback in Uzbek, addressed to the student, in at most a few short paragraphs."
+)
+
+BATCH_SYSTEM_PROMPT = (
+    "You are a programming teacher grading homework. You will receive the task once, then several "
+    "independent submissions by different students, each starting with a line '=== Submission <id> ==='. "
+    "Grade every submission on its own, never comparing them, on three criteria, each from 0 to 100: "
+    "task_completeness (does it do what the task asks), code_quality (readability, structure, naming) and "
+    "correctness (does it work, edge cases). Reply with a single JSON object only: "
+    '{"results": [{"submission": <id>, "task_completeness": <0-100>, "code_quality": <0-100>, '
+    '"correctness": <0-100>, "feedback": "<text>"}, ...]} with exactly one entry per submission. '
+    "Write each feedback in Uzbek, addressed to that student, in at most a few short paragraphs."
+)
+
+# oqimda izoh birinchi keladi, shuning uchun talaba uni darhol ko'ra boshlaydi
+SCORES_MARKER = 'SCORES:'
+STREAM_SYSTEM_PROMPT = (
+    "You are a programming teacher grading a student's homework. First write your feedback to the student "
+    "in Uzbek as plain text, in at most a few short paragraphs. Then, on the very last line, write "
+    f"{SCORES_MARKER} followed by a JSON object with three scores from 0 to 100: "
+    '{"task_completeness": <0-100>, "code_quality": <0-100>, "correctness": <0-100>}. '
+    "task_completeness: does it do what the task asks; code_quality: readability, structure, naming; "
+    "correctness: does it work, edge cases. Do not write anything after the JSON."
+)
+
+_FENCE = re.compile(r'^```[a-zA-Z]*\s*|\s*```$')
+
+
+def _max_chars():
+    return getattr(settings, 'AI_GRADING', {}).get('MAX_PROMPT_CHARS', 60_000)
+
+
+def _read(file, limit):
+    try:
+        with file.content.open('rb') as source:
+            data = source.read(limit + 1)
+    except (OSError, ValueError):
+        return '[fayl topilmadi]'
+    text = data[:limit].decode('utf-8', errors='replace')
+    return text + '\n[... qisqartirildi]' if len(data) > limit else text
+
+
+def build_request(submission):
+    """Everything the backend needs, read up front so worker threads never touch the DB or storage."""
+    homework = submission.homework
+    instructions = f'# {homework.title}\n\n{homework.description}\n\n{homework.ai_grading_prompt}'.strip()
+    remaining = _max_chars()
+    files = []
+    for file in sorted(submission.files.all(), key=lambda file: file.file_name):
+        text = _read(file, max(remaining, 0))
+        remaining -= len(text)
+        files.append((file.file_name, text))
+    return GradingRequest(submission.pk, homework.pk, instructions, files)
+
+
+def _files_text(request):
+    return '\n'.join(f'--- {name} ---\n{text}' for name, text in request.files)
+
+
+def build_messages(request):
+    return [
+        {'role': 'system', 'content': SYSTEM_PROMPT},
+        {'role': 'user', 'content': f'{request.instructions}\n\nStudent files:\n{_files_text(request)}'},
+    ]
+
+
+def build_batch_messages(requests):
+    """Several submissions of one homework: the task text is sent once."""
+    parts = [requests[0].instructions]
+    for request in requests:
+        parts.append(f'\n=== Submission {request.submission_id} ===\n{_files_text(request)}')
+    return [
+        {'role': 'system', 'content': BATCH_SYSTEM_PROMPT},
+        {'role': 'user', 'content': '\n'.join(parts)},
+    ]
+
+
+def build_stream_messages(request):
+    return [
+        {'role': 'system', 'content': STREAM_SYSTEM_PROMPT},
+        {'role': 'user', 'content': f'{request.instructions}\n\nStudent files:\n{_files_text(request)}'},
+    ]
+
+
+def stream_feedback(text):
+    """The part of a streamed reply that is feedback so far; a half-received marker is held back."""
+    position = text.find(SCORES_MARKER)
+    if position >= 0:
+        return text[:position].rstrip()
+    for size in range(len(SCORES_MARKER) - 1, 0, -1):
+        if text.endswith(SCORES_MARKER[:size]):
+            return text[:-size]
+    return text
+
+
+def parse_stream_result(text):
+    position = str(text).rfind(SCORES_MARKER)
+    if position < 0:
+        raise GradingError(f'Model reply has no {SCORES_MARKER} line: {str(text)[-200:]}')
+    result = _validate(_load(text[position + len(SCORES_MARKER):]))
+    result['feedback'] = text[:position].strip()
+    return result
+
+
+def _load(text):
+    try:
+        data = json.loads(_FENCE.sub('', text.strip()))
+    except (TypeError, ValueError, AttributeError):
+        raise GradingError(f'Model reply is not JSON: {str(text)[:200]}')
+    if not isinstance(data, dict):
+        raise GradingError('Model reply is not a JSON object')
+    return data
+
+
+def _validate(data):
+    result = {}
+    for field in SCORE_FIELDS:
+        try:
+            value = Decimal(str(data[field]))
+        except (KeyError, ArithmeticError, ValueError):
+            raise GradingError(f'Missing or invalid score: {field}')
+        if not 0 <= value <= 100:
+            raise GradingError(f'Score out of range: {field}={value}')
+        result[field] = value
+    result['feedback'] = str(data.get('feedback') or '')
+    return result
+
+
+def parse_result(text):
+    """Validates a model reply; tolerates a ```json fence around the object."""
+    return _validate(_load(text))
+
+
+def parse_batch_result(text, requests):
+    """
+    ``{submission_id: result}`` for every entry that is valid and was asked for. Submissions
+    the model skipped or answered badly are left out, so the caller can grade them one by one.
+    """
+    entries = _load(text).get('results')
+    if not isinstance(entries, list):
+        raise GradingError('Model reply has no "results" list')
+    expected = {request.submission_id for request in requests}
+    results = {}
+    for entry in entries:
+        try:
+            submission_id = int(entry['submission'])
+            result = _validate(entry)
+        except (GradingError, KeyError, TypeError, ValueError):
+            continue
+        if submission_id in expected:
+            results[submission_id] = result
+    return results
+
+
+def _quantize(value):
+    return Decimal(value).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def score_total(result):
+    """Mean of the criteria, 0-100 like ``Grade.ai_total``."""
+    return _quantize(sum(Decimal(str(result[field])) for field in SCORE_FIELDS) / len(SCORE_FIELDS))
@@ -0,0 +1,122 @@
+from collections import Counter, deque, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Min, Q
+from django.utils.timezone import now as current_time
+
+from apps.models import GradingJob
+
+__all__ = ('scheduling_config', 'sort_key', 'pick_jobs', 'reprioritize', 'queue_stats')
+
+Status = GradingJob.Status
+
+
+def scheduling_config():
+    return {
+        # 1 soat oldin topshirilgan ish deadline'i 1 soat yaqinroqdek navbatga turadi
+        'AGE_WEIGHT': 1.0,
+        # o'qituvchi so'ragan qayta baholash deadline'i shuncha soniya oldinroqdek
+        'REGRADE_BOOST': 24 * 60 * 60,
+        # so'nggi SHARE_WINDOW ichida boshlangan har bir vazifa guruh/o'qituvchini SHARE_COST soniyaga orqaga suradi
+        'SHARE_WINDOW': 60 * 60,
+        'SHARE_COST': 60,
+        'GROUP_WEIGHTS': {},
+        'TEACHER_WEIGHTS': {},
+        **getattr(settings, 'AI_GRADING', {}).get('SCHEDULING', {}),
+    }
+
+
+def sort_key(deadline, submitted_at, regrade, config=None):
+    """Smaller is graded first: an earlier deadline, an older submission or a teacher's regrade request."""
+    config = config or scheduling_config()
+    key = deadline.timestamp() + config['AGE_WEIGHT'] * submitted_at.timestamp()
+    return key - config['REGRADE_BOOST'] if regrade else key
+
+
+def _usage(since):
+    groups, teachers = Counter(), Counter()
+    served = (GradingJob.objects.filter(started_at__gte=since).values_list('group_id', 'teacher_id')
+              .annotate(count=Count('id')).order_by())
+    for group_id, teacher_id, count in served:
+        groups[group_id] += count
+        teachers[teacher_id] += count
+    return groups, teachers
+
+
+def pick_jobs(limit, now=None):
+    """
+    Weighted fair queueing over groups and teachers. Every group offers its most urgent due
+    job; that job's ``sort_key`` is pushed back by SHARE_COST seconds for each job its group
+    and its teacher started in the last SHARE_WINDOW (divided by their weights). The smallest
+    wins and its group and teacher pay for the next pick, so one 200-student group cannot
+    hold the queue while another group's deadline is just as close.
+    """
+    config = scheduling_config()
+    now = now or current_time()
+    due = GradingJob.objects.filter(status=Status.PENDING, available_at__lte=now)
+    heads = {}
+    for group_id in due.values_list('group_id', flat=True).distinct().order_by():
+        heads[group_id] = deque(due.filter(group_id=group_id).order_by('sort_key', 'id')
+                                .values_list('id', 'sort_key', 'teacher_id')[:limit])
+    group_usage, teacher_usage = _usage(now - timedelta(seconds=config['SHARE_WINDOW']))
+    group_weights, teacher_weights = config['GROUP_WEIGHTS'], config['TEACHER_WEIGHTS']
+
+    def score(group_id):
+        _, key, teacher_id = heads[group_id][0]
+        share = (group_usage[group_id] / group_weights.get(group_id, 1) +
+                 teacher_usage[teacher_id] / teacher_weights.get(teacher_id, 1))
+        return key + config['SHARE_COST'] * share
+
+    picked = []
+    while heads and len(picked) < limit:
+        group_id = min(heads, key=score)
+        job_id, _, teacher_id = heads[group_id].popleft()
+        picked.append(job_id)
+        group_usage[group_id] += 1
+        teacher_usage[teacher_id] += 1
+        if not heads[group_id]:
+            del heads[group_id]
+    return picked
+
+
+def reprioritize(homework):
+    """Pending jobs follow a changed deadline."""
+    config = scheduling_config()
+    jobs = list(GradingJob.objects.filter(submission__homework=homework, status=Status.PENDING)
+                .select_related('submission').only('id', 'regrade', 'sort_key', 'submission__submitted_at'))
+    for job in jobs:
+        job.sort_key = sort_key(homework.deadline, job.submission.submitted_at, job.regrade, config)
+    GradingJob.objects.bulk_update(jobs, ['sort_key'])
+    return len(jobs)
+
+
+def queue_stats(now=None):
+    """
+    Per group: queue depth, how long the oldest pending job has waited, and for jobs started in
+    the last SHARE_WINDOW their average wait (queued -> started) and the group's share of them.
+    """
+    config = scheduling_config()
+    now = now or current_time()
+    rows = defaultdict(lambda: {'pending': 0, 'running': 0, 'oldest_wait': None, 'started': 0, 'avg_wait': None,
+                                'share': 0.0})
+    depth = (GradingJob.objects.filter(status__in=(Status.PENDING, Status.RUNNING))
+             .values_list('group_id', 'group__name')
+             .annotate(pending=Count('id', filter=Q(status=Status.PENDING)),
+                       running=Count('id', filter=Q(status=Status.RUNNING)),
+                       oldest=Min('created_at', filter=Q(status=Status.PENDING)))
+             .order_by())
+    for group_id, name, pending, running, oldest in depth:
+        rows[group_id].update(name=name, pending=pending, running=running,
+                              oldest_wait=(now - oldest).total_seconds() if oldest else None)
+
+    waits = defaultdict(list)
+    started = GradingJob.objects.filter(started_at__gte=now - timedelta(seconds=config['SHARE_WINDOW']))
+    for group_id, name, created_at, started_at in started.values_list('group_id', 'group__name', 'created_at',
+                                                                       'started_at'):
+        rows[group_id].setdefault('name', name)
+        waits[group_id].append((started_at - created_at).total_seconds())
+    total = sum(len(values) for values in waits.values())
+    for group_id, values in waits.items():
+        rows[group_id].update(started=len(values), avg_wait=sum(values) / len(values), share=len(values) / total)
+    return [{'group': group_id, **row} for group_id, row in sorted(rows.items(), key=lambda item: -item[1]['pending'])]
@@ -0,0 +1,48 @@
+from django.utils.timezone import now as current_time
+
+from apps.models import Grade, Submission
+
+__all__ = ('FeedbackDraft',)
+
+
+class FeedbackDraft:
+    """
+    Partial feedback of one streamed grading call. Written with plain UPDATEs (no signals, so no
+    leaderboard work per flush) to the newest Grade and to the Submission; ``save_result`` later
+    fills the scores of that same Grade row.
+    """
+
+    def __init__(self, submission):
+        self.submission = submission
+        self.grade_id = None
+        self.created = False
+        self.previous = None
+        self.written = ''
+
+    def _grade(self):
+        grade = self.submission.grades.order_by('-created_at', '-id').only('id', 'ai_feedback').first()
+        if grade is None:
+            # ballarsiz qoralama: signal yuborilmaydi, reyting baho tayyor bo'lganda yangilanadi
+            grade = Grade.objects.bulk_create([Grade(submission=self.submission)])[0]
+            self.created = True
+        self.grade_id, self.previous = grade.pk, grade.ai_feedback
+
+    def write(self, text):
+        if text == self.written:
+            return False
+        if self.grade_id is None:
+            self._grade()
+        Grade.objects.filter(pk=self.grade_id).update(ai_feedback=text, updated_at=current_time())
+        Submission.objects.filter(pk=self.submission.pk).update(ai_feedback=text)
+        self.written = text
+        return True
+
+    def discard(self):
+        """The call failed: the half-written feedback is rolled back."""
+        if self.grade_id is None:
+            return
+        if self.created:
+            Grade.objects.filter(pk=self.grade_id, ai_total__isnull=True).delete()
+        else:
+            Grade.objects.filter(pk=self.grade_id).update(ai_feedback=self.previous)
+        Submission.objects.filter(pk=self.submission.pk).update(ai_feedback=self.submission.ai_feedback)
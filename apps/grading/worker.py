@@ -0,0 +1,224 @@
+import logging
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+from threading import Lock
+from time import perf_counter, sleep, monotonic
+
+from django.utils.timezone import now as current_time
+
+from apps import queue
+from apps.grading.backends import get_grading_backend
+from apps.grading.batching import pack_batches
+from apps.grading.cache import cache_enabled, grading_key, cached_result, cache_result
+from apps.grading.errors import GradingError, RetryableGradingError
+from apps.grading.jobs import grading_config, claim_jobs, requeue_stale_jobs, save_result
+from apps.grading.prompts import build_request
+from apps.grading.streaming import FeedbackDraft
+from apps.models import GradingJob
+
+__all__ = ('GradingWorker',)
+
+logger = logging.getLogger(__name__)
+Status = GradingJob.Status
+
+
+class GradingWorker:
+    """
+    Keeps up to ``concurrency`` model calls in flight. Only the backend calls run in the pool:
+    claiming, reading files and saving grades stay on the calling thread, so the database is
+    used from one connection however many requests are open.
+
+    Content graded before is answered from the grading cache, and identical content claimed
+    while its first request is still open waits for that answer instead of asking again.
+    When the backend supports it, submissions of one homework are packed into a single call
+    within the token budget in ``AI_GRADING['BATCH']``.
+
+    With ``AI_GRADING['STREAM']`` each submission gets its own streamed call instead: pool threads
+    only hand over the text received so far, and this thread writes it every
+    STREAM_FLUSH_INTERVAL seconds, so feedback shows up while the model is still writing.
+    """
+
+    def __init__(self, backend=None, concurrency=None):
+        config = grading_config()
+        self.backend = backend or get_grading_backend()
+        self.concurrency = concurrency or config['CONCURRENCY']
+        self.max_attempts = config['MAX_ATTEMPTS']
+        self.retry_delay = config['RETRY_DELAY']
+        self.use_cache = cache_enabled()
+        self.stream = config['STREAM'] and self.backend.supports_stream
+        self.flush_interval = config['STREAM_FLUSH_INTERVAL']
+        batch = config['BATCH']
+        # oqimli javobni bir nechta topshiriqqa bo'lib bo'lmaydi
+        self.batch_size = batch['MAX_SUBMISSIONS'] if self.backend.supports_batch and not self.stream else 1
+        if self.stream and self.backend.supports_batch and batch['MAX_SUBMISSIONS'] > 1:
+            logger.info('AI_GRADING STREAM is on: batching is disabled, every submission is graded in its own call')
+        self.batch_tokens = batch['MAX_TOKENS']
+        self.response_tokens = batch['RESPONSE_TOKENS']
+        self.stats = Counter()
+        self._paused_until = 0
+        # kalit -> shu kontent javobini kutayotgan vazifalar
+        self._waiting = {}
+        # yuborishga tayyor so'rovlar: [(job, request, key), ...]
+        self._ready = deque()
+        # submission_id -> FeedbackDraft (faqat shu oqimda) va oqimlardan kelgan oxirgi matn
+        self._drafts = {}
+        self._received = {}
+        self._received_lock = Lock()
+
+    def _call(self, requests):
+        started = perf_counter()
+        try:
+            if len(requests) == 1 and self.stream:
+                request = requests[0]
+                results = {request.submission_id: self.backend.grade_stream(
+                    request, partial(self._receive, request.submission_id))}
+            elif len(requests) == 1:
+                results = {requests[0].submission_id: self.backend.grade(requests[0])}
+            else:
+                results = self.backend.grade_batch(requests)
+            return results, None, perf_counter() - started
+        except Exception as error:
+            return None, error, perf_counter() - started
+
+    def _receive(self, submission_id, text):
+        with self._received_lock:
+            self._received[submission_id] = text
+
+    def _flush(self):
+        with self._received_lock:
+            received, self._received = self._received, {}
+        for submission_id, text in received.items():
+            draft = self._drafts.get(submission_id)
+            if draft is not None:
+                draft.write(text)
+
+    def _prepare(self, job):
+        """``(job, request, key)`` if the model has to be asked, ``None`` if the job is settled or waiting."""
+        try:
+            request = build_request(job.submission)
+        except Exception as error:
+            self._finish(job, None, error, 0)
+            return None
+        key = grading_key(request, self.backend)
+        if self.use_cache and job.use_cache:
+            result = cached_result(key)
+            if result is not None:
+                self._finish(job, result, None, 0, cache_hit=True)
+                return None
+            if key in self._waiting:
+                # xuddi shu kontent hozir baholanmoqda - o'sha javob kutiladi
+                self._waiting[key].append(job)
+                return None
+        self._waiting.setdefault(key, [])
+        return job, request, key
+
+    def _dispatch(self, jobs):
+        entries = [entry for entry in map(self._prepare, jobs) if entry is not None]
+        self._ready.extend(pack_batches(entries, self.batch_size, self.batch_tokens, self.response_tokens))
+
+    def _fill(self, executor, in_flight):
+        while len(in_flight) < self.concurrency:
+            # 429 pauzasi tayyor turganlarga ham tegishli (qayta yuborilayotgan yakkalar, kutganlar)
+            if monotonic() < self._paused_until:
+                return
+            if self._ready:
+                batch = self._ready.popleft()
+                if self.stream:
+                    for job, request, _ in batch:
+                        self._drafts[request.submission_id] = FeedbackDraft(job.submission)
+                in_flight[executor.submit(self._call, [request for _, request, _ in batch])] = batch
+                continue
+            jobs = claim_jobs((self.concurrency - len(in_flight)) * self.batch_size)
+            if not jobs:
+                return
+            self._dispatch(jobs)
+
+    def _complete(self, future, in_flight):
+        batch = in_flight.pop(future)
+        results, error, elapsed = future.result()
+        for _, request, _ in batch:
+            draft = self._drafts.pop(request.submission_id, None)
+            if draft is not None and error is not None:
+                draft.discard()
+        if len(batch) > 1 and not isinstance(error, RetryableGradingError):
+            # javob yaroqsiz yoki ba'zilari tushib qolgan: ular birma-bir baholanadi
+            results = results or {}
+            missing = [entry for entry in batch if entry[1].submission_id not in results]
+            self._ready.extend([entry] for entry in missing)
+            batch, error = [entry for entry in batch if entry not in missing], None
+            self.stats['batch_fallbacks'] += len(missing)
+            self.stats['batched'] += len(batch)
+        for job, request, key in batch:
+            result = results[request.submission_id] if error is None else None
+            self._settle(job, key, result, error, elapsed)
+
+    def _settle(self, job, key, result, error, elapsed):
+        if error is None and self.use_cache:
+            cache_result(key, result)
+        self._finish(job, result, error, elapsed)
+        followers = self._waiting.pop(key, [])
+        if error is None:
+            for follower in followers:
+                self._finish(follower, result, None, 0, cache_hit=True)
+        elif followers:
+            # birinchisi muvaffaqiyatsiz: kutganlardan biri o'zi so'raydi, qolganlari yana kutadi
+            self._dispatch(followers)
+
+    def _finish(self, job, result, error, elapsed, cache_hit=False):
+        if error is None:
+            try:
+                save_result(job.submission, result)
+            except Exception as save_error:
+                error = save_error
+        now = current_time()
+        job.finished_at = now
+        job.duration_ms = int(elapsed * 1000)
+        job.cache_hit = cache_hit and error is None
+        if error is None:
+            job.status = Status.DONE
+            job.last_error = ''
+        else:
+            job.last_error = f'{type(error).__name__}: {error}'[:2000]
+            # javob yaroqsiz bo'lsa qayta so'rash foyda bermaydi; tarmoq/limit xatolari qayta uriniladi
+            retryable = isinstance(error, RetryableGradingError) or not isinstance(error, GradingError)
+            retry_after = getattr(error, 'retry_after', None)
+            if retryable and job.attempts < self.max_attempts:
+                job.status = Status.PENDING
+                job.available_at = queue.retry_at(now, job.attempts, self.retry_delay, retry_after)
+                self.stats['retried'] += 1
+            else:
+                job.status = Status.FAILED
+                self.stats['failed'] += 1
+            if retry_after:
+                # 429: server kutishni so'radi - yangi vazifalar ham shuncha kutadi
+                self._paused_until = max(self._paused_until, monotonic() + retry_after)
+            logger.warning('Grading submission %s failed (attempt %s): %s', job.submission_id, job.attempts,
+                           job.last_error)
+        job.save(update_fields=['status', 'available_at', 'finished_at', 'duration_ms', 'last_error', 'cache_hit'])
+        if job.status == Status.DONE:
+            self.stats['done'] += 1
+            self.stats['cache_hits'] += job.cache_hit
+
+    def run(self, once=False, idle=1.0):
+        """With ``once`` returns when nothing is due and nothing is in flight; otherwise runs forever."""
+        requeue_stale_jobs()
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='grading') as executor:
+            while True:
+                self._fill(executor, in_flight)
+                if not in_flight and self._ready:
+                    # olingan vazifalar pauza tugashini kutadi, tashlab ketilmaydi
+                    sleep(max(self._paused_until - monotonic(), 0))
+                    continue
+                if not in_flight:
+                    if once:
+                        return self.stats
+                    sleep(idle)
+                    requeue_stale_jobs()
+                    continue
+                done, _ = wait(in_flight, timeout=self.flush_interval if self.stream else idle,
+                               return_when=FIRST_COMPLETED)
+                self._flush()
+                for future in done:
+                    self._complete(future, in_flight)
@@ -0,0 +1,93 @@
+from functools import lru_cache
+from os.path import splitext
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from pygments import highlight
+from pygments.formatters import HtmlFormatter
+from pygments.lexers import get_lexer_by_name
+from pygments.util import ClassNotFound
+
+from apps.models import Homework
+from apps.storage import submission_storage, file_digest
+
+LEXERS = {
+    Homework.FileType.PYTHON: 'python',
+    Homework.FileType.JAVASCRIPT: 'javascript',
+    Homework.FileType.TYPESCRIPT: 'typescript',
+    Homework.FileType.HTML: 'html',
+    Homework.FileType.CSS: 'css',
+    Homework.FileType.JSON: 'json',
+    Homework.FileType.YAML: 'yaml',
+    Homework.FileType.YML: 'yaml',
+    Homework.FileType.MARKDOWN: 'markdown',
+    Homework.FileType.TXT: 'text',
+    Homework.FileType.JAVA: 'java',
+    Homework.FileType.C: 'c',
+    Homework.FileType.CPP: 'cpp',
+    Homework.FileType.CS: 'csharp',
+    Homework.FileType.GO: 'go',
+    Homework.FileType.PHP: 'php',
+    Homework.FileType.RUBY: 'ruby',
+    Homework.FileType.RUST: 'rust',
+}
+STYLE = 'default'
+
+
+def _cache():
+    return caches['highlight']
+
+
+def cache_is_shared():
+    # LocMem/Dummy har jarayonda alohida: boshqa jarayonda isitilgan kesh web'ga ko'rinmaydi
+    return not isinstance(_cache(), (LocMemCache, DummyCache))
+
+
+def lexer_name(file_name, file_extensions=''):
+    # avval faylning o'z kengaytmasi, keyin vazifada ko'rsatilgan birinchi tur
+    extension = splitext(file_name)[1].lower()
+    if extension in LEXERS:
+        return LEXERS[extension]
+    for extension in file_extensions.split(','):
+        extension = '.' + extension.strip().lstrip('.').lower()
+        if extension in LEXERS:
+            return LEXERS[extension]
+    return 'text'
+
+
+@lru_cache
+def formatter():
+    return HtmlFormatter(style=STYLE, linenos='table', cssclass='highlight', wrapcode=True)
+
+
+@lru_cache
+def stylesheet():
+    return formatter().get_style_defs('.highlight')
+
+
+def render_text(text, language):
+    try:
+        lexer = get_lexer_by_name(language, stripnl=False)
+    except ClassNotFound:
+        lexer = get_lexer_by_name('text', stripnl=False)
+    return highlight(text, lexer, formatter())
+
+
+def render_file(file):
+    """
+    Highlighted HTML for a SubmissionFile, cached by content hash + lexer in the 'highlight'
+    cache (bounded LocMem by default), so repeated views of a file lex it once.
+    """
+    language = lexer_name(file.file_name, file.submission.homework.file_extensions)
+    digest = file.sha256 or file_digest(file.content)
+    key = f'{digest}:{language}:{STYLE}'
+    html = _cache().get(key)
+    if html is None:
+        with submission_storage.open(file.content.name) as source:
+            data = source.read()
+        html = render_text(data.decode('utf-8', errors='replace'), language)
+        if len(data) <= getattr(settings, 'HIGHLIGHT_MAX_CACHED_SIZE', 512 * 1024):
+            _cache().set(key, html)
+    return {'file_name': file.file_name, 'language': language, 'sha256': digest, 'html': html}
@@ -0,0 +1,9 @@
+from apps.leaderboard.index import *
+from apps.leaderboard.standings import *
+from apps.leaderboard.ranking import *
+from apps.leaderboard.rollups import *
+from apps.leaderboard.levels import *
+from apps.leaderboard.updates import *
+from apps.leaderboard.live import *
+from apps.leaderboard.snapshots import *
+from apps.leaderboard.course import *
@@ -0,0 +1,79 @@
+from heapq import merge
+from itertools import groupby, islice
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.models import LeaderboardEntry
+from apps.versions import group_version_stamp
+from authenticate.models import Group
+
+__all__ = ('merged_top', 'merged_rank')
+
+
+def _entries(course_id=None):
+    entries = LeaderboardEntry.objects.all()
+    if course_id is not None:
+        entries = entries.filter(group__course_id=course_id)
+    return entries
+
+
+def _group_ids(course_id=None):
+    groups = Group.objects.all()
+    if course_id is not None:
+        groups = groups.filter(course_id=course_id)
+    return list(groups.values_list('id', flat=True))
+
+
+def _merge(group_lists, k):
+    """Per-group lists are already sorted by score desc, so a k-way merge only reads their heads."""
+    ordered = merge(*group_lists, key=lambda row: (-row['total_points'], row['student'], row['group']))
+    # guruhini almashtirgan talaba bir marta, eng yaxshi natijasi bilan chiqadi
+    seen = set()
+    best = (row for row in ordered if not (row['student'] in seen or seen.add(row['student'])))
+    rows = list(islice(best, k))
+    position = 0
+    for _, tied in groupby(rows, key=lambda row: row['total_points']):
+        tied = list(tied)
+        for row in tied:
+            row['rank'] = position + 1
+        position += len(tied)
+    return rows
+
+
+def merged_top(course_id=None, k=50):
+    """
+    Course-wide (or, with ``course_id=None``, global) top-K merged from each group's
+    precomputed top-K. Only ``rank <= k`` rows are read per group, through the
+    (group, rank) index, and the result is cached until any group version moves.
+    """
+    group_ids = _group_ids(course_id)
+    version, _ = group_version_stamp(group_ids)
+    cache_key = f'leaderboard:merged:{course_id or "all"}:{k}:{version}:{len(group_ids)}'
+    rows = cache.get(cache_key)
+    if rows is not None:
+        return rows
+
+    candidates = _entries(course_id).filter(rank__lte=k).order_by('group_id', '-total_points', 'student_id').values(
+        'student', 'student__full_name', 'group', 'group__name', 'total_points')
+    group_lists = [list(rows) for _, rows in groupby(candidates, key=lambda row: row['group'])]
+    rows = _merge(group_lists, k)
+    cache.set(cache_key, rows, getattr(settings, 'LEADERBOARD_MERGED_CACHE_TIMEOUT', 300))
+    return rows
+
+
+def merged_rank(student_id, course_id=None):
+    """
+    Exact course/global rank of one student through a single count on the standings table. Like ``merged_top``,
+    students (not their per-group rows) are counted, each with their best score.
+    """
+    entries = _entries(course_id)
+    entry = entries.filter(student_id=student_id).order_by('-total_points').values('total_points', 'group').first()
+    if entry is None:
+        return None
+    return {
+        'student': student_id,
+        'group': entry['group'],
+        'total_points': entry['total_points'],
+        'rank': entries.filter(total_points__gt=entry['total_points']).values('student').distinct().count() + 1,
+    }
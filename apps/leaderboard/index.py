@@ -0,0 +1,254 @@
+from bisect import bisect_left, insort
+from decimal import Decimal
+from functools import lru_cache
+from threading import Lock
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db.models import Q
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from apps.models import LeaderboardEntry, GroupVersion
+
+__all__ = ('BaseRankIndex', 'DatabaseRankIndex', 'MemoryRankIndex', 'RedisRankIndex', 'get_rank_index',
+           'with_ranks')
+
+
+def with_ranks(rows, first_rank):
+    """Turn ``[(student_id, score), ...]`` ordered by score desc into competition-ranked dicts."""
+    ranked = []
+    rank, previous = first_rank, None
+    for offset, (student_id, score) in enumerate(rows):
+        if previous is not None and score != previous:
+            rank = first_rank + offset
+        previous = score
+        ranked.append({'rank': rank, 'student': student_id, 'total_points': score})
+    return ranked
+
+
+class BaseRankIndex:
+    """
+    Per-group score index. Ranks are competition ranks (1, 2, 2, 4), ties inside
+    top/around windows are ordered by the backend.
+    """
+
+    def update(self, group_id, student_id, score):
+        raise NotImplementedError
+
+    def remove(self, group_id, student_id):
+        raise NotImplementedError
+
+    def score(self, group_id, student_id):
+        raise NotImplementedError
+
+    def rank_for_score(self, group_id, score):
+        raise NotImplementedError
+
+    def top(self, group_id, k):
+        raise NotImplementedError
+
+    def around(self, group_id, student_id, radius):
+        raise NotImplementedError
+
+    def rebuild(self, group_id):
+        pass
+
+    def rank(self, group_id, student_id):
+        score = self.score(group_id, student_id)
+        if score is None:
+            return None
+        return self.rank_for_score(group_id, score)
+
+    @staticmethod
+    def load_group(group_id):
+        return list(LeaderboardEntry.objects.filter(group_id=group_id).values_list('student_id', 'total_points'))
+
+
+class DatabaseRankIndex(BaseRankIndex):
+    """Reads straight from the standings table through the (group, total_points) index."""
+
+    def update(self, group_id, student_id, score):
+        pass
+
+    def remove(self, group_id, student_id):
+        pass
+
+    def _entries(self, group_id):
+        return LeaderboardEntry.objects.filter(group_id=group_id)
+
+    def score(self, group_id, student_id):
+        return self._entries(group_id).filter(student_id=student_id).values_list('total_points', flat=True).first()
+
+    def rank_for_score(self, group_id, score):
+        return self._entries(group_id).filter(total_points__gt=score).count() + 1
+
+    def top(self, group_id, k):
+        return list(self._entries(group_id).order_by('-total_points', 'id').values_list('student_id', 'total_points')[:k])
+
+    def around(self, group_id, student_id, radius):
+        me = self._entries(group_id).filter(student_id=student_id).values('id', 'total_points').first()
+        if me is None:
+            return []
+        score, pk = me['total_points'], me['id']
+        above = self._entries(group_id).filter(Q(total_points__gt=score) | Q(total_points=score, id__lt=pk))
+        below = self._entries(group_id).filter(Q(total_points__lt=score) | Q(total_points=score, id__gt=pk))
+        above = list(above.order_by('total_points', '-id').values_list('student_id', 'total_points')[:radius])
+        below = list(below.order_by('-total_points', 'id').values_list('student_id', 'total_points')[:radius])
+        return above[::-1] + [(student_id, score)] + below
+
+
+class _SortedGroup:
+    def __init__(self, rows, version):
+        # qaysi GroupVersion holatidan qurilgani: boshqa jarayon (worker, gunicorn) yozgan bahoni shundan bilamiz
+        self.version = version
+        self.scores = {student_id: Decimal(score) for student_id, score in rows}
+        self.keys = sorted((-score, student_id) for student_id, score in self.scores.items())
+
+    def update(self, student_id, score):
+        self.remove(student_id)
+        self.scores[student_id] = score
+        insort(self.keys, (-score, student_id))
+
+    def remove(self, student_id):
+        score = self.scores.pop(student_id, None)
+        if score is not None:
+            del self.keys[bisect_left(self.keys, (-score, student_id))]
+
+
+class MemoryRankIndex(BaseRankIndex):
+    """
+    In-process sorted index, lazily warmed from the standings table. Lookups are binary searches.
+    ``update``/``remove`` only reach the process that wrote the grade, so each list remembers the
+    group version it was built from and is rebuilt when another process has moved it.
+    """
+
+    def __init__(self):
+        self._groups = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def load_version(group_id):
+        return GroupVersion.objects.filter(group_id=group_id).values_list('version', flat=True).first() or 0
+
+    def _group(self, group_id):
+        version = self.load_version(group_id)
+        group = self._groups.get(group_id)
+        if group is None or group.version != version:
+            group = _SortedGroup(self.load_group(group_id), version)
+            with self._lock:
+                self._groups[group_id] = group
+        return group
+
+    def update(self, group_id, student_id, score):
+        with self._lock:
+            if group_id in self._groups:
+                self._groups[group_id].update(student_id, Decimal(score))
+
+    def remove(self, group_id, student_id):
+        with self._lock:
+            if group_id in self._groups:
+                self._groups[group_id].remove(student_id)
+
+    def rebuild(self, group_id):
+        with self._lock:
+            self._groups.pop(group_id, None)
+
+    def score(self, group_id, student_id):
+        return self._group(group_id).scores.get(student_id)
+
+    def rank_for_score(self, group_id, score):
+        return bisect_left(self._group(group_id).keys, (-Decimal(score),)) + 1
+
+    def top(self, group_id, k):
+        return [(student_id, -score) for score, student_id in self._group(group_id).keys[:k]]
+
+    def around(self, group_id, student_id, radius):
+        group = self._group(group_id)
+        score = group.scores.get(student_id)
+        if score is None:
+            return []
+        position = bisect_left(group.keys, (-score, student_id))
+        window = group.keys[max(position - radius, 0):position + radius + 1]
+        return [(member, -member_score) for member_score, member in window]
+
+
+class RedisRankIndex(BaseRankIndex):
+    """
+    One sorted set per group. Works with any client exposing the redis-py sorted
+    set API (zadd, zrem, zscore, zcount, zrevrank, zrevrange, exists).
+    """
+
+    def __init__(self, client=None, url=None, prefix='leaderboard'):
+        if client is None:
+            try:
+                import redis
+            except ImportError as exc:
+                raise ImproperlyConfigured("RedisRankIndex requires the 'redis' package") from exc
+            client = redis.Redis.from_url(url or 'redis://localhost:6379/0')
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, group_id):
+        return f'{self.prefix}:group:{group_id}'
+
+    def _warm(self, group_id):
+        key = self._key(group_id)
+        if not self.client.exists(key):
+            rows = self.load_group(group_id)
+            if rows:
+                # NX: shu orada parallel update yozgan yangi ballni bazadan o'qilgan eski ball bosib ketmaydi
+                self.client.zadd(key, {str(student_id): float(score) for student_id, score in rows}, nx=True)
+        return key
+
+    @staticmethod
+    def _rows(members):
+        return [(int(member), Decimal(str(score))) for member, score in members]
+
+    # sovuq kalitga yozilmaydi: bitta a'zoli to'plam _warm uchun "yuklangan" bo'lib qolardi;
+    # keyingi o'qish guruhni bazadan to'liq yuklaydi (MemoryRankIndex ham shunday)
+    def update(self, group_id, student_id, score):
+        key = self._key(group_id)
+        if self.client.exists(key):
+            self.client.zadd(key, {str(student_id): float(score)})
+
+    def remove(self, group_id, student_id):
+        key = self._key(group_id)
+        if self.client.exists(key):
+            self.client.zrem(key, str(student_id))
+
+    def rebuild(self, group_id):
+        self.client.delete(self._key(group_id))
+
+    def score(self, group_id, student_id):
+        score = self.client.zscore(self._warm(group_id), str(student_id))
+        return None if score is None else Decimal(str(score))
+
+    def rank_for_score(self, group_id, score):
+        return self.client.zcount(self._warm(group_id), f'({float(score)}', '+inf') + 1
+
+    def top(self, group_id, k):
+        if k <= 0:
+            return []
+        return self._rows(self.client.zrevrange(self._warm(group_id), 0, k - 1, withscores=True))
+
+    def around(self, group_id, student_id, radius):
+        key = self._warm(group_id)
+        position = self.client.zrevrank(key, str(student_id))
+        if position is None:
+            return []
+        return self._rows(self.client.zrevrange(key, max(position - radius, 0), position + radius, withscores=True))
+
+
+@lru_cache(maxsize=None)
+def get_rank_index():
+    config = getattr(settings, 'LEADERBOARD_RANK_INDEX', {})
+    backend = import_string(config.get('BACKEND', 'apps.leaderboard.index.DatabaseRankIndex'))
+    return backend(**config.get('OPTIONS', {}))
+
+
+@receiver(setting_changed)
+def _reset_rank_index(setting, **kwargs):
+    if setting == 'LEADERBOARD_RANK_INDEX':
+        get_rank_index.cache_clear()
@@ -0,0 +1,53 @@
+from bisect import bisect_right
+
+from django.conf import settings
+from django.db.models import Sum
+
+from apps.leaderboard.standings import grade_score
+from apps.models import Grade, LeaderboardEntry
+from authenticate.models import User
+
+__all__ = ('level_thresholds', 'level_for_xp', 'refresh_student_level', 'recompute_levels')
+
+# [i] - (i + 1)-darajaga chiqish uchun kerakli XP (baholar yig'indisi); settings.LEVEL_THRESHOLDS bilan almashadi
+DEFAULT_LEVEL_THRESHOLDS = (0, 100, 300, 600, 1000, 1500, 2100, 2800, 3600, 4500)
+
+
+def level_thresholds():
+    return tuple(getattr(settings, 'LEVEL_THRESHOLDS', DEFAULT_LEVEL_THRESHOLDS))
+
+
+def level_for_xp(xp, thresholds=None):
+    # thresholds[i] - (i + 1)-darajaga chiqish uchun kerakli XP
+    return max(bisect_right(thresholds or level_thresholds(), xp), 1)
+
+
+def refresh_student_level(student_id):
+    """XP is the sum of the student's standings rows, so no Grade aggregation happens on a grade write."""
+    xp = LeaderboardEntry.objects.filter(student_id=student_id).aggregate(xp=Sum('total_points'))['xp'] or 0
+    level = level_for_xp(xp)
+    User.objects.filter(pk=student_id).exclude(xp=xp, level=level).update(xp=xp, level=level)
+    return xp, level
+
+
+def recompute_levels(chunk_size=500, start_after=0):
+    """Full recompute from grades in primary key chunks; yields the last processed id for resuming."""
+    thresholds = level_thresholds()
+    students = User.objects.filter(role=User.RoleType.Student).order_by('pk')
+    last_id = start_after
+    while True:
+        chunk = list(students.filter(pk__gt=last_id).only('id', 'xp', 'level')[:chunk_size])
+        if not chunk:
+            return
+        totals = dict(Grade.objects.filter(submission__student__in=chunk).values_list(
+            'submission__student_id').annotate(xp=Sum(grade_score())))
+        changed = []
+        for student in chunk:
+            xp = totals.get(student.id) or 0
+            level = level_for_xp(xp, thresholds)
+            if (student.xp, student.level) != (xp, level):
+                student.xp, student.level = xp, level
+                changed.append(student)
+        User.objects.bulk_update(changed, ['xp', 'level'], batch_size=chunk_size)
+        last_id = chunk[-1].id
+        yield last_id, len(chunk), len(changed)
@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from apps.models import LeaderboardEntry
+from apps.versions import group_version_stamp
+
+__all__ = ('load_standings', 'diff_standings', 'GroupChannel', 'LeaderboardHub', 'hub', 'format_event')
+
+
+def load_standings(group_id):
+    limit = getattr(settings, 'LEADERBOARD_STREAM_LIMIT', 500)
+    rows = LeaderboardEntry.objects.filter(group_id=group_id).order_by('-total_points', 'id').values(
+        'student_id', 'student__full_name', 'rank', 'total_points')[:limit]
+    return {
+        row['student_id']: {
+            'student': row['student_id'],
+            'full_name': row['student__full_name'],
+            'rank': row['rank'],
+            'total_points': str(row['total_points']),
+        }
+        for row in rows
+    }
+
+
+def diff_standings(old, new):
+    changed = [row for student_id, row in new.items() if old.get(student_id) != row]
+    removed = [student_id for student_id in old if student_id not in new]
+    return {'changed': sorted(changed, key=lambda row: row['rank']), 'removed': removed}
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+class GroupChannel:
+    """
+    One ticker per group per process. Each tick reads the group version once; only
+    when it moved are standings reloaded and a single diff fanned out to every
+    subscriber queue, so a burst of grades inside one tick becomes one event.
+    """
+
+    def __init__(self, group_id, interval=1.0, queue_size=16, version_loader=None, rows_loader=None):
+        self.group_id = group_id
+        self.interval = interval
+        self.queue_size = queue_size
+        self.version_loader = version_loader or sync_to_async(lambda group_id: group_version_stamp([group_id])[0])
+        self.rows_loader = rows_loader or sync_to_async(load_standings)
+        self.subscribers = set()
+        self.version = None
+        self.rows = None
+        self.task = None
+
+    def snapshot(self):
+        return {'group': self.group_id, 'version': self.version, 'rows': sorted(self.rows.values(),
+                                                                                  key=lambda row: row['rank'])}
+
+    async def subscribe(self):
+        if self.rows is None:
+            await self.tick()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        return queue, self.snapshot()
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def publish(self, event, data):
+        for queue in self.subscribers:
+            if queue.full():
+                # sekin mijoz: eski diff'lar o'rniga to'liq holatni yuboramiz
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(('snapshot', self.snapshot()))
+            else:
+                queue.put_nowait((event, data))
+
+    async def tick(self):
+        version = await self.version_loader(self.group_id)
+        if version == self.version and self.rows is not None:
+            return None
+        rows = await self.rows_loader(self.group_id)
+        diff = diff_standings(self.rows or {}, rows)
+        self.version, self.rows = version, rows
+        if diff['changed'] or diff['removed']:
+            data = {'group': self.group_id, 'version': version, **diff}
+            self.publish('diff', data)
+            return data
+        return None
+
+    async def run(self):
+        while self.subscribers:
+            await asyncio.sleep(self.interval)
+            if self.subscribers:
+                await self.tick()
+
+
+class LeaderboardHub:
+    def __init__(self):
+        self.channels = {}
+
+    def channel(self, group_id):
+        channel = self.channels.get(group_id)
+        if channel is None:
+            channel = self.channels[group_id] = GroupChannel(
+                group_id,
+                interval=getattr(settings, 'LEADERBOARD_STREAM_INTERVAL', 1.0),
+            )
+        return channel
+
+    async def subscribe(self, group_id):
+        return await self.channel(group_id).subscribe()
+
+    def unsubscribe(self, group_id, queue):
+        channel = self.channels.get(group_id)
+        if channel is None:
+            return
+        channel.unsubscribe(queue)
+        if not channel.subscribers:
+            if channel.task is not None:
+                channel.task.cancel()
+            del self.channels[group_id]
+
+
+hub = LeaderboardHub()
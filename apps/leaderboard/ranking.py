@@ -0,0 +1,38 @@
+from django.db.models import Sum, Count, F, Window
+from django.db.models.functions import Rank, DenseRank, RowNumber
+
+from apps.leaderboard.standings import grade_score
+from apps.models import Grade
+
+__all__ = ('rank_grades', 'homework_ranking', 'group_ranking', 'course_ranking')
+
+
+def rank_grades(grades, dense=False):
+    """
+    One row per student: ``student``, ``full_name``, ``total_points``, ``graded_count``
+    and ``rank``. Aggregation and RANK()/DENSE_RANK() both run in the database.
+    ``position`` (ROW_NUMBER() in the same order) is unique, so it can be a keyset cursor.
+    """
+    rank_function = DenseRank if dense else Rank
+    return grades.values(
+        student=F('submission__student_id'),
+        full_name=F('submission__student__full_name'),
+    ).annotate(
+        total_points=Sum(grade_score()),
+        graded_count=Count(grade_score()),
+    ).annotate(
+        rank=Window(rank_function(), order_by=F('total_points').desc()),
+        position=Window(RowNumber(), order_by=(F('total_points').desc(), F('submission__student_id').asc())),
+    ).order_by('position')
+
+
+def homework_ranking(homework_id, dense=False):
+    return rank_grades(Grade.objects.filter(submission__homework_id=homework_id), dense)
+
+
+def group_ranking(group_id, dense=False):
+    return rank_grades(Grade.objects.filter(submission__homework__group_id=group_id), dense)
+
+
+def course_ranking(course_id, dense=False):
+    return rank_grades(Grade.objects.filter(submission__homework__group__course_id=course_id), dense)
@@ -0,0 +1,92 @@
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Sum, Count
+from django.db.models.functions import TruncDate
+from django.utils.timezone import make_aware, get_current_timezone
+
+from apps.leaderboard.standings import grade_score, rerank
+from apps.models import Grade, DailyGradeRollup, MonthlyGradeRollup
+
+__all__ = ('month_start', 'day_bounds', 'refresh_rollups', 'rebuild_rollups')
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (month_start(day) + timedelta(days=32)).replace(day=1)
+
+
+def day_bounds(day):
+    start = make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _store(model, lookup, totals):
+    if totals['count']:
+        model.objects.update_or_create(**lookup, defaults={
+            'total_points': totals['total'] or 0, 'graded_count': totals['count'],
+        })
+    else:
+        model.objects.filter(**lookup).delete()
+
+
+def refresh_rollups(student_id, group_id, day):
+    start, end = day_bounds(day)
+    # created_at ustunida oddiy oraliq filtri, indeks ishlaydi
+    day_totals = Grade.objects.filter(
+        submission__student_id=student_id,
+        submission__homework__group_id=group_id,
+        created_at__gte=start,
+        created_at__lt=end,
+    ).aggregate(total=Sum(grade_score()), count=Count(grade_score()))
+
+    month = month_start(day)
+    with transaction.atomic():
+        _store(DailyGradeRollup, {'student_id': student_id, 'group_id': group_id, 'day': day}, day_totals)
+        month_totals = DailyGradeRollup.objects.filter(
+            student_id=student_id, group_id=group_id, day__gte=month, day__lt=next_month(month),
+        ).aggregate(total=Sum('total_points'), count=Sum('graded_count'))
+        _store(MonthlyGradeRollup, {'student_id': student_id, 'group_id': group_id, 'month': month}, month_totals)
+
+        rerank(DailyGradeRollup.objects.filter(group_id=group_id, day=day))
+        rerank(MonthlyGradeRollup.objects.filter(group_id=group_id, month=month))
+
+
+def rebuild_rollups(group_ids=None):
+    grades = Grade.objects.all()
+    daily = DailyGradeRollup.objects.all()
+    monthly = MonthlyGradeRollup.objects.all()
+    if group_ids:
+        grades = grades.filter(submission__homework__group_id__in=group_ids)
+        daily = daily.filter(group_id__in=group_ids)
+        monthly = monthly.filter(group_id__in=group_ids)
+
+    rows = grades.annotate(day=TruncDate('created_at', tzinfo=get_current_timezone())).values(
+        'submission__student_id', 'submission__homework__group_id', 'day'
+    ).annotate(total=Sum(grade_score()), count=Count(grade_score()))
+
+    with transaction.atomic():
+        daily.delete()
+        monthly.delete()
+        days, months = [], {}
+        for row in rows:
+            student_id, group_id = row['submission__student_id'], row['submission__homework__group_id']
+            days.append(DailyGradeRollup(student_id=student_id, group_id=group_id, day=row['day'],
+                                         total_points=row['total'] or 0, graded_count=row['count']))
+            month = months.setdefault((student_id, group_id, month_start(row['day'])), [0, 0])
+            month[0] += row['total'] or 0
+            month[1] += row['count']
+        DailyGradeRollup.objects.bulk_create(days, batch_size=500)
+        MonthlyGradeRollup.objects.bulk_create([
+            MonthlyGradeRollup(student_id=student_id, group_id=group_id, month=month, total_points=total,
+                               graded_count=count)
+            for (student_id, group_id, month), (total, count) in months.items()
+        ], batch_size=500)
+
+        for group_id, day in {(row.group_id, row.day) for row in days}:
+            rerank(DailyGradeRollup.objects.filter(group_id=group_id, day=day))
+        for group_id, month in {(group_id, month) for _, group_id, month in months}:
+            rerank(MonthlyGradeRollup.objects.filter(group_id=group_id, month=month))
@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now as current_time, localdate, localtime
+
+from apps.models import LeaderboardEntry, LeaderboardSnapshot, LeaderboardSnapshotEntry
+from apps.versions import bump_group_version
+
+__all__ = ('take_snapshot', 'take_snapshots', 'compact_snapshots', 'run_snapshot_job')
+
+DELTA_FIELDS = {
+    LeaderboardSnapshot.Period.DAILY: 'daily_rank_delta',
+    LeaderboardSnapshot.Period.WEEKLY: 'weekly_rank_delta',
+}
+
+
+def _retention():
+    return {
+        'daily_days': 14,
+        'weekly_weeks': 26,
+        'max_days': 365,
+        **getattr(settings, 'LEADERBOARD_SNAPSHOT_RETENTION', {}),
+    }
+
+
+def take_snapshot(group_id, period, taken_at=None):
+    taken_at = taken_at or current_time()
+    previous = LeaderboardSnapshot.objects.filter(group_id=group_id, period=period).order_by('-taken_at').first()
+    previous_ranks = dict(previous.entries.values_list('student_id', 'rank')) if previous else {}
+    rows = list(LeaderboardEntry.objects.filter(group_id=group_id).values_list('id', 'student_id', 'rank',
+                                                                               'total_points'))
+
+    entries, deltas = [], []
+    for entry_id, student_id, rank, total_points in rows:
+        previous_rank = previous_ranks.get(student_id)
+        delta = None if previous_rank is None else previous_rank - rank
+        entries.append(LeaderboardSnapshotEntry(student_id=student_id, rank=rank, total_points=total_points,
+                                                rank_delta=delta))
+        deltas.append(LeaderboardEntry(id=entry_id, **{DELTA_FIELDS[period]: delta}))
+
+    with transaction.atomic():
+        snapshot = LeaderboardSnapshot.objects.create(group_id=group_id, period=period, taken_at=taken_at)
+        for entry in entries:
+            entry.snapshot = snapshot
+        LeaderboardSnapshotEntry.objects.bulk_create(entries, batch_size=500)
+        LeaderboardEntry.objects.bulk_update(deltas, [DELTA_FIELDS[period]], batch_size=500)
+        # bulk_update signal yubormaydi: ETag'lar yangi deltalarni ko'rishi uchun versiya qo'lda oshiriladi
+        if deltas:
+            bump_group_version(group_id)
+    return snapshot
+
+
+def take_snapshots(period, taken_at=None):
+    taken_at = taken_at or current_time()
+    since = localtime(taken_at).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == LeaderboardSnapshot.Period.WEEKLY:
+        since -= timedelta(days=since.weekday())
+    # bir kunda/haftada ikki marta ishga tushsa takrorlanmasin
+    done = set(LeaderboardSnapshot.objects.filter(period=period, taken_at__gte=since).values_list('group_id',
+                                                                                                  flat=True))
+    group_ids = LeaderboardEntry.objects.values_list('group_id', flat=True).distinct()
+    return [take_snapshot(group_id, period, taken_at) for group_id in group_ids if group_id not in done]
+
+
+def compact_snapshots(now=None):
+    """
+    Daily snapshots live ``daily_days``; weekly ones are kept for ``weekly_weeks``
+    and then thinned to the first snapshot of each month until ``max_days``.
+    """
+    now = now or current_time()
+    retention = _retention()
+    snapshots = LeaderboardSnapshot.objects.all()
+    deleted = snapshots.filter(period=LeaderboardSnapshot.Period.DAILY,
+                               taken_at__lt=now - timedelta(days=retention['daily_days'])).delete()[0]
+    deleted += snapshots.filter(taken_at__lt=now - timedelta(days=retention['max_days'])).delete()[0]
+
+    old_weekly = snapshots.filter(period=LeaderboardSnapshot.Period.WEEKLY,
+                                  taken_at__lt=now - timedelta(weeks=retention['weekly_weeks']))
+    keep, drop = set(), []
+    for snapshot_id, group_id, taken_at in old_weekly.order_by('taken_at').values_list('id', 'group_id',
+                                                                                      'taken_at'):
+        month = (group_id, localdate(taken_at).replace(day=1))
+        if month in keep:
+            drop.append(snapshot_id)
+        else:
+            keep.add(month)
+    if drop:
+        deleted += LeaderboardSnapshot.objects.filter(id__in=drop).delete()[0]
+    return deleted
+
+
+def run_snapshot_job(now=None):
+    now = now or current_time()
+    created = take_snapshots(LeaderboardSnapshot.Period.DAILY, now)
+    if localdate(now).weekday() == getattr(settings, 'LEADERBOARD_WEEKLY_SNAPSHOT_WEEKDAY', 0):
+        created += take_snapshots(LeaderboardSnapshot.Period.WEEKLY, now)
+    return created, compact_snapshots(now)
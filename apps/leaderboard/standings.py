@@ -0,0 +1,78 @@
+from django.db import transaction
+from django.db.models import Sum, Count, F, Window
+from django.db.models.functions import Coalesce, Rank
+
+from apps.leaderboard.index import get_rank_index
+from apps.models import Grade, LeaderboardEntry
+
+__all__ = ('grade_score', 'refresh_standing', 'rerank', 'rebuild_standings')
+
+
+def grade_score():
+    # O'qituvchi bahosi bo'lsa o'sha, bo'lmasa AI bahosi hisoblanadi
+    return Coalesce('teacher_total', 'ai_total')
+
+
+def rerank(queryset):
+    """Competition ranks (1, 2, 2, 4) by total_points come from RANK(); only rows that moved are saved."""
+    model = queryset.model
+    rows = queryset.annotate(
+        new_rank=Window(Rank(), order_by=F('total_points').desc()),
+    ).values_list('id', 'rank', 'new_rank')
+    changed = [model(id=pk, rank=new_rank) for pk, rank, new_rank in rows if rank != new_rank]
+    model.objects.bulk_update(changed, ['rank'], batch_size=500)
+    return changed
+
+
+def refresh_standing(student_id, group_id):
+    # Faqat shu talabaning shu guruhdagi baholari yig'iladi, butun Grade jadvali emas
+    totals = Grade.objects.filter(
+        submission__student_id=student_id,
+        submission__homework__group_id=group_id,
+    ).aggregate(total=Sum(grade_score()), count=Count(grade_score()))
+
+    index = get_rank_index()
+    with transaction.atomic():
+        if totals['count']:
+            total = totals['total'] or 0
+            LeaderboardEntry.objects.update_or_create(
+                student_id=student_id,
+                group_id=group_id,
+                defaults={'total_points': total, 'graded_count': totals['count']},
+            )
+            transaction.on_commit(lambda: index.update(group_id, student_id, total))
+        else:
+            LeaderboardEntry.objects.filter(student_id=student_id, group_id=group_id).delete()
+            transaction.on_commit(lambda: index.remove(group_id, student_id))
+        rerank(LeaderboardEntry.objects.filter(group_id=group_id))
+
+
+def rebuild_standings(group_ids=None):
+    grades = Grade.objects.all()
+    if group_ids:
+        grades = grades.filter(submission__homework__group_id__in=group_ids)
+    rows = grades.values('submission__student_id', 'submission__homework__group_id').annotate(
+        total=Sum(grade_score()), count=Count(grade_score())
+    ).annotate(
+        rank=Window(Rank(), partition_by=F('submission__homework__group_id'), order_by=F('total').desc()),
+    )
+
+    with transaction.atomic():
+        entries = LeaderboardEntry.objects.all()
+        if group_ids:
+            entries = entries.filter(group_id__in=group_ids)
+        entries.delete()
+        LeaderboardEntry.objects.bulk_create([
+            LeaderboardEntry(
+                student_id=row['submission__student_id'],
+                group_id=row['submission__homework__group_id'],
+                total_points=row['total'] or 0,
+                graded_count=row['count'],
+                rank=row['rank'],
+            )
+            for row in rows
+        ], batch_size=500)
+
+    index = get_rank_index()
+    for group_id in group_ids or LeaderboardEntry.objects.values_list('group_id', flat=True).distinct():
+        index.rebuild(group_id)
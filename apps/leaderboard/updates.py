@@ -0,0 +1,38 @@
+from django.db.models.functions import TruncDate
+from django.utils.timezone import localdate, get_current_timezone
+
+from apps.leaderboard.rollups import refresh_rollups, rebuild_rollups
+from apps.leaderboard.standings import refresh_standing, rebuild_standings
+from apps.versions import bump_group_version
+from apps.leaderboard.levels import refresh_student_level
+from authenticate.models import Group
+
+__all__ = ('grade_key', 'refresh_for_grade', 'refresh_for_grades', 'rebuild_all')
+
+
+def grade_key(grade):
+    submission = grade.submission
+    return submission.student_id, submission.homework.group_id, localdate(grade.created_at)
+
+
+def refresh_for_grade(student_id, group_id, day):
+    refresh_standing(student_id, group_id)
+    refresh_rollups(student_id, group_id, day)
+    refresh_student_level(student_id)
+    bump_group_version(group_id)
+
+
+def refresh_for_grades(queryset):
+    """For bulk ``update()``/``delete()`` calls that bypass the Grade signals."""
+    keys = set(queryset.annotate(day=TruncDate('created_at', tzinfo=get_current_timezone())).values_list(
+        'submission__student_id', 'submission__homework__group_id', 'day'))
+    for key in keys:
+        refresh_for_grade(*key)
+    return keys
+
+
+def rebuild_all(group_ids=None):
+    rebuild_standings(group_ids)
+    rebuild_rollups(group_ids)
+    for group_id in group_ids or Group.objects.values_list('id', flat=True):
+        bump_group_version(group_id)
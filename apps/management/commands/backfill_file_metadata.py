@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.blobs import backfill_file_metadata
+
+
+class Command(BaseCommand):
+    help = "Store sha256 and size for submission files uploaded before they were recorded"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--start-after', type=int, default=0,
+                            help='Resume after this file id (printed after each chunk)')
+        parser.add_argument('--relocate', action='store_true',
+                            help='Also move the files into content-addressed storage (deduplicated)')
+
+    def handle(self, *args, chunk_size=500, start_after=0, relocate=False, **options):
+        processed = updated = missing = 0
+        for last_id, count, changed, lost in backfill_file_metadata(chunk_size, start_after, relocate):
+            processed, updated, missing = processed + count, updated + changed, missing + lost
+            self.stdout.write(f"... id={last_id} gacha: {processed} ta fayl, {updated} ta yangilandi")
+        self.stdout.write(self.style.SUCCESS(
+            f"{processed} ta fayl tekshirildi, {updated} ta yangilandi, {missing} ta fayl diskda topilmadi."))
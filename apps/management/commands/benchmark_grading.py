@@ -0,0 +1,81 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.grading import FakeModelServer, create_benchmark_homework, delete_benchmark_homework, run_benchmark
+from apps.models import GradingJob
+
+
+class Command(BaseCommand):
+    help = ("Grade N synthetic submissions against a local fake model server and report throughput, "
+            "latency, queue wait and DB write time (offline; stop grading_worker services first)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--submissions', type=int, default=200, help='Synthetic submissions to grade')
+        parser.add_argument('--files', type=int, default=1, help='Files per submission')
+        parser.add_argument('--lines', type=int, default=40, help='Lines per file')
+        parser.add_argument('--duplicates', type=float, default=0.0,
+                            help='Share of submissions copying an earlier one (exercises the cache)')
+        parser.add_argument('--workers', type=int, default=1, help='GradingWorker processes to simulate (threads)')
+        parser.add_argument('--concurrency', type=int,
+                            help='Model requests in flight per worker (default: AI_GRADING CONCURRENCY)')
+        parser.add_argument('--batch', type=int, help='Submissions per model call (default: AI_GRADING BATCH)')
+        parser.add_argument('--stream', action='store_true', default=None, help='Stream feedback')
+        parser.add_argument('--no-stream', action='store_false', dest='stream', help='Do not stream feedback')
+        parser.add_argument('--latency', type=float, default=0.5, help='Model seconds per call')
+        parser.add_argument('--jitter', type=float, default=0.2, help='Extra random model seconds, up to')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of calls answering HTTP 500')
+        parser.add_argument('--rate-limit', type=float, help='Model calls per second before HTTP 429')
+        parser.add_argument('--retry-delay', type=float, default=1.0, help='Seconds before retrying a failed call')
+        parser.add_argument('--timeout', type=float, default=600, help='Give up after this many seconds')
+        parser.add_argument('--seed', type=int, help='Seed for submissions, latency and errors')
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic group, students and grades')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        if GradingJob.objects.filter(status__in=(GradingJob.Status.PENDING, GradingJob.Status.RUNNING)).exists():
+            raise CommandError("Baholash navbati bo'sh emas: benchmark ularni ham soxta modelga yuborgan bo'lardi.")
+        homework = create_benchmark_homework(options['submissions'], files=options['files'], lines=options['lines'],
+                                             duplicates=options['duplicates'], seed=options['seed'])
+        try:
+            with FakeModelServer(latency=options['latency'], jitter=options['jitter'],
+                                 error_rate=options['error_rate'], rate_limit=options['rate_limit'],
+                                 seed=options['seed']) as server:
+                report = run_benchmark(homework, server, workers=options['workers'],
+                                       concurrency=options['concurrency'], batch=options['batch'],
+                                       stream=options['stream'], retry_delay=options['retry_delay'],
+                                       use_cache=options['duplicates'] > 0, timeout=options['timeout'])
+        finally:
+            if not options['keep']:
+                delete_benchmark_homework(homework)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self._print(report)
+
+    def _print(self, report):
+        def line(name, values, unit='s', scale=1):
+            cells = ', '.join(f"p{point} {value * scale:.2f} {unit}" if value is not None else f'p{point} -'
+                              for point, value in values.items())
+            self.stdout.write(f"  {name}: {cells}")
+
+        server = report['server']
+        stream = 'ha' if report['stream'] else "yo'q"
+        self.stdout.write(f"{report['submissions']} ta topshiriq, {report['workers']} worker x "
+                          f"{report['concurrency']} so'rov, guruh {report['batch']}, "
+                          f"oqim {stream}")
+        self.stdout.write(f"  model: {server.get('requests', 0)} so'rov, {server.get('rate_limited', 0)} ta 429, "
+                          f"{server.get('errors', 0)} ta 500")
+        line('baholash (navbatdan saqlangunicha)', report['latency'])
+        line('model javobi', report['model'])
+        line('navbatda kutish', report['queue_wait'])
+        line('DB yozish', report['db_write'], 'ms', 1000)
+        self.stdout.write(f"  DB da jami {report['db_seconds']:.2f} s, {report['retried']} ta qayta urinish, "
+                          f"{report['batched']} tasi guruhlab, {report['cache_hits']} tasi keshdan")
+        message = (f"{report['done']} ta {report['seconds']:.1f} s da baholandi: "
+                   f"{report['throughput']:.2f} ta/s ({report['throughput'] * 60:.0f} ta/daqiqa)")
+        if report['failed'] or report['unfinished']:
+            self.stdout.write(self.style.WARNING(f"{message}; {report['failed']} ta xato, "
+                                                 f"{report['unfinished']} ta tugamadi."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{message}."))
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.blobs import collect_garbage
+from apps.resumable import expire_sessions
+
+
+class Command(BaseCommand):
+    help = "Delete unreferenced submission blobs and expired resumable upload sessions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-minutes', type=int, default=60,
+                            help='Keep blobs touched within this many minutes (in-flight uploads)')
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be deleted")
+
+    def handle(self, *args, grace_minutes=60, dry_run=False, **options):
+        expired = 0 if dry_run else expire_sessions()
+        deleted, freed = collect_garbage(timedelta(minutes=grace_minutes), dry_run=dry_run)
+        verb = "o'chiriladi" if dry_run else "o'chirildi"
+        self.stdout.write(self.style.SUCCESS(
+            f"{deleted} ta blob {verb}, {freed} bayt bo'shadi, {expired} ta eskirgan yuklash bekor qilindi."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.grading import enqueue_grading
+from apps.models import Submission
+
+
+class Command(BaseCommand):
+    help = "Queue submissions for AI grading (only ungraded ones unless --all)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--homework', type=int, action='append', help='Homework id (repeatable)')
+        parser.add_argument('--all', action='store_true', help='Also regrade submissions that already have an AI grade')
+        parser.add_argument('--no-cache', action='store_true', help='Ask the model even for content graded before')
+
+    def handle(self, *args, homework=None, all=False, no_cache=False, **options):
+        submissions = Submission.objects.all()
+        if homework:
+            submissions = submissions.filter(homework_id__in=homework)
+        if not all:
+            submissions = submissions.filter(ai_grade__isnull=True)
+        queued = enqueue_grading(submissions.values_list('id', flat=True), use_cache=not no_cache)
+        self.stdout.write(self.style.SUCCESS(f"{queued} ta topshiriq baholash navbatiga qo'yildi."))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from apps.grading import GradingWorker, grading_stats
+
+
+class Command(BaseCommand):
+    help = "Grade queued submissions with the configured AI backend, several requests at a time"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int,
+                            help='Model requests in flight (default: AI_GRADING CONCURRENCY)')
+        parser.add_argument('--idle', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Grade what is due now and exit')
+        parser.add_argument('--stats', action='store_true', help='Only print job counts')
+
+    def handle(self, *args, concurrency=None, idle=1.0, once=False, stats=False, **options):
+        if stats:
+            row = grading_stats()
+            avg = f"{row['avg_ms']:.0f}" if row['avg_ms'] is not None else '-'
+            self.stdout.write(f"jami {row['total']}, kutmoqda {row['pending']}, ishlamoqda {row['running']}, "
+                              f"tayyor {row['done']}, xato {row['failed']}; o'rtacha {avg} ms")
+            self.stdout.write(f"kesh: {row['cache_hits']} ta topildi, {row['cache_misses']} ta model so'rovi; "
+                              f"~{row['saved_ms'] / 1000:.0f} s tejaldi")
+            for group in row['groups']:
+                oldest = f"{group['oldest_wait']:.0f} s" if group['oldest_wait'] is not None else '-'
+                wait = f"{group['avg_wait']:.0f} s" if group['avg_wait'] is not None else '-'
+                self.stdout.write(f"  {group['name'] or '-'}: kutmoqda {group['pending']}, "
+                                  f"ishlamoqda {group['running']}, eng uzoq kutgan {oldest}; "
+                                  f"so'nggi oynada {group['started']} ta ({group['share']:.0%}), o'rtacha kutish {wait}")
+            return
+        result = GradingWorker(concurrency=concurrency).run(once=once, idle=idle)
+        self.stdout.write(self.style.SUCCESS(f"{result['done']} ta topshiriq baholandi, {result['failed']} ta xato, "
+                                             f"{result['retried']} ta qayta navbatga qo'yildi, "
+                                             f"{result['cache_hits']} tasi keshdan, "
+                                             f"{result['batched']} tasi guruhlab."))
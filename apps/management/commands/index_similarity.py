@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.models import SubmissionFile
+from apps.similarity import index_files
+
+
+class Command(BaseCommand):
+    help = "Fingerprint submission files that are not in the similarity index yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--homework', type=int, action='append', dest='homeworks',
+                            help='Only index the given homework id (can be repeated)')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, homeworks=None, chunk_size=500, **options):
+        files = SubmissionFile.objects.filter(fingerprint__isnull=True).order_by('id')
+        if homeworks:
+            files = files.filter(submission__homework_id__in=homeworks)
+        indexed, last_id = 0, 0
+        while chunk := list(files.filter(id__gt=last_id)[:chunk_size]):
+            indexed += index_files(chunk)
+            last_id = chunk[-1].id
+        self.stdout.write(self.style.SUCCESS(f"{indexed} ta fayl o'xshashlik indeksiga qo'shildi."))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from apps.pipeline import run_worker, pipeline_stats
+
+
+class Command(BaseCommand):
+    help = "Run the post-upload pipeline stages (similarity, highlight, ...) for new submission files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=20, help='Tasks claimed per round')
+        parser.add_argument('--idle', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Process what is due now and exit')
+        parser.add_argument('--stats', action='store_true', help='Only print per-stage counts and timings')
+
+    def handle(self, *args, batch=20, idle=1.0, once=False, stats=False, **options):
+        if stats:
+            for row in pipeline_stats():
+                avg = f"{row['avg_ms']:.0f}" if row['avg_ms'] is not None else '-'
+                self.stdout.write(f"{row['stage']}: jami {row['total']}, kutmoqda {row['pending']}, "
+                                  f"ishlamoqda {row['running']}, tayyor {row['done']}, xato {row['failed']}, "
+                                  f"o'tkazildi {row['skipped']}; o'rtacha {avg} ms, eng ko'p {row['max_ms'] or '-'} ms")
+            return
+        processed = run_worker(batch, idle, once)
+        self.stdout.write(self.style.SUCCESS(f"{processed} ta vazifa bajarildi."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from apps.leaderboard import rebuild_all
+from apps.models import LeaderboardEntry
+
+
+class Command(BaseCommand):
+    help = "Rebuild the leaderboard standings and daily/monthly rollups from existing grades"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', type=int, action='append', dest='groups',
+                            help='Only rebuild the given group id (can be repeated)')
+
+    def handle(self, *args, groups=None, **options):
+        rebuild_all(groups)
+        count = LeaderboardEntry.objects.filter(group_id__in=groups).count() if groups else \
+            LeaderboardEntry.objects.count()
+        self.stdout.write(self.style.SUCCESS(f"{count} ta reyting qatori qayta hisoblandi."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from apps.leaderboard import recompute_levels
+
+
+class Command(BaseCommand):
+    help = "Recompute every student's XP and level from graded points in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--start-after', type=int, default=0,
+                            help='Resume after this user id (printed after each chunk)')
+
+    def handle(self, *args, chunk_size=500, start_after=0, **options):
+        processed = updated = 0
+        for last_id, count, changed in recompute_levels(chunk_size, start_after):
+            processed += count
+            updated += changed
+            self.stdout.write(f"... id={last_id} gacha: {processed} ta talaba, {updated} ta yangilandi")
+        self.stdout.write(self.style.SUCCESS(f"{processed} ta talaba tekshirildi, {updated} ta daraja yangilandi."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.leaderboard import take_snapshots, compact_snapshots, run_snapshot_job
+from apps.models import LeaderboardSnapshot
+
+
+class Command(BaseCommand):
+    help = "Take leaderboard snapshots (rank, score, rank delta) and compact old ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', choices=LeaderboardSnapshot.Period.values,
+                            help="Only take this period's snapshot (default: daily, plus weekly on the configured day)")
+        parser.add_argument('--compact-only', action='store_true', help='Only thin/delete old snapshots')
+
+    def handle(self, *args, period=None, compact_only=False, **options):
+        if compact_only:
+            created, deleted = [], compact_snapshots()
+        elif period:
+            created, deleted = take_snapshots(period), compact_snapshots()
+        else:
+            created, deleted = run_snapshot_job()
+        self.stdout.write(self.style.SUCCESS(f"{len(created)} ta snapshot olindi, {deleted} ta yozuv o'chirildi."))
@@ -1,5 +1,11 @@
+from uuid import uuid4
+
 from django.db.models import ForeignKey, CASCADE, TextField, DateTimeField, SET_NULL, TextChoices
 from django.db.models import Model, IntegerField, DateField,DecimalField,CharField,FileField
+from django.db.models import PositiveIntegerField, UniqueConstraint, Index, PositiveBigIntegerField
+from django.db.models import OneToOneField, BinaryField, BigIntegerField, UUIDField, JSONField, Q, BooleanField, FloatField
+
+from apps.storage import blob_path, get_submission_storage, PARTS_PREFIX
 
 
 class Homework(Model):
@@ -35,6 +41,11 @@ class Homework(Model):
     ai_grading_prompt = TextField()
     created_at = DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            Index(fields=('created_at', 'id')),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -43,26 +54,43 @@ class Submission(Model):
     homework = ForeignKey('apps.Homework', on_delete=CASCADE, related_name='submissions')
     student = ForeignKey('authenticate.User', on_delete=CASCADE, related_name='submissions')
     submitted_at = DateTimeField(auto_now_add=True)
-    ai_grade = IntegerField()
-    final_grade = IntegerField()
-    ai_feedback = TextField()
+    # AI tekshirguncha bo'sh turadi
+    ai_grade = IntegerField(null=True, blank=True)
+    final_grade = IntegerField(null=True, blank=True)
+    ai_feedback = TextField(blank=True, default='')
     created_at = DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            Index(fields=('created_at', 'id')),
+            Index(fields=('homework', 'student')),
+            Index(fields=('student', 'homework')),
+        ]
+
 
 class SubmissionFile(Model):
+    class ProcessingStatus(TextChoices):
+        PENDING = 'pending', 'Pending'
+        READY = 'ready', 'Ready'
+        FAILED = 'failed', 'Failed'
+
     submission = ForeignKey('apps.Submission', on_delete=CASCADE, related_name='files')
     file_name = CharField(max_length=255)
-    content = FileField()
+    content = FileField(upload_to=blob_path, storage=get_submission_storage, max_length=255)
     line_count = IntegerField()
+    sha256 = CharField(max_length=64, blank=True, db_index=True)
+    size_bytes = PositiveBigIntegerField(default=0)
+    processing_status = CharField(max_length=10, choices=ProcessingStatus, default=ProcessingStatus.READY)
 
 
 class Grade(Model):
     submission = ForeignKey('apps.Submission', on_delete=CASCADE, related_name='grades')
 
-    ai_task_completeness = DecimalField(max_digits=5, decimal_places=2)
-    ai_code_quality = DecimalField(max_digits=5, decimal_places=2)
-    ai_correctness = DecimalField(max_digits=5, decimal_places=2)
-    ai_total = DecimalField(max_digits=5, decimal_places=2)
+    # AI javobi oqim bilan kelayotganda izoh bor, ballar hali yo'q
+    ai_task_completeness = DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    ai_code_quality = DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    ai_correctness = DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    ai_total = DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
 
     final_task_completeness = DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     final_code_quality = DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
@@ -79,5 +107,239 @@ class Grade(Model):
     created_at = DateTimeField(auto_now_add=True)
     updated_at = DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            Index(fields=('submission', 'created_at')),
+        ]
+
     def __str__(self):
         return f"Grade for submission {self.submission_id}"
+
+
+class LeaderboardEntry(Model):
+    student = ForeignKey('authenticate.User', on_delete=CASCADE, related_name='leaderboard_entries')
+    group = ForeignKey('authenticate.Group', on_delete=CASCADE, related_name='leaderboard_entries')
+    total_points = DecimalField(max_digits=10, decimal_places=2, default=0)
+    graded_count = PositiveIntegerField(default=0)
+    rank = PositiveIntegerField(default=0)
+    # oxirgi snapshot vaqtida hisoblangan o'zgarish (musbat = yuqoriga ko'tarilgan)
+    daily_rank_delta = IntegerField(null=True, blank=True)
+    weekly_rank_delta = IntegerField(null=True, blank=True)
+    updated_at = DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=('student', 'group'), name='unique_leaderboard_entry'),
+        ]
+        indexes = [
+            Index(fields=('group', 'rank')),
+            Index(fields=('group', 'total_points')),
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} {self.student_id} in group {self.group_id}"
+
+
+class DailyGradeRollup(Model):
+    student = ForeignKey('authenticate.User', on_delete=CASCADE, related_name='daily_rollups')
+    group = ForeignKey('authenticate.Group', on_delete=CASCADE, related_name='daily_rollups')
+    day = DateField()
+    total_points = DecimalField(max_digits=10, decimal_places=2, default=0)
+    graded_count = PositiveIntegerField(default=0)
+    rank = PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=('student', 'group', 'day'), name='unique_daily_rollup'),
+        ]
+        indexes = [
+            Index(fields=('group', 'day', 'total_points')),
+        ]
+
+
+class MonthlyGradeRollup(Model):
+    student = ForeignKey('authenticate.User', on_delete=CASCADE, related_name='monthly_rollups')
+    group = ForeignKey('authenticate.Group', on_delete=CASCADE, related_name='monthly_rollups')
+    month = DateField()  # oyning birinchi kuni
+    total_points = DecimalField(max_digits=10, decimal_places=2, default=0)
+    graded_count = PositiveIntegerField(default=0)
+    rank = PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=('student', 'group', 'month'), name='unique_monthly_rollup'),
+        ]
+        indexes = [
+            Index(fields=('group', 'month', 'total_points')),
+        ]
+
+
+class GroupVersion(Model):
+    # FK emas: guruh o'chirilayotgan tranzaksiya ichida ham versiyani oshirish mumkin bo'lsin
+    group_id = PositiveBigIntegerField(primary_key=True)
+    version = PositiveBigIntegerField(default=0)
+    updated_at = DateTimeField()
+
+
+class LeaderboardSnapshot(Model):
+    class Period(TextChoices):
+        DAILY = 'daily', 'Daily'
+        WEEKLY = 'weekly', 'Weekly'
+
+    group = ForeignKey('authenticate.Group', on_delete=CASCADE, related_name='leaderboard_snapshots')
+    period = CharField(max_length=10, choices=Period)
+    taken_at = DateTimeField()
+
+    class Meta:
+        indexes = [
+            Index(fields=('group', 'period', 'taken_at')),
+        ]
+
+
+class LeaderboardSnapshotEntry(Model):
+    snapshot = ForeignKey('apps.LeaderboardSnapshot', on_delete=CASCADE, related_name='entries')
+    student = ForeignKey('authenticate.User', on_delete=CASCADE, related_name='snapshot_entries')
+    rank = PositiveIntegerField()
+    total_points = DecimalField(max_digits=10, decimal_places=2)
+    rank_delta = IntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            Index(fields=('student', 'snapshot')),
+        ]
+
+
+class StoredBlob(Model):
+    # bitta hash - bitta fayl; ref_count nechta SubmissionFile unga ishora qilishini bildiradi
+    sha256 = CharField(max_length=64, primary_key=True)
+    size_bytes = PositiveBigIntegerField(default=0)
+    ref_count = PositiveIntegerField(default=0)
+    created_at = DateTimeField(auto_now_add=True)
+    updated_at = DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            Index(fields=('ref_count', 'updated_at')),
+        ]
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count})"
+
+
+class FileFingerprint(Model):
+    file = OneToOneField('apps.SubmissionFile', on_delete=CASCADE, primary_key=True, related_name='fingerprint')
+    homework = ForeignKey('apps.Homework', on_delete=CASCADE, related_name='fingerprints')
+    submission = ForeignKey('apps.Submission', on_delete=CASCADE, related_name='fingerprints')
+    signature = BinaryField()  # MinHash: array('Q') baytlari
+    token_count = PositiveIntegerField(default=0)
+    created_at = DateTimeField(auto_now_add=True)
+
+
+class SimilarityBucket(Model):
+    # LSH: har bir band uchun bitta qator; bir xil key - o'xshashlikka nomzod
+    homework = ForeignKey('apps.Homework', on_delete=CASCADE, related_name='similarity_buckets')
+    key = BigIntegerField()
+    fingerprint = ForeignKey('apps.FileFingerprint', on_delete=CASCADE, related_name='buckets')
+
+    class Meta:
+        constraints = [
+            # qayta indekslash (pipeline retry, index_similarity) bir xil qatorlarni ko'paytirmaydi;
+            # (homework, key) bo'yicha qidiruv ham shu indeksdan foydalanadi
+            UniqueConstraint(fields=('homework', 'key', 'fingerprint'), name='unique_similarity_bucket'),
+        ]
+
+
+class UploadSession(Model):
+    id = UUIDField(primary_key=True, default=uuid4, editable=False)
+    student = ForeignKey('authenticate.User', on_delete=CASCADE, related_name='upload_sessions')
+    submission = ForeignKey('apps.Submission', on_delete=CASCADE, related_name='upload_sessions')
+    file_name = CharField(max_length=255)
+    size = PositiveBigIntegerField()
+    offset = PositiveBigIntegerField(default=0)
+    # qator sanagich va dekoder holati: keyingi bo'lak boshqa workerga tushsa ham davom etadi
+    state = JSONField(default=dict)
+    created_at = DateTimeField(auto_now_add=True)
+    updated_at = DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            Index(fields=('updated_at',)),
+        ]
+
+    @property
+    def part_name(self):
+        return f'{PARTS_PREFIX}/{self.pk}.part'
+
+
+class ProcessingTask(Model):
+    class Status(TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+        SKIPPED = 'skipped', 'Skipped'
+
+    file = ForeignKey('apps.SubmissionFile', on_delete=CASCADE, related_name='processing_tasks')
+    stage = CharField(max_length=50)
+    status = CharField(max_length=10, choices=Status, default=Status.PENDING)
+    attempts = PositiveIntegerField(default=0)
+    available_at = DateTimeField()  # qayta urinish shu vaqtdan keyin
+    started_at = DateTimeField(null=True, blank=True)
+    finished_at = DateTimeField(null=True, blank=True)
+    duration_ms = PositiveIntegerField(null=True, blank=True)
+    last_error = TextField(blank=True, default='')
+    created_at = DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=('file', 'stage'), name='unique_processing_task'),
+        ]
+        indexes = [
+            Index(fields=('status', 'available_at')),
+            Index(fields=('stage', 'status')),
+        ]
+
+    def __str__(self):
+        return f"{self.stage} #{self.file_id} ({self.status})"
+
+
+class GradingJob(Model):
+    class Status(TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    submission = ForeignKey('apps.Submission', on_delete=CASCADE, related_name='grading_jobs')
+    # navbatni adolatli taqsimlash uchun homework'dan nusxa
+    group = ForeignKey('authenticate.Group', on_delete=CASCADE, related_name='grading_jobs', null=True)
+    teacher = ForeignKey('authenticate.User', on_delete=SET_NULL, related_name='+', null=True)
+    status = CharField(max_length=10, choices=Status, default=Status.PENDING)
+    # kichigi oldin: deadline, topshirilgan vaqt va qayta baholashdan (apps.grading.scheduling)
+    sort_key = FloatField(default=0)
+    regrade = BooleanField(default=False)
+    attempts = PositiveIntegerField(default=0)
+    available_at = DateTimeField()
+    started_at = DateTimeField(null=True, blank=True)
+    finished_at = DateTimeField(null=True, blank=True)
+    duration_ms = PositiveIntegerField(null=True, blank=True)
+    last_error = TextField(blank=True, default='')
+    # False - keshdagi natija e'tiborga olinmaydi (qayta baholash)
+    use_cache = BooleanField(default=True)
+    cache_hit = BooleanField(default=False)
+    created_at = DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # bitta topshiriq uchun navbatda faqat bitta ochiq vazifa
+            UniqueConstraint(fields=('submission',), condition=Q(status__in=('pending', 'running')),
+                             name='unique_open_grading_job'),
+        ]
+        indexes = [
+            Index(fields=('status', 'available_at')),
+            Index(fields=('status', 'group', 'sort_key')),
+            Index(fields=('started_at', 'group')),
+        ]
+
+    def __str__(self):
+        return f"Grading #{self.submission_id} ({self.status})"
@@ -0,0 +1,148 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import and_, or_
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination over a stable, unique ordering.
+
+    The cursor holds the ordering values of the boundary row, so every page is an
+    index range read no matter how deep it is. Views pick the ordering with
+    ``pagination_ordering``; the last field must be unique (normally ``id``).
+    """
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('-id',)
+    invalid_cursor_message = "Cursor noto'g'ri"
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, 'pagination_ordering', self.ordering))
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def encode_cursor(self, values, reverse=False):
+        payload = json.dumps({'v': values, 'r': reverse}, default=str, separators=(',', ':'))
+        cursor = urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            values, reverse = payload['v'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        if not all(value is None or isinstance(value, (str, int, float)) for value in values):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    @staticmethod
+    def keyset_filter(fields, values):
+        # (a, b) > (x, y)  =>  a > x OR (a = x AND b > y)
+        branches = []
+        for position, (name, descending) in enumerate(fields):
+            equal = [Q(**{field: value}) for (field, _), value in zip(fields[:position], values)]
+            seek = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[position]})
+            branches.append(reduce(and_, equal + [seek]))
+        return reduce(or_, branches)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.cursor_query_param)
+        self.page_size_value = self.get_page_size(request)
+        ordering = self.get_ordering(view)
+        self.fields = [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+
+        values, reverse = self.decode_cursor(request)
+        fields = [(name, descending != reverse) for name, descending in self.fields]
+        queryset = queryset.order_by(*[('-' if descending else '') + name for name, descending in fields])
+        if values is not None:
+            try:
+                queryset = queryset.filter(self.keyset_filter(fields, values))
+            except (TypeError, ValueError, DjangoValidationError):
+                # qo'lda o'zgartirilgan cursor: qiymat maydon turiga mos kelmaydi
+                raise NotFound(self.invalid_cursor_message)
+
+        rows = list(queryset[:self.page_size_value + 1])
+        has_more = len(rows) > self.page_size_value
+        rows = rows[:self.page_size_value]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = has_more if not reverse else values is not None
+        self.has_previous = has_more if reverse else values is not None
+        self.first_row = rows[0] if rows else None
+        self.last_row = rows[-1] if rows else None
+        return rows
+
+    def row_values(self, row):
+        # .values() querysetlari lug'at qaytaradi
+        if isinstance(row, dict):
+            return [row[name] for name, _ in self.fields]
+        return [getattr(row, name) for name, _ in self.fields]
+
+    def get_next_link(self):
+        if not self.has_next or self.last_row is None:
+            return None
+        return self.encode_cursor(self.row_values(self.last_row))
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_row is None:
+            return None
+        return self.encode_cursor(self.row_values(self.first_row), reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Number of results to return per page (max {self.max_page_size}).',
+                'schema': {'type': 'integer'},
+            },
+        ]
@@ -0,0 +1,187 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, sleep
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Avg, Max, Q
+from django.utils.timezone import now as current_time
+
+from apps import queue
+from apps.grading import grading_config, enqueue_grading
+from apps.highlight import render_file, cache_is_shared
+from apps.models import ProcessingTask, SubmissionFile
+from apps.similarity import index_files
+
+logger = logging.getLogger(__name__)
+Status = ProcessingTask.Status
+STAGES = {}
+# nom -> bosqich foydali bo'ladimi (sozlamadan tashqari shart)
+CONDITIONS = {}
+_executor = None
+
+
+def stage(name, when=None):
+    """
+    Registers a post-upload stage: ``func(file)``, run once per SubmissionFile by the workers.
+    A stage whose ``when()`` is false is left out as if it were switched off in STAGES.
+    """
+
+    def register(func):
+        STAGES[name] = func
+        if when is not None:
+            CONDITIONS[name] = when
+        return func
+
+    return register
+
+
+@stage('similarity')
+def similarity_stage(file):
+    index_files([file])
+
+
+@stage('highlight', when=cache_is_shared)
+def highlight_stage(file):
+    # web jarayonlari o'qiydigan keshni oldindan isitadi; LocMem keshda bu bosqich yaratilmaydi
+    render_file(file)
+
+
+def pipeline_config():
+    return {
+        'STAGES': {},
+        'MAX_ATTEMPTS': 3,
+        'RETRY_DELAY': 30,
+        'STALE_AFTER': 600,
+        'IN_PROCESS': False,
+        **getattr(settings, 'SUBMISSION_PIPELINE', {}),
+    }
+
+
+def enabled_stages():
+    config = pipeline_config()['STAGES']
+    return [name for name in STAGES if config.get(name, True) and (name not in CONDITIONS or CONDITIONS[name]())]
+
+
+def enqueue(files):
+    """
+    One task per enabled stage; the file stays ``pending`` until every task has settled.
+    Every upload path ends here, so with AI_GRADING['AUTO_ENQUEUE'] the submissions are
+    also queued for grading once the upload commits.
+    """
+    files = [file for file in files if file.pk]
+    stages = enabled_stages()
+    if not files:
+        return 0
+    if grading_config()['AUTO_ENQUEUE']:
+        submission_ids = {file.submission_id for file in files}
+        transaction.on_commit(lambda: enqueue_grading(submission_ids))
+    now = current_time()
+    ProcessingTask.objects.bulk_create([ProcessingTask(file_id=file.pk, stage=name, available_at=now)
+                                        for file in files for name in stages], ignore_conflicts=True)
+    status = SubmissionFile.ProcessingStatus.PENDING if stages else SubmissionFile.ProcessingStatus.READY
+    SubmissionFile.objects.filter(pk__in=[file.pk for file in files]).update(processing_status=status)
+    for file in files:
+        file.processing_status = status
+    if stages and pipeline_config()['IN_PROCESS']:
+        transaction.on_commit(_kick)
+    return len(files) * len(stages)
+
+
+def _claim(limit, now):
+    tasks = ProcessingTask.objects.order_by('available_at', 'id')
+    claimed = queue.claim_due(tasks, limit, now, Status.PENDING, Status.RUNNING)
+    return list(ProcessingTask.objects.filter(pk__in=claimed).select_related('file__submission__homework'))
+
+
+def requeue_stale(now=None):
+    config = pipeline_config()
+    return queue.requeue_stale(ProcessingTask.objects.all(), now or current_time(), config['STALE_AFTER'],
+                               Status.PENDING, Status.RUNNING, Status.FAILED, config['MAX_ATTEMPTS'])
+
+
+def run_task(task):
+    config = pipeline_config()
+    func = STAGES.get(task.stage)
+    if func is None or task.stage not in enabled_stages():
+        task.status = Status.SKIPPED
+    else:
+        started = perf_counter()
+        try:
+            func(task.file)
+        except Exception as error:
+            logger.exception('Stage %s failed for file %s (attempt %s)', task.stage, task.file_id, task.attempts)
+            task.last_error = f'{type(error).__name__}: {error}'[:2000]
+            if task.attempts < config['MAX_ATTEMPTS']:
+                task.status = Status.PENDING
+                task.available_at = queue.retry_at(current_time(), task.attempts, config['RETRY_DELAY'])
+            else:
+                task.status = Status.FAILED
+        else:
+            task.status = Status.DONE
+        task.duration_ms = int((perf_counter() - started) * 1000)
+    task.finished_at = current_time()
+    # fayl shu orada o'chirilgan bo'lsa vazifa ham kaskad bilan o'chgan: UPDATE hech narsa qilmaydi
+    ProcessingTask.objects.filter(pk=task.pk).update(status=task.status, available_at=task.available_at,
+                                                     finished_at=task.finished_at, duration_ms=task.duration_ms,
+                                                     last_error=task.last_error)
+    return task
+
+
+def _settle(file_ids):
+    tasks = ProcessingTask.objects.filter(file_id__in=file_ids).values('file_id').annotate(
+        open=Count('id', filter=Q(status__in=(Status.PENDING, Status.RUNNING))),
+        failed=Count('id', filter=Q(status=Status.FAILED)),
+    )
+    for row in tasks:
+        if row['open']:
+            continue
+        status = SubmissionFile.ProcessingStatus.FAILED if row['failed'] else SubmissionFile.ProcessingStatus.READY
+        SubmissionFile.objects.filter(pk=row['file_id']).update(processing_status=status)
+
+
+def process_pending(limit=20, now=None):
+    """Runs due tasks until none are left; returns how many ran."""
+    processed = 0
+    while tasks := _claim(limit, now or current_time()):
+        for task in tasks:
+            run_task(task)
+        _settle({task.file_id for task in tasks})
+        processed += len(tasks)
+    return processed
+
+
+def run_worker(batch=20, idle=1.0, once=False):
+    while True:
+        requeue_stale()
+        processed = process_pending(batch)
+        if once:
+            return processed
+        if not processed:
+            sleep(idle)
+
+
+def _drain():
+    try:
+        process_pending()
+    finally:
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+def _kick():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pipeline')
+    _executor.submit(_drain)
+
+
+def pipeline_stats():
+    """Per stage: task counts by status and timing of finished runs."""
+    rows = ProcessingTask.objects.values('stage').annotate(
+        total=Count('id'),
+        **{status: Count('id', filter=Q(status=status)) for status in Status.values},
+        avg_ms=Avg('duration_ms', filter=Q(status=Status.DONE)),
+        max_ms=Max('duration_ms', filter=Q(status=Status.DONE)),
+    ).order_by('stage')
+    return list(rows)
@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.db.models import F
+
+
+def claim_due(queryset, limit, now, pending, running):
+    """
+    Moves up to ``limit`` due rows from ``pending`` to ``running``. Each row is taken with
+    its own conditional UPDATE, so two workers never get the same row (works on SQLite too).
+    """
+    due = queryset.filter(status=pending, available_at__lte=now)
+    return claim_ids(queryset.model, due.values_list('id', flat=True)[:limit], now, pending, running)
+
+
+def claim_ids(model, ids, now, pending, running):
+    """Same as ``claim_due`` for rows a scheduler already picked; returns the ids this worker got."""
+    claimed = []
+    for row_id in ids:
+        # boshqa worker ulgurgan bo'lsa 0 qaytadi
+        if model.objects.filter(pk=row_id, status=pending).update(
+                status=running, started_at=now, attempts=F('attempts') + 1):
+            claimed.append(row_id)
+    return claimed
+
+
+def requeue_stale(queryset, now, stale_after, pending, running, failed, max_attempts):
+    """
+    Rows left ``running`` by a worker that died go back to the queue. The dead run was counted
+    in ``attempts`` when it was claimed, so a row that keeps killing its worker (OOM, segfault)
+    is marked ``failed`` once it reaches ``max_attempts`` instead of being retried forever.
+    """
+    stale = queryset.filter(status=running, started_at__lt=now - timedelta(seconds=stale_after))
+    stale.filter(attempts__gte=max_attempts).update(
+        status=failed, finished_at=now, last_error=f"Worker to'xtab qoldi: {stale_after} soniyada tugamadi")
+    return stale.filter(attempts__lt=max_attempts).update(status=pending, available_at=now)
+
+
+def retry_at(now, attempts, base_delay, retry_after=None):
+    # eksponensial kutish; server Retry-After bergan bo'lsa undan kam emas
+    delay = base_delay * 2 ** max(attempts - 1, 0)
+    return now + timedelta(seconds=max(delay, retry_after or 0))
@@ -0,0 +1,146 @@
+from collections import OrderedDict
+from datetime import timedelta
+from hashlib import sha256
+from threading import Lock
+
+from django.conf import settings
+from django.db import transaction
+from django.http import UnreadablePostError
+from django.utils.timezone import now as current_time
+from rest_framework.exceptions import ValidationError, NotFound
+
+from apps.models import UploadSession, SubmissionFile
+from apps.storage import submission_storage, blob_name
+from apps.uploads import UploadInspector, CHUNK_SIZE
+
+# hashlib holatini saqlab bo'lmaydi: u shu jarayon xotirasida turadi, boshqa workerda bir marta qayta tiklanadi
+_hashers = OrderedDict()
+_hashers_lock = Lock()
+MAX_HASHERS = 256
+
+
+class OffsetMismatch(Exception):
+    pass
+
+
+def _hasher(session):
+    with _hashers_lock:
+        cached = _hashers.pop(session.pk, None)
+    if cached is not None and cached[0] == session.offset:
+        return cached[1]
+    hasher = sha256()
+    if session.offset:
+        with submission_storage.open(session.part_name) as source:
+            remaining = session.offset
+            while remaining:
+                chunk = source.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                remaining -= len(chunk)
+    return hasher
+
+
+def _remember(session, hasher):
+    with _hashers_lock:
+        _hashers[session.pk] = (session.offset, hasher)
+        while len(_hashers) > MAX_HASHERS:
+            _hashers.popitem(last=False)
+
+
+def _forget(session):
+    with _hashers_lock:
+        _hashers.pop(session.pk, None)
+
+
+def _inspector(session):
+    homework = session.submission.homework
+    inspector = UploadInspector(line_limit=homework.line_limit, max_size=session.size)
+    inspector.set_state(session.state)
+    inspector.digest = _hasher(session)
+    return inspector
+
+
+def _read(stream, inspector):
+    # aloqa uzilsa shu paytgacha kelgan qism saqlanadi - mijoz shu joydan davom ettiradi
+    while stream is not None:
+        try:
+            chunk = stream.read(CHUNK_SIZE)
+        except (OSError, UnreadablePostError):
+            return
+        if not chunk:
+            return
+        inspector.feed(chunk)
+        yield chunk
+
+
+def cancel(session):
+    _forget(session)
+    submission_storage.delete(session.part_name)
+    session.delete()
+
+
+def append_chunk(session_id, offset, stream):
+    """
+    PATCH body at ``offset``: appended straight to the partial file while the line
+    counter and SHA-256 advance. A chunk that breaks a limit cancels the upload.
+    """
+    rejected = None
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().select_related('submission__homework').get(pk=session_id)
+        if offset != session.offset:
+            raise OffsetMismatch(session.offset)
+        inspector = _inspector(session)
+        try:
+            session.offset = submission_storage.append(session.part_name, _read(stream, inspector), offset)
+        except ValidationError as error:
+            rejected = error
+        else:
+            session.state = inspector.get_state()
+            session.save(update_fields=['offset', 'state', 'updated_at'])
+    if rejected is not None:
+        cancel(session)
+        raise rejected
+    _remember(session, inspector.digest)
+    return session
+
+
+def finalize(session):
+    """Creates the SubmissionFile from the state gathered while chunks arrived; the file is not read again."""
+    rejected = None
+    with transaction.atomic():
+        # parallel finalize so'rovlari navbat bilan o'tadi: ikkinchisi sessiyani endi topmaydi
+        session = UploadSession.objects.select_for_update().select_related('submission__homework').filter(
+            pk=session.pk).first()
+        if session is None:
+            raise NotFound("Yuklash sessiyasi allaqachon yakunlangan yoki bekor qilingan")
+        if session.offset != session.size:
+            raise ValidationError({'offset': f"Fayl to'liq yuklanmagan: {session.offset}/{session.size}"})
+        inspector = _inspector(session)
+        try:
+            inspector.finish()
+        except ValidationError as error:
+            rejected = error
+        else:
+            digest = inspector.sha256
+            # blob avval hisoblanadi, keyin joyiga ko'chiriladi: orada gc_blobs uni o'chira olmaydi
+            file = SubmissionFile.objects.create(submission=session.submission, file_name=session.file_name,
+                                                 content=blob_name(digest), line_count=inspector.line_count,
+                                                 sha256=digest, size_bytes=inspector.size)
+            submission_storage.promote(session.part_name, digest)
+            _forget(session)
+            session.delete()
+    if rejected is not None:
+        cancel(session)
+        raise rejected
+    return file
+
+
+def expire_sessions(now=None):
+    ttl = getattr(settings, 'SUBMISSION_UPLOAD_SESSION_TTL', 24 * 60 * 60)
+    expired = UploadSession.objects.filter(updated_at__lt=(now or current_time()) - timedelta(seconds=ttl))
+    count = 0
+    for session in expired.iterator():
+        cancel(session)
+        count += 1
+    return count
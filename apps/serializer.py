@@ -1,6 +1,14 @@
-from rest_framework.serializers import ModelSerializer
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import ModelSerializer, CharField, Serializer, IntegerField, DecimalField, \
+    ListField, FileField, PrimaryKeyRelatedField
 
-from apps.models import Submission, Homework, Grade, SubmissionFile
+from apps.blobs import retain_blobs, release_blobs
+from apps.models import Submission, Homework, Grade, SubmissionFile, LeaderboardEntry, DailyGradeRollup, \
+    MonthlyGradeRollup, UploadSession
+from apps.pipeline import enqueue
+from apps.storage import submission_storage, blob_name
+from apps.uploads import inspect_upload, inspect_files, check_extension, max_upload_size, STORE_BATCH_SIZE
 
 
 class GradeModelSerializer(ModelSerializer):
@@ -17,21 +25,21 @@ class GradeModelSerializer(ModelSerializer):
 class SubmissionFileModelSerializer(ModelSerializer):
     class Meta:
         model = SubmissionFile
-        fields = ('file_name', 'content', 'line_count', 'submission')
-        read_only_fields = ('id', 'line_count')
+        fields = ('id', 'file_name', 'content', 'line_count', 'sha256', 'size_bytes', 'processing_status', 'submission')
+        read_only_fields = ('id', 'line_count', 'sha256', 'size_bytes', 'processing_status')
 
-    def create(self, validated_data):
-        uploaded_file = validated_data.get('content')
-
-        line_count = 0
+    def validate(self, attrs):
+        uploaded_file = attrs.get('content')
         if uploaded_file:
-            uploaded_file.open()
-            content_bytes = uploaded_file.read()
-            content_text = content_bytes.decode('utf-8')
-            line_count = len(content_text.strip().splitlines())
-            uploaded_file.seek(0)
+            submission = attrs.get('submission')
+            homework = submission.homework if submission else None
+            # fayl bir marta bo'laklab o'qiladi, limitdan oshgan zahoti to'xtatiladi
+            inspector = inspect_upload(uploaded_file, homework, attrs.get('file_name'))
+            attrs.update(line_count=inspector.line_count, sha256=inspector.sha256, size_bytes=inspector.size)
+        return attrs
 
-        validated_data['line_count'] = line_count
+    def create(self, validated_data):
+        validated_data.setdefault('line_count', 0)
         return super().create(validated_data)
 
 
@@ -52,9 +60,119 @@ class SubmissionModelSerialize(ModelSerializer):
         return submission
 
 
+class SubmissionUploadSerializer(Serializer):
+    homework = PrimaryKeyRelatedField(queryset=Homework.objects.all())
+    files = ListField(child=FileField(), required=False)
+    archive = FileField(required=False)
+
+    def validate(self, attrs):
+        files, archive = attrs.get('files'), attrs.get('archive')
+        if bool(files) == bool(archive):
+            raise ValidationError("files yoki archive dan faqat bittasini yuboring")
+        homework, student = attrs['homework'], self.context['request'].user
+        if homework.group_id != student.group_id:
+            raise ValidationError({'homework': "Bu uyga vazifa sizning guruhingizga tegishli emas"})
+        return attrs
+
+    @staticmethod
+    def store(batch, stored):
+        # avval hisoblanadi, keyin yoziladi: orada gc_blobs blobni o'chira olmaydi; fayl yozilgach yopiladi
+        retain_blobs([(inspector.sha256, inspector.size) for _, inspector, _ in batch])
+        stored += batch
+        for _, inspector, file in batch:
+            submission_storage.save(blob_name(inspector.sha256), file)
+            file.close()
+
+    def create(self, validated_data):
+        homework = validated_data['homework']
+        members = inspect_files(homework, validated_data.get('files'), validated_data.get('archive'))
+        stored, batch = [], []
+        try:
+            # a'zolar kichik guruhlarda tekshirilib, yozilib, yopiladi: hammasi birga xotirada turmaydi,
+            # tranzaksiya esa fayllar yozilayotganda ochiq qolmaydi
+            for member in members:
+                batch.append(member)
+                if len(batch) >= STORE_BATCH_SIZE:
+                    self.store(batch, stored)
+                    batch = []
+            self.store(batch, stored)
+            batch = []
+            with transaction.atomic():
+                submission = Submission.objects.create(homework=homework, student=self.context['request'].user)
+                files = SubmissionFile.objects.bulk_create([
+                    SubmissionFile(submission=submission, file_name=name, content=blob_name(inspector.sha256),
+                                   line_count=inspector.line_count, sha256=inspector.sha256,
+                                   size_bytes=inspector.size)
+                    for name, inspector, _ in stored
+                ])
+                enqueue(files)
+        except Exception:
+            # yozilgan bloblar hisobdan chiqariladi, gc_blobs ularni keyin tozalaydi
+            release_blobs([inspector.sha256 for _, inspector, _ in stored])
+            for _, _, file in batch:
+                file.close()
+            raise
+        return submission
+
+    def to_representation(self, instance):
+        return SubmissionModelSerialize(instance).data
+
+
+class UploadSessionModelSerializer(ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ('id', 'submission', 'file_name', 'size', 'offset', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'offset', 'created_at', 'updated_at')
+
+    def validate(self, attrs):
+        submission = attrs['submission']
+        if submission.student_id != self.context['request'].user.id:
+            raise ValidationError({'submission': "Bu topshiriq sizga tegishli emas"})
+        check_extension(attrs['file_name'], submission.homework)
+        if not 0 < attrs['size'] <= max_upload_size():
+            raise ValidationError({'size': f"Fayl hajmi 1..{max_upload_size()} bayt oralig'ida bo'lishi kerak"})
+        return attrs
+
+
 class HomeworkModelSerializer(ModelSerializer):
     class Meta:
         model = Homework
         fields = ('id', 'title', 'description', 'points', 'start_date', 'deadline', 'line_limit', 'teacher', 'group',
                   'file_extensions', 'ai_grading_prompt', 'created_at')
         read_only_fields = ('id', 'created_at', 'teacher')
+
+
+class LeaderboardEntryModelSerializer(ModelSerializer):
+    full_name = CharField(source='student.full_name', read_only=True)
+
+    class Meta:
+        model = LeaderboardEntry
+        fields = ('rank', 'student', 'full_name', 'group', 'total_points', 'graded_count', 'daily_rank_delta',
+                  'weekly_rank_delta', 'updated_at')
+        read_only_fields = fields
+
+
+class DailyGradeRollupModelSerializer(ModelSerializer):
+    full_name = CharField(source='student.full_name', read_only=True)
+
+    class Meta:
+        model = DailyGradeRollup
+        fields = ('rank', 'student', 'full_name', 'group', 'day', 'total_points', 'graded_count')
+        read_only_fields = fields
+
+
+class MonthlyGradeRollupModelSerializer(ModelSerializer):
+    full_name = CharField(source='student.full_name', read_only=True)
+
+    class Meta:
+        model = MonthlyGradeRollup
+        fields = ('rank', 'student', 'full_name', 'group', 'month', 'total_points', 'graded_count')
+        read_only_fields = fields
+
+
+class RankingRowSerializer(Serializer):
+    rank = IntegerField()
+    student = IntegerField()
+    full_name = CharField()
+    total_points = DecimalField(max_digits=10, decimal_places=2)
+    graded_count = IntegerField()
@@ -0,0 +1,75 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from apps.blobs import retain_blobs, release_blobs, restore_blobs, is_blob
+from apps.grading import reprioritize
+from apps.leaderboard import grade_key, refresh_for_grade
+from apps.models import Grade, Submission, Homework, SubmissionFile
+from apps.pipeline import enqueue
+from apps.versions import bump_group_version
+
+
+@receiver(post_save, sender=Grade)
+def grade_saved(sender, instance, **kwargs):
+    refresh_for_grade(*grade_key(instance))
+
+
+@receiver(pre_delete, sender=Grade)
+def grade_deleting(sender, instance, **kwargs):
+    # Submission kaskad bilan o'chirilganda keyin uni o'qib bo'lmaydi
+    instance._grade_key = grade_key(instance)
+
+
+@receiver(post_delete, sender=Grade)
+def grade_deleted(sender, instance, **kwargs):
+    refresh_for_grade(*instance._grade_key)
+
+
+@receiver(post_save, sender=Submission)
+@receiver(post_delete, sender=Submission)
+def submission_changed(sender, instance, **kwargs):
+    bump_group_version(Homework.objects.filter(pk=instance.homework_id).values_list('group_id', flat=True).first())
+
+
+@receiver(post_save, sender=Homework)
+@receiver(post_delete, sender=Homework)
+def homework_changed(sender, instance, **kwargs):
+    bump_group_version(instance.group_id)
+
+
+@receiver(post_save, sender=Homework)
+def homework_saved(sender, instance, created, **kwargs):
+    if not created:
+        # deadline o'zgargan bo'lishi mumkin - navbatdagi baholash tartibi yangilanadi
+        reprioritize(instance)
+
+
+@receiver(pre_save, sender=SubmissionFile)
+def submission_file_saving(sender, instance, **kwargs):
+    instance._upload, instance._replaced = None, None
+    if instance.content and not instance.content._committed:
+        # yuklangan fayl saqlangandan keyin FieldFile'dan yo'qoladi, blobni tiklash uchun kerak bo'ladi
+        instance._upload = instance.content.file
+        if instance.pk:
+            instance._replaced = SubmissionFile.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=SubmissionFile)
+def submission_file_saved(sender, instance, created, **kwargs):
+    upload, replaced = getattr(instance, '_upload', None), getattr(instance, '_replaced', None)
+    instance._upload = instance._replaced = None
+    if (created or upload is not None) and is_blob(instance):
+        retain_blobs([(instance.sha256, instance.size_bytes)])
+        if upload is not None:
+            restore_blobs([(instance.sha256, upload)])
+    if replaced is not None and is_blob(replaced):
+        release_blobs([replaced.sha256])
+    if created:
+        # tahlil (o'xshashlik, highlight, ...) fonda: so'rov faqat baytlarni saqlaydi
+        enqueue([instance])
+
+
+@receiver(post_delete, sender=SubmissionFile)
+def submission_file_deleted(sender, instance, **kwargs):
+    if is_blob(instance):
+        release_blobs([instance.sha256])
@@ -0,0 +1,191 @@
+import keyword
+import re
+from array import array
+from hashlib import blake2b
+from itertools import combinations, groupby
+from operator import itemgetter
+from random import Random
+
+from django.conf import settings
+
+from apps.models import FileFingerprint, SimilarityBucket, SubmissionFile
+from apps.storage import submission_storage
+
+TOKEN = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|\d+(?:\.\d+)?|\w+|[^\w\s]')
+COMMENT = re.compile(r'#[^\n]*|//[^\n]*|/\*.*?\*/', re.S)
+KEYWORDS = frozenset(keyword.kwlist) | {
+    'function', 'var', 'let', 'const', 'new', 'this', 'null', 'undefined', 'switch', 'case', 'do', 'int', 'float',
+    'double', 'char', 'string', 'bool', 'void', 'public', 'private', 'static', 'struct', 'func', 'print', 'range',
+}
+PRIME = (1 << 61) - 1
+PERMUTATIONS = 128
+BANDS = 32
+ROWS = PERMUTATIONS // BANDS
+_random = Random(20240601)
+HASH_PARAMS = [(_random.randrange(1, PRIME), _random.randrange(PRIME)) for _ in range(PERMUTATIONS)]
+
+
+def _setting(name, default):
+    return getattr(settings, 'SIMILARITY', {}).get(name, default)
+
+
+def tokenize(text):
+    # o'zgaruvchi nomlarini almashtirish va izohlar o'xshashlikni yashirmasin
+    tokens = []
+    for token in TOKEN.findall(COMMENT.sub(' ', text)):
+        if token[0] in '"\'':
+            tokens.append('S')
+        elif token[0].isdigit():
+            tokens.append('N')
+        elif token[0].isalpha() or token[0] == '_':
+            tokens.append(token if token in KEYWORDS else 'V')
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def _hash(value):
+    return int.from_bytes(blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+def winnow(tokens, k=None, window=None):
+    """Robust winnowing: the minimum k-gram hash of every window, so copies of >= k + window - 1 tokens always match."""
+    k = k or _setting('KGRAM', 5)
+    window = window or _setting('WINDOW', 4)
+    grams = [_hash(' '.join(tokens[i:i + k])) for i in range(len(tokens) - k + 1)]
+    if len(grams) <= window:
+        return set(grams)
+    return {min(grams[i:i + window]) for i in range(len(grams) - window + 1)}
+
+
+def minhash(fingerprints):
+    values = [value % PRIME for value in fingerprints]
+    return array('Q', (min((a * x + b) % PRIME for x in values) for a, b in HASH_PARAMS))
+
+
+def band_keys(signature):
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = blake2b(band.to_bytes(2, 'big') + rows.tobytes(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'big', signed=True))
+    return keys
+
+
+def estimate(first, second):
+    return sum(a == b for a, b in zip(first, second)) / PERMUTATIONS
+
+
+def fingerprint_text(text):
+    tokens = tokenize(text)
+    if len(tokens) < _setting('MIN_TOKENS', 20):
+        return None, len(tokens)
+    return minhash(winnow(tokens)), len(tokens)
+
+
+def _read(file):
+    try:
+        with submission_storage.open(file.content.name) as source:
+            return source.read().decode('utf-8', errors='replace')
+    except (OSError, ValueError):
+        return None
+
+
+def index_files(files):
+    """
+    Fingerprints new files and drops them into their homework's LSH buckets: one
+    fingerprint row plus ``BANDS`` bucket rows per file, whatever the homework size.
+    Files with the same content share one signature computation.
+    """
+    files = [file for file in files if file.pk]
+    homework_ids = dict(SubmissionFile.objects.filter(pk__in=[file.pk for file in files]).values_list(
+        'pk', 'submission__homework_id'))
+    known = {}
+    digests = [file.sha256 for file in files if file.sha256]
+    for digest, signature, tokens in FileFingerprint.objects.filter(file__sha256__in=digests).values_list(
+            'file__sha256', 'signature', 'token_count'):
+        known[digest] = array('Q', bytes(signature)), tokens
+
+    fingerprints, buckets = [], []
+    for file in files:
+        if file.sha256 and file.sha256 in known:
+            signature, tokens = known[file.sha256]
+        else:
+            text = _read(file)
+            if text is None:
+                continue
+            signature, tokens = fingerprint_text(text)
+            if file.sha256:
+                known[file.sha256] = signature, tokens
+        if signature is None:
+            continue
+        homework_id = homework_ids[file.pk]
+        fingerprints.append(FileFingerprint(file_id=file.pk, homework_id=homework_id, submission_id=file.submission_id,
+                                            signature=signature.tobytes(), token_count=tokens))
+        buckets += [SimilarityBucket(homework_id=homework_id, key=key, fingerprint_id=file.pk)
+                    for key in band_keys(signature)]
+    FileFingerprint.objects.bulk_create(fingerprints, ignore_conflicts=True)
+    SimilarityBucket.objects.bulk_create(buckets, batch_size=500, ignore_conflicts=True)
+    return len(fingerprints)
+
+
+def _load(fingerprint_ids):
+    rows = FileFingerprint.objects.filter(file_id__in=fingerprint_ids).values_list(
+        'file_id', 'signature', 'submission_id', 'submission__student_id', 'file__file_name')
+    return {file_id: (array('Q', bytes(signature)), submission_id, student_id, file_name)
+            for file_id, signature, submission_id, student_id, file_name in rows}
+
+
+def similar_submissions(submission_id, threshold=None):
+    """Other students' submissions in the same homework that share an LSH bucket, best match first."""
+    threshold = _setting('THRESHOLD', 0.6) if threshold is None else threshold
+    own = FileFingerprint.objects.filter(submission_id=submission_id)
+    buckets = SimilarityBucket.objects.filter(fingerprint__in=own)
+    candidates = SimilarityBucket.objects.filter(
+        homework_id__in=own.values('homework_id'), key__in=buckets.values('key'),
+    ).exclude(fingerprint__submission_id=submission_id).values_list('fingerprint_id', flat=True).distinct()
+    signatures = _load([*own.values_list('file_id', flat=True), *candidates])
+    mine = {file_id: row for file_id, row in signatures.items() if row[1] == submission_id}
+    if not mine:
+        return []
+    student_id = next(iter(mine.values()))[2]
+    pairs = [(file_id, other_id) for file_id in mine for other_id, row in signatures.items()
+             if row[1] != submission_id and row[2] != student_id]
+    return _report(pairs, signatures, threshold)
+
+
+def homework_report(homework_id, threshold=None):
+    """
+    Suspicious submission pairs for a whole homework. Only files that collide in at
+    least one LSH band are compared, so the work follows the number of near-duplicates,
+    not n². Buckets shared by more than ``MAX_BUCKET`` files (starter code) are skipped.
+    """
+    threshold = _setting('THRESHOLD', 0.6) if threshold is None else threshold
+    max_bucket = _setting('MAX_BUCKET', 50)
+    rows = SimilarityBucket.objects.filter(homework_id=homework_id).order_by('key').values_list('key', 'fingerprint_id')
+    pairs = set()
+    for _, bucket in groupby(rows.iterator(), key=itemgetter(0)):
+        ids = sorted({fingerprint_id for _, fingerprint_id in bucket})
+        if 1 < len(ids) <= max_bucket:
+            pairs.update(combinations(ids, 2))
+    signatures = _load({file_id for pair in pairs for file_id in pair})
+    pairs = [(a, b) for a, b in pairs if a in signatures and b in signatures and signatures[a][2] != signatures[b][2]]
+    return _report(pairs, signatures, threshold)
+
+
+def _report(pairs, signatures, threshold):
+    matches = {}
+    for first, second in pairs:
+        score = estimate(signatures[first][0], signatures[second][0])
+        if score < threshold:
+            continue
+        left, right = signatures[first], signatures[second]
+        key = (left[1], right[1])
+        match = matches.setdefault(key, {
+            'submission': left[1], 'student': left[2], 'other_submission': right[1], 'other_student': right[2],
+            'similarity': 0, 'files': [],
+        })
+        match['similarity'] = max(match['similarity'], score)
+        match['files'].append({'file_name': left[3], 'other_file_name': right[3], 'similarity': score})
+    return sorted(matches.values(), key=lambda match: (-match['similarity'], match['submission'],
+                                                       match['other_submission']))
@@ -0,0 +1,73 @@
+import os
+from hashlib import sha256
+
+from django.core.files.storage import FileSystemStorage
+
+BLOB_PREFIX = 'cas'
+PARTS_PREFIX = 'uploads'
+
+
+def blob_name(digest):
+    return f'{BLOB_PREFIX}/{digest[:2]}/{digest}'
+
+
+def file_digest(file):
+    digest = sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def blob_path(instance, filename):
+    # har doim yangi fayldan: mavjud qatorning eski sha256 qiymati almashtirilgan kontentga tegishli emas.
+    # Yuklash oqimida hisoblangan xesh faylning o'zida keladi; faqat eski/backfill yo'lida fayl qayta o'qiladi
+    inspector = getattr(instance.content.file, 'inspector', None)
+    instance.sha256 = inspector.sha256 if inspector is not None else file_digest(instance.content)
+    instance.size_bytes = instance.content.size
+    return blob_name(instance.sha256)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """One file per SHA-256: saving content that is already stored writes nothing."""
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        try:
+            return super()._save(name, content)
+        except FileExistsError:
+            # parallel yuklashda boshqa so'rov shu blobni yozib ulgurdi
+            return name
+
+    def append(self, name, chunks, offset):
+        """Writes ``chunks`` at ``offset`` of a partial upload (anything after it is dropped first)."""
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'ab') as target:
+            target.truncate(offset)
+            for chunk in chunks:
+                target.write(chunk)
+            return target.tell()
+
+    def promote(self, name, digest):
+        """Moves a finished partial upload to its content address without copying it."""
+        target = blob_name(digest)
+        target_path = self.path(target)
+        if os.path.exists(target_path):
+            os.remove(self.path(name))
+        else:
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            os.replace(self.path(name), target_path)
+        return target
+
+
+submission_storage = ContentAddressedStorage()
+
+
+def get_submission_storage():
+    return submission_storage
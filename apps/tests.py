@@ -1,10 +1,43 @@
-from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import io
+import json
+import tarfile
+import threading
+import time
+import zipfile
+from base64 import urlsafe_b64encode
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
 
 import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
 from django.urls import reverse
+from django.utils.timezone import localdate, now
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
-from apps.models import Grade, SubmissionFile, Homework, Submission
+from apps.blobs import collect_garbage, backfill_file_metadata
+from apps import resumable, storage
+from apps.grading import FakeGradingBackend, GradingWorker, RetryableGradingError, enqueue_grading, parse_result, \
+    grading_stats, pack_batches, parse_batch_result, build_request, pick_jobs, claim_jobs, queue_stats, FeedbackDraft, \
+    parse_stream_result, stream_feedback, FakeModelServer, create_benchmark_homework, delete_benchmark_homework, \
+    run_benchmark, percentiles, requeue_stale_jobs
+from apps.leaderboard import DatabaseRankIndex, MemoryRankIndex, RedisRankIndex, GroupChannel, diff_standings
+from apps.leaderboard import take_snapshot, compact_snapshots, homework_ranking, rebuild_all, merged_top, merged_rank
+from apps.leaderboard import recompute_levels
+from apps.models import Grade, SubmissionFile, Homework, Submission, LeaderboardEntry, DailyGradeRollup, \
+    MonthlyGradeRollup, LeaderboardSnapshot, StoredBlob, SimilarityBucket, UploadSession, ProcessingTask, \
+    GradingJob
+from apps.pipeline import process_pending, pipeline_stats, requeue_stale, STAGES
+from apps.versions import bump_group_version, group_version_stamp
+from apps.similarity import index_files, similar_submissions, BANDS
+from apps.uploads import LineCounter, UploadInspector, UploadLimitHandler
+from apps.views.student import StudentLeaderboardAPIView
 from authenticate.models import Course, User, Group
 
 
@@ -181,3 +214,1057 @@ class TestAuth:
         headers = self.login_admin(api_client)
         response = api_client.get('http://localhost:8000/api/v1/student/leaderboard/', headers=headers)
         assert 200 <= response.status_code < 300, "Bad request"
+
+
+class SortedSetStandIn:
+    """Local stand-in for the handful of redis sorted set commands RedisRankIndex uses."""
+
+    def __init__(self):
+        self.sets = {}
+
+    def _ordered(self, key):
+        return sorted(self.sets.get(key, {}).items(), key=lambda item: (-item[1], item[0]))
+
+    def exists(self, key):
+        return int(key in self.sets)
+
+    def delete(self, key):
+        self.sets.pop(key, None)
+
+    def zadd(self, key, mapping, nx=False):
+        members = self.sets.setdefault(key, {})
+        members.update({member: score for member, score in mapping.items() if not (nx and member in members)})
+
+    def zrem(self, key, member):
+        self.sets.get(key, {}).pop(member, None)
+
+    def zscore(self, key, member):
+        return self.sets.get(key, {}).get(member)
+
+    def zcount(self, key, low, high):
+        low = float(low[1:])
+        return sum(1 for score in self.sets.get(key, {}).values() if score > low)
+
+    def zrevrank(self, key, member):
+        members = [name for name, _ in self._ordered(key)]
+        return members.index(member) if member in members else None
+
+    def zrevrange(self, key, start, stop, withscores=False):
+        return [(name.encode(), score) for name, score in self._ordered(key)[start:stop + 1]]
+
+
+class TestLeaderboard:
+    @pytest.fixture
+    def group_data(self):
+        teacher = User.objects.create(full_name='Teacher', phone='981000000', role='teacher')
+        course = Course.objects.create(name='Backend')
+        group = Group.objects.create(name='G-1', teacher=teacher, course=course)
+        students = [
+            User.objects.create(full_name=f'Student {i}', phone=f'98200000{i}', role='student', group=group)
+            for i in range(3)
+        ]
+        homework = Homework.objects.create(
+            title='Loops', description='-', points=100, start_date=datetime.today().date(),
+            deadline=datetime.now() + timedelta(days=2), line_limit=50, teacher=teacher, group=group,
+            ai_grading_prompt='Evaluate.'
+        )
+        return {'teacher': teacher, 'group': group, 'students': students, 'homework': homework}
+
+    def grade(self, homework, student, ai_total, teacher_total=None):
+        submission = Submission.objects.create(homework=homework, student=student, ai_grade=0, final_grade=0,
+                                               ai_feedback='')
+        return Grade.objects.create(submission=submission, ai_task_completeness=0, ai_code_quality=0,
+                                    ai_correctness=0, ai_total=ai_total, teacher_total=teacher_total)
+
+    @pytest.mark.django_db
+    def test_grade_write_updates_standings(self, group_data):
+        homework, (first, second, third) = group_data['homework'], group_data['students']
+        self.grade(homework, first, 60)
+        self.grade(homework, second, 80)
+        grade = self.grade(homework, third, 60)
+
+        ranks = dict(LeaderboardEntry.objects.values_list('student_id', 'rank'))
+        assert ranks == {second.id: 1, first.id: 2, third.id: 2}
+
+        grade.teacher_total = 95
+        grade.save()
+        entry = LeaderboardEntry.objects.get(student=third)
+        assert (entry.rank, entry.total_points, entry.graded_count) == (1, 95, 1)
+
+        grade.delete()
+        assert not LeaderboardEntry.objects.filter(student=third).exists()
+        assert LeaderboardEntry.objects.get(student=first).rank == 2
+
+    @pytest.mark.django_db
+    def test_teacher_leaderboard_reads_standings(self, group_data):
+        homework, (first, second, _) = group_data['homework'], group_data['students']
+        self.grade(homework, first, 70)
+        self.grade(homework, second, 90)
+
+        client = APIClient()
+        client.force_authenticate(group_data['teacher'])
+        response = client.get(reverse('teacher-leaderboard', kwargs={'pk': group_data['group'].pk}))
+        assert response.status_code == 200
+        assert [row['student'] for row in response.json()['results']] == [second.id, first.id]
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('index_factory', [
+        DatabaseRankIndex, MemoryRankIndex, lambda: RedisRankIndex(client=SortedSetStandIn()),
+    ])
+    def test_rank_index_backends(self, group_data, index_factory):
+        homework, students, group = group_data['homework'], group_data['students'], group_data['group']
+        for student, total in zip(students, (50, 90, 70)):
+            self.grade(homework, student, total)
+        index = index_factory()
+
+        assert index.rank(group.id, students[1].id) == 1
+        assert index.rank(group.id, students[0].id) == 3
+        assert [student_id for student_id, _ in index.top(group.id, 2)] == [students[1].id, students[2].id]
+        assert [student_id for student_id, _ in index.around(group.id, students[2].id, 1)] == \
+               [students[1].id, students[2].id, students[0].id]
+
+        index.update(group.id, students[0].id, 100)
+        if not isinstance(index, DatabaseRankIndex):
+            assert index.rank(group.id, students[0].id) == 1
+
+    @pytest.mark.django_db
+    def test_redis_index_update_on_cold_group_keeps_full_ranking(self, group_data):
+        homework, students, group = group_data['homework'], group_data['students'], group_data['group']
+        for student, total in zip(students, (50, 90, 70)):
+            self.grade(homework, student, total)
+        index = RedisRankIndex(client=SortedSetStandIn())
+        index.update(group.id, students[0].id, 100)
+        index.remove(group.id, students[2].id)
+        assert [student_id for student_id, _ in index.top(group.id, 3)] == [students[1].id, students[2].id,
+                                                                            students[0].id]
+
+    @pytest.mark.django_db
+    def test_memory_index_sees_grades_written_by_other_processes(self, group_data):
+        homework, students, group = group_data['homework'], group_data['students'], group_data['group']
+        for student, total in zip(students, (50, 90, 70)):
+            self.grade(homework, student, total)
+        index = MemoryRankIndex()
+        assert index.rank(group.id, students[0].id) == 3
+
+        # baho boshqa jarayonda yozildi: bu indeksning update'i chaqirilmaydi, faqat guruh versiyasi o'sadi
+        self.grade(homework, students[0], 60)
+        assert index.rank(group.id, students[0].id) == 1
+
+    @pytest.mark.django_db
+    def test_redis_warm_keeps_scores_written_meanwhile(self, group_data):
+        homework, students, group = group_data['homework'], group_data['students'], group_data['group']
+        for student, total in zip(students, (50, 90, 70)):
+            self.grade(homework, student, total)
+        client = SortedSetStandIn()
+        index = RedisRankIndex(client=client)
+        load_group = index.load_group
+
+        def load_then_concurrent_update(group_id):
+            rows = load_group(group_id)
+            client.zadd(index._key(group_id), {str(students[0].id): 100.0})
+            return rows
+
+        index.load_group = load_then_concurrent_update
+        assert index.rank(group.id, students[0].id) == 1
+
+    @pytest.mark.django_db
+    def test_student_rank_endpoint(self, group_data):
+        homework, students = group_data['homework'], group_data['students']
+        for student, total in zip(students, (50, 90, 70)):
+            self.grade(homework, student, total)
+
+        client = APIClient()
+        client.force_authenticate(students[0])
+        response = client.get(reverse('leader-board-me'), {'top': 1, 'radius': 1})
+        data = response.json()
+        assert response.status_code == 200
+        assert data['rank'] == 3
+        assert [row['student'] for row in data['top']] == [students[1].id]
+        assert [row['rank'] for row in data['around']] == [2, 3]
+
+    @pytest.mark.django_db
+    def test_date_filtered_leaderboard_uses_rollups(self, group_data):
+        homework, (first, second, _) = group_data['homework'], group_data['students']
+        self.grade(homework, first, 40)
+        self.grade(homework, first, 30)
+        grade = self.grade(homework, second, 60)
+
+        today = localdate()
+        assert DailyGradeRollup.objects.get(student=first, day=today).total_points == 70
+        monthly = MonthlyGradeRollup.objects.get(student=first, month=today.replace(day=1))
+        assert (monthly.total_points, monthly.graded_count, monthly.rank) == (70, 2, 1)
+
+        grade.teacher_total = 90
+        grade.save()
+        client = APIClient()
+        client.force_authenticate(first)
+        response = client.get(reverse('leader-board'), {'monthly': today.strftime('%Y-%m')})
+        assert [(row['student'], row['rank']) for row in response.json()['results']] == [(second.id, 1), (first.id, 2)]
+
+        response = client.get(reverse('leader-board'), {'day': today.isoformat()})
+        assert [row['total_points'] for row in response.json()['results']] == ['90.00', '70.00']
+        assert client.get(reverse('leader-board'), {'day': 'yesterday'}).status_code == 400
+
+    def test_last_month_period_follows_local_date(self, settings, monkeypatch):
+        # UTC bo'yicha hali 31-iyul, Toshkentda esa 1-avgust - o'tgan oy iyul
+        settings.TIME_ZONE = 'Asia/Tashkent'
+        monkeypatch.setattr('django.utils.timezone.now', lambda: datetime(2026, 7, 31, 22, tzinfo=dt_timezone.utc))
+        view = StudentLeaderboardAPIView()
+        view.request = SimpleNamespace(query_params={'last month': ''})
+        assert view.get_period() == ('month', date(2026, 7, 1))
+
+    @pytest.mark.django_db
+    def test_last_month_etag_changes_at_month_boundary(self, group_data, monkeypatch):
+        client = APIClient()
+        client.force_authenticate(group_data['students'][0])
+        url = f"{reverse('leader-board')}?last%20month"
+        monkeypatch.setattr('django.utils.timezone.now', lambda: datetime(2026, 7, 20, 12, tzinfo=dt_timezone.utc))
+        etag = client.get(url)['ETag']
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        # guruh versiyasi o'zgarmagan, lekin "o'tgan oy" endi iyun emas, iyul
+        monkeypatch.setattr('django.utils.timezone.now', lambda: datetime(2026, 8, 2, 12, tzinfo=dt_timezone.utc))
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200 and response['ETag'] != etag
+
+    @pytest.mark.django_db
+    def test_leaderboard_keyset_pagination(self, group_data):
+        homework, students = group_data['homework'], group_data['students']
+        for student, total in zip(students, (50, 90, 50)):
+            self.grade(homework, student, total)
+
+        client = APIClient()
+        client.force_authenticate(group_data['teacher'])
+        url = reverse('teacher-leaderboard', kwargs={'pk': group_data['group'].pk})
+        first_page = client.get(url, {'page_size': 2}).json()
+        assert [row['student'] for row in first_page['results']] == [students[1].id, students[0].id]
+        assert first_page['previous'] is None
+
+        second_page = client.get(first_page['next']).json()
+        assert [row['student'] for row in second_page['results']] == [students[2].id]
+        assert second_page['next'] is None
+
+        back = client.get(second_page['previous']).json()
+        assert back['results'] == first_page['results']
+        assert client.get(url, {'cursor': 'garbage'}).status_code == 404
+        for values in (['abc', 1], [50, 'x'], [{'a': 1}, 1], [[50], 1]):
+            cursor = urlsafe_b64encode(json.dumps({'v': values, 'r': False}).encode()).decode()
+            assert client.get(url, {'cursor': cursor}).status_code == 404
+
+    @pytest.mark.django_db
+    def test_leaderboard_conditional_get(self, group_data):
+        homework, students = group_data['homework'], group_data['students']
+        self.grade(homework, students[0], 50)
+
+        client = APIClient()
+        client.force_authenticate(group_data['teacher'])
+        url = reverse('teacher-leaderboard', kwargs={'pk': group_data['group'].pk})
+        response = client.get(url)
+        etag = response['ETag']
+        assert response.status_code == 200 and response.has_header('Last-Modified')
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        self.grade(homework, students[1], 70)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200 and response['ETag'] != etag
+
+    def test_live_channel_coalesces_updates_per_tick(self):
+        state = {'version': 1, 'rows': {1: {'student': 1, 'rank': 1, 'total_points': '10.00'}}}
+        loads = []
+
+        async def version_loader(group_id):
+            return state['version']
+
+        async def rows_loader(group_id):
+            loads.append(group_id)
+            return dict(state['rows'])
+
+        async def scenario():
+            channel = GroupChannel(7, interval=60, version_loader=version_loader, rows_loader=rows_loader)
+            queues = [(await channel.subscribe())[0] for _ in range(3)]
+            assert await channel.tick() is None
+
+            # bitta tick ichida uchta baho
+            for version, points in ((2, '20.00'), (3, '30.00'), (4, '40.00')):
+                state['version'] = version
+                state['rows'] = {1: {'student': 1, 'rank': 2, 'total_points': '10.00'},
+                                 2: {'student': 2, 'rank': 1, 'total_points': points}}
+            diff = await channel.tick()
+            for queue in queues:
+                channel.unsubscribe(queue)
+            channel.task.cancel()
+            return diff, [queue.qsize() for queue in queues]
+
+        diff, sizes = asyncio.run(scenario())
+        assert len(loads) == 2 and sizes == [1, 1, 1]
+        assert [row['student'] for row in diff['changed']] == [2, 1] and diff['changed'][0]['total_points'] == '40.00'
+        assert diff_standings({3: {'rank': 1}}, {})['removed'] == [3]
+
+    @pytest.mark.django_db
+    def test_snapshot_rank_delta_and_compaction(self, group_data):
+        homework, (first, second, _), group = group_data['homework'], group_data['students'], group_data['group']
+        self.grade(homework, first, 80)
+        grade = self.grade(homework, second, 60)
+        daily = LeaderboardSnapshot.Period.DAILY
+        take_snapshot(group.id, daily, now() - timedelta(days=1))
+
+        grade.teacher_total = 100
+        grade.save()
+        version = group_version_stamp([group.id])[0]
+        snapshot = take_snapshot(group.id, daily)
+        assert dict(snapshot.entries.values_list('student_id', 'rank_delta')) == {first.id: -1, second.id: 1}
+        assert LeaderboardEntry.objects.get(student=second).daily_rank_delta == 1
+        assert group_version_stamp([group.id])[0] > version
+
+        weekly = LeaderboardSnapshot.Period.WEEKLY
+        current = now()
+        # uchalasi bitta oyda: ixchamlashdan keyin oyning birinchisi qoladi
+        old = (current - timedelta(days=300)).replace(day=1, hour=12)
+        for days in (0, 7, 14):
+            take_snapshot(group.id, weekly, old + timedelta(days=days))
+        take_snapshot(group.id, daily, current - timedelta(days=30))
+        compact_snapshots(current)
+        assert LeaderboardSnapshot.objects.filter(period=weekly).count() == 1
+        assert LeaderboardSnapshot.objects.filter(period=daily).count() == 2
+
+    @pytest.mark.django_db
+    def test_window_ranking_and_rebuild(self, group_data):
+        homework, students = group_data['homework'], group_data['students']
+        for student, total in zip(students, (70, 90, 70)):
+            self.grade(homework, student, total)
+        self.grade(homework, students[0], 5)
+
+        ranks = [(row['student'], row['rank']) for row in homework_ranking(homework.id)]
+        assert ranks == [(students[1].id, 1), (students[0].id, 2), (students[2].id, 3)]
+        self.grade(homework, students[0], 15)
+        assert [row['rank'] for row in homework_ranking(homework.id)] == [1, 1, 3]
+        assert [row['rank'] for row in homework_ranking(homework.id, dense=True)] == [1, 1, 2]
+
+        expected = list(LeaderboardEntry.objects.values_list('student_id', 'rank', 'total_points'))
+        LeaderboardEntry.objects.update(rank=0)
+        rebuild_all([group_data['group'].id])
+        assert sorted(LeaderboardEntry.objects.values_list('student_id', 'rank', 'total_points')) == sorted(expected)
+
+        client = APIClient()
+        client.force_authenticate(group_data['teacher'])
+        url = reverse('teacher-homework-leaderboard', kwargs={'pk': homework.id})
+        response = client.get(url)
+        assert [row['rank'] for row in response.json()['results']] == [1, 1, 3]
+        first = client.get(url, {'page_size': 2}).json()
+        second = client.get(first['next']).json()
+        assert [row['rank'] for row in first['results'] + second['results']] == [1, 1, 3]
+        assert second['next'] is None
+
+        stranger = User.objects.create(full_name='Other teacher', phone='989999999', role='teacher')
+        client.force_authenticate(stranger)
+        assert client.get(url).status_code == 404
+
+    @pytest.mark.django_db
+    def test_course_leaderboard_merges_group_top_k(self, group_data):
+        homework, students, teacher = group_data['homework'], group_data['students'], group_data['teacher']
+        other_group = Group.objects.create(name='G-2', teacher=teacher, course=group_data['group'].course)
+        other_homework = Homework.objects.create(
+            title='Loops', description='-', points=100, start_date=datetime.today().date(),
+            deadline=datetime.now() + timedelta(days=2), line_limit=50, teacher=teacher, group=other_group,
+            ai_grading_prompt='Evaluate.'
+        )
+        others = [User.objects.create(full_name=f'Other {i}', phone=f'98300000{i}', role='student',
+                                      group=other_group) for i in range(2)]
+        for student, total in zip(students, (50, 90, 70)):
+            self.grade(homework, student, total)
+        for student, total in zip(others, (80, 70)):
+            self.grade(other_homework, student, total)
+
+        top = merged_top(group_data['group'].course_id, k=4)
+        assert [(row['student'], row['rank']) for row in top] == [
+            (students[1].id, 1), (others[0].id, 2), (students[2].id, 3), (others[1].id, 3)]
+        assert merged_rank(students[0].id, group_data['group'].course_id)['rank'] == 5
+        assert len(merged_top(None, k=10)) == 5
+
+        # boshqa guruhga o'tgan talabaning eski guruhdagi qatori ham bor - u bitta talaba sifatida sanaladi
+        LeaderboardEntry.objects.create(student=others[0], group=group_data['group'], total_points=95, rank=1)
+        bump_group_version(group_data['group'].id)
+        top = merged_top(group_data['group'].course_id, k=10)
+        assert [row['student'] for row in top].count(others[0].id) == 1
+        assert top[0]['student'] == others[0].id and top[0]['total_points'] == 95
+        assert merged_rank(students[0].id, group_data['group'].course_id)['rank'] == 5
+        assert merged_rank(others[0].id, group_data['group'].course_id)['rank'] == 1
+
+    @pytest.mark.django_db
+    @override_settings(LEVEL_THRESHOLDS=(0, 100, 150))
+    def test_level_follows_graded_points(self, group_data):
+        homework, student = group_data['homework'], group_data['students'][0]
+        self.grade(homework, student, 90)
+        student.refresh_from_db()
+        assert (student.xp, student.level) == (90, 1)
+
+        grade = self.grade(homework, student, 40)
+        student.refresh_from_db()
+        assert (student.xp, student.level) == (130, 2)
+
+        User.objects.filter(pk=student.pk).update(xp=0, level=1)
+        Grade.objects.filter(pk=grade.pk).update(teacher_total=70)
+        assert [changed for _, _, changed in recompute_levels(chunk_size=2)] == [1, 0]
+        student.refresh_from_db()
+        assert (student.xp, student.level) == (160, 3)
+
+
+class TestSubmissionUpload:
+    @pytest.fixture(autouse=True)
+    def media_root(self, settings, tmp_path):
+        settings.MEDIA_ROOT = str(tmp_path)
+        return tmp_path
+
+    @pytest.fixture
+    def submission(self):
+        teacher = User.objects.create(full_name='Teacher', phone='981000000', role='teacher')
+        group = Group.objects.create(name='G-1', teacher=teacher)
+        student = User.objects.create(full_name='Student', phone='982000000', role='student', group=group)
+        homework = Homework.objects.create(
+            title='Loops', description='-', points=100, start_date=datetime.today().date(),
+            deadline=datetime.now() + timedelta(days=2), line_limit=3, teacher=teacher, group=group,
+            file_extensions='.py', ai_grading_prompt='Evaluate.'
+        )
+        submission = Submission.objects.create(homework=homework, student=student, ai_grade=0, final_grade=0,
+                                               ai_feedback='')
+        return submission
+
+    def upload(self, submission, name, content):
+        client = APIClient()
+        client.force_authenticate(submission.student)
+        return client.post(reverse('save-submission'), {
+            'file_name': name, 'submission': submission.pk, 'content': SimpleUploadedFile(name, content),
+        }, format='multipart')
+
+    def test_line_counter_matches_splitlines(self):
+        text = '\n\n  a = 1\r\n\r\nb = 2\r  \n\n'
+        for size in (1, 2, 3, len(text)):
+            counter = LineCounter()
+            for start in range(0, len(text), size):
+                counter.feed(text[start:start + size])
+            assert counter.count == len(text.strip().splitlines())
+
+    @pytest.mark.django_db
+    def test_upload_counts_lines_and_rejects_early(self, submission):
+        response = self.upload(submission, 'main.py', b'\xef\xbb\xbfprint(1)\r\n\r\nprint(2)\n')
+        assert response.status_code == 201
+        assert SubmissionFile.objects.get().line_count == 3
+
+        response = self.upload(submission, 'main.py', b'x = 1\n' * 4)
+        assert response.status_code == 400
+
+        response = self.upload(submission, 'main.txt', b'x = 1\n')
+        assert response.status_code == 400
+
+        with override_settings(SUBMISSION_MAX_UPLOAD_SIZE=4):
+            inspector = UploadInspector(line_limit=100)
+            with pytest.raises(ValidationError):
+                inspector.feed(b'x = 1\n')
+        assert SubmissionFile.objects.count() == 1
+
+    @pytest.mark.django_db
+    def test_upload_stops_reading_body_once_line_limit_is_crossed(self, submission, monkeypatch):
+        chunks = []
+        receive = UploadLimitHandler.receive_data_chunk
+        monkeypatch.setattr(UploadLimitHandler, 'receive_data_chunk',
+                            lambda handler, raw_data, start: chunks.append(start) or receive(handler, raw_data, start))
+        response = self.upload(submission, 'main.py', b'x = 1\n' * 100000)
+        assert response.status_code == 400
+        assert 'Qatorlar soni' in str(response.data['content'])
+        # 600 KB dan faqat birinchi bo'lak o'qiladi
+        assert chunks == [0]
+
+        response = self.upload(submission, 'main.txt', b'x = 1\n' * 100000)
+        assert response.status_code == 400
+        # kengaytma fayl boshlanishidayoq rad etiladi
+        assert chunks == [0]
+        assert not SubmissionFile.objects.exists()
+
+    @pytest.mark.django_db
+    def test_file_before_fields_falls_back_to_serializer_checks(self, submission, monkeypatch):
+        chunks = []
+        receive = UploadLimitHandler.receive_data_chunk
+        monkeypatch.setattr(UploadLimitHandler, 'receive_data_chunk',
+                            lambda handler, raw_data, start: chunks.append(start) or receive(handler, raw_data, start))
+        client = APIClient()
+        client.force_authenticate(submission.student)
+        # fayl maydonlardan oldin keldi: handler topshiriqni bilmaydi, butun tana o'qiladi
+        response = client.post(reverse('save-submission'), {
+            'content': SimpleUploadedFile('main.py', b'x = 1\n' * 100000), 'file_name': 'main.py',
+            'submission': submission.pk,
+        }, format='multipart')
+        assert response.status_code == 400
+        assert 'Qatorlar soni' in str(response.data['content'])
+        assert len(chunks) > 1
+        assert not SubmissionFile.objects.exists()
+
+        # Django parseri ichki ``_post`` ni ko'rsatmasa handler faqat hajmni tekshiradi
+        handler = UploadLimitHandler()
+        handler.parser = SimpleNamespace()
+        handler.new_file('content', 'main.txt', 'text/plain', None)
+        assert handler.inspector is None and handler.receive_data_chunk(b'x', 0) == b'x'
+
+    @pytest.mark.django_db
+    def test_upload_is_inspected_once_while_streaming(self, submission, monkeypatch):
+        fed = []
+        feed = UploadInspector.feed
+        monkeypatch.setattr(UploadInspector, 'feed',
+                            lambda inspector, chunk: fed.append(chunk) or feed(inspector, chunk))
+        monkeypatch.setattr(storage, 'file_digest', lambda file: pytest.fail('fayl qayta xeshlanmasligi kerak'))
+        response = self.upload(submission, 'main.py', b'print(1)\nprint(2)\n')
+        assert response.status_code == 201
+        assert fed == [b'print(1)\nprint(2)\n']
+        file = SubmissionFile.objects.get()
+        assert (file.line_count, file.size_bytes) == (2, 18)
+        assert file.sha256 == hashlib.sha256(b'print(1)\nprint(2)\n').hexdigest()
+
+    @pytest.mark.django_db
+    def test_same_content_is_stored_once(self, submission, media_root):
+        other = Submission.objects.create(homework=submission.homework, student=submission.student, ai_grade=0,
+                                          final_grade=0, ai_feedback='')
+        for target in (submission, other):
+            assert self.upload(target, 'main.py', b'print(1)\n').status_code == 201
+
+        first, second = SubmissionFile.objects.order_by('id')
+        assert first.sha256 == second.sha256 and first.content.name == second.content.name
+        assert first.size_bytes == 9
+        assert len(list((media_root / 'cas').glob('*/*'))) == 1
+        assert StoredBlob.objects.get().ref_count == 2
+
+        first.delete()
+        assert collect_garbage(timedelta(0)) == (0, 0)
+        second.delete()
+        assert StoredBlob.objects.get().ref_count == 0
+        assert collect_garbage(timedelta(0)) == (1, 9)
+        assert not StoredBlob.objects.exists()
+        assert not list((media_root / 'cas').glob('*/*'))
+
+    @pytest.mark.django_db
+    def test_blob_survives_gc_between_write_and_count(self, submission, media_root, monkeypatch):
+        import apps.signals
+        assert self.upload(submission, 'main.py', b'print(1)\n').status_code == 201
+        file = SubmissionFile.objects.get()
+        file.delete()
+        StoredBlob.objects.update(updated_at=now() - timedelta(days=1))
+
+        # fayl diskda bor deb yozilmadi, hisoblashdan oldin GC uni o'chirib ulguradi
+        retain = apps.signals.retain_blobs
+        monkeypatch.setattr(apps.signals, 'retain_blobs', lambda files: (collect_garbage(), retain(files)))
+        assert self.upload(submission, 'main.py', b'print(1)\n').status_code == 201
+        file = SubmissionFile.objects.get()
+        assert StoredBlob.objects.get().ref_count == 1
+        assert file.content.open('rb').read() == b'print(1)\n'
+        file.content.close()
+
+        # kontent almashtirilsa yangi hash hisoblanadi va hisoblagich ko'chadi
+        file.content = SimpleUploadedFile('main.py', b'print(2)\n')
+        file.save()
+        assert file.sha256 == hashlib.sha256(b'print(2)\n').hexdigest() and file.content.name.endswith(file.sha256)
+        assert dict(StoredBlob.objects.values_list('sha256', 'ref_count')) == {
+            hashlib.sha256(b'print(1)\n').hexdigest(): 0, file.sha256: 1}
+
+    @pytest.mark.django_db
+    def test_whole_submission_in_one_request(self, submission, django_assert_max_num_queries):
+        homework, student = submission.homework, submission.student
+        client = APIClient()
+        client.force_authenticate(student)
+        files = [SimpleUploadedFile(f'part{i}.py', f'x = {i}\n'.encode()) for i in range(20)]
+        with django_assert_max_num_queries(15):
+            response = client.post(reverse('save-submission-bulk'), {'homework': homework.pk, 'files': files},
+                                   format='multipart')
+        assert response.status_code == 201
+        assert len(response.data['files']) == 20
+        assert StoredBlob.objects.count() == 20
+
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as bundle:
+            bundle.writestr('src/', '')
+            bundle.writestr('src/main.py', 'print(1)\nprint(2)\n')
+            bundle.writestr('src/util.py', 'x = 1\n')
+        archive.seek(0)
+        response = client.post(reverse('save-submission-bulk'), {
+            'homework': homework.pk, 'archive': SimpleUploadedFile('project.zip', archive.read()),
+        }, format='multipart')
+        assert response.status_code == 201
+        assert sorted((f.file_name, f.line_count) for f in SubmissionFile.objects.filter(
+            submission_id=Submission.objects.latest('id').pk)) == [('src/main.py', 2), ('src/util.py', 1)]
+
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode='w:gz') as bundle:
+            for name, data in (('ok.py', b'x = 1\n'), ('../evil.py', b'x = 1\n')):
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                bundle.addfile(info, io.BytesIO(data))
+        archive.seek(0)
+        submissions = Submission.objects.count()
+        response = client.post(reverse('save-submission-bulk'), {
+            'homework': homework.pk, 'archive': SimpleUploadedFile('project.tar.gz', archive.read()),
+        }, format='multipart')
+        assert response.status_code == 400
+        assert Submission.objects.count() == submissions
+
+        # 11-a'zo limitdan oshadi: oldingi 10 tasi allaqachon yozilgan, hisobdan chiqariladi
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as bundle:
+            for i in range(10):
+                bundle.writestr(f'ok{i}.py', f'y = {i}\n')
+            bundle.writestr('big.py', 'x = 1\n' * 4)
+        archive.seek(0)
+        blobs = StoredBlob.objects.count()
+        response = client.post(reverse('save-submission-bulk'), {
+            'homework': homework.pk, 'archive': SimpleUploadedFile('project.zip', archive.read()),
+        }, format='multipart')
+        assert response.status_code == 400
+        assert Submission.objects.count() == submissions
+        digests = [hashlib.sha256(f'y = {i}\n'.encode()).hexdigest() for i in range(10)]
+        assert StoredBlob.objects.count() == blobs + 10
+        assert set(StoredBlob.objects.filter(sha256__in=digests).values_list('ref_count', flat=True)) == {0}
+
+    @pytest.mark.django_db
+    def test_download_all_streams_zip(self, submission, django_assert_num_queries):
+        self.upload(submission, 'main.py', b'print(1)\n')
+        self.upload(submission, 'util.py', b'x = 1\n')
+        teacher = submission.homework.teacher
+        client = APIClient()
+        client.force_authenticate(teacher)
+
+        response = client.get(reverse('teacher-homework-download', args=[submission.homework.pk]))
+        assert response.status_code == 200 and response['Content-Type'] == 'application/zip'
+        with django_assert_num_queries(0):
+            data = b''.join(response.streaming_content)
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            prefix = f'Student ({submission.student_id})/submission-{submission.pk}'
+            assert sorted(archive.namelist()) == [f'{prefix}/main.py', f'{prefix}/util.py']
+            assert archive.read(f'{prefix}/main.py') == b'print(1)\n'
+
+        response = client.get(reverse('teacher-group-download', args=[submission.homework.group_id]))
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as archive:
+            assert all(name.startswith(f'Loops ({submission.homework_id})/') for name in archive.namelist())
+
+        client.force_authenticate(User.objects.create(full_name='Other', phone='981000001', role='teacher'))
+        assert client.get(reverse('teacher-homework-download', args=[submission.homework.pk])).status_code == 404
+
+    @pytest.mark.django_db
+    def test_similarity_index_finds_renamed_copy(self, submission):
+        homework = submission.homework
+        homework.line_limit = 100
+        homework.save()
+        original = '\n'.join(f'def step_{i}(items):\n    total = 0\n    for item in items:\n'
+                             f'        total += item * {i}\n    return total' for i in range(6)).encode()
+        renamed = original.replace(b'total', b'acc').replace(b'items', b'values')
+        unrelated = b'\n'.join(b'class Shape%d:\n    def area(self):\n        return self.w * self.h + %d' % (i, i)
+                               for i in range(6))
+
+        submissions = [submission]
+        for i in range(2):
+            student = User.objects.create(full_name=f'Student {i}', phone=f'98300000{i}', role='student',
+                                          group=homework.group)
+            submissions.append(Submission.objects.create(homework=homework, student=student))
+        for target, content in zip(submissions, (original, renamed, unrelated)):
+            assert self.upload(target, 'main.py', content).status_code == 201
+        assert not SimilarityBucket.objects.exists()
+        process_pending()
+        assert SimilarityBucket.objects.count() == 3 * BANDS
+        # qayta indekslash (retry, index_similarity) bucket qatorlarini ko'paytirmaydi
+        index_files(SubmissionFile.objects.all())
+        assert SimilarityBucket.objects.count() == 3 * BANDS
+
+        matches = similar_submissions(submissions[0].pk)
+        assert [match['other_submission'] for match in matches] == [submissions[1].pk]
+        assert matches[0]['similarity'] > 0.9
+
+        client = APIClient()
+        client.force_authenticate(homework.teacher)
+        response = client.get(reverse('teacher-homework-similarity', args=[homework.pk]), {'threshold': 0.5})
+        assert [(row['submission'], row['other_submission']) for row in response.data] == \
+               [(submissions[0].pk, submissions[1].pk)]
+
+    @pytest.mark.django_db
+    def test_highlight_is_cached_by_content_hash(self, submission, monkeypatch, settings, tmp_path):
+        # LocMem keshni boshqa jarayondagi worker isita olmaydi: bosqich yaratilmaydi
+        self.upload(submission, 'main.py', b'print(1)\n')
+        assert list(SubmissionFile.objects.get().processing_tasks.values_list('stage', flat=True)) == ['similarity']
+        SubmissionFile.objects.all().delete()
+
+        settings.CACHES = {**settings.CACHES, 'highlight': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': str(tmp_path / 'cache')}}
+        self.upload(submission, 'main.py', b'def main():\n    return 1\n')
+        file = SubmissionFile.objects.get()
+        process_pending()
+        assert caches['highlight'].get(f'{file.sha256}:python:default') is not None
+
+        monkeypatch.setattr('apps.highlight.render_text', lambda *args: pytest.fail('should come from cache'))
+        client = APIClient()
+        client.force_authenticate(submission.homework.teacher)
+        response = client.get(reverse('teacher-file-highlight', args=[file.pk]), {'css': 1})
+        assert response.status_code == 200
+        assert response.data['language'] == 'python'
+        assert '<span class="k">def</span>' in response.data['html'] and '.highlight' in response.data['css']
+
+    @pytest.mark.django_db
+    def test_backfill_file_metadata_and_admin_size_filter(self, submission, media_root, client):
+        (media_root / 'old.py').write_bytes(b'print(1)\n')
+        legacy = SubmissionFile.objects.create(submission=submission, file_name='old.py', content='old.py',
+                                               line_count=1)
+        assert not StoredBlob.objects.exists()
+
+        assert [row[1:] for row in backfill_file_metadata(relocate=True)] == [(1, 1, 0)]
+        legacy.refresh_from_db()
+        assert legacy.size_bytes == 9 and legacy.content.name == f'cas/{legacy.sha256[:2]}/{legacy.sha256}'
+        assert not (media_root / 'old.py').exists()
+        assert StoredBlob.objects.get().ref_count == 1
+        assert list(backfill_file_metadata()) == []
+
+        admin = User.objects.create_superuser(phone='980000000', password='secret', full_name='Admin')
+        client.force_login(admin)
+        response = client.get(reverse('admin:apps_submissionfile_changelist'), {'size': 'tiny'})
+        assert response.status_code == 200 and b'9 B' in response.content
+        response = client.get(reverse('admin:apps_submissionfile_changelist'), {'size': 'large'})
+        assert b'old.py' not in response.content
+
+    @pytest.mark.django_db
+    def test_resumable_upload(self, submission, media_root):
+        content = 'first = 1\r\n\r\nsecond = 2 + 3\n'.encode()
+        client = APIClient()
+        client.force_authenticate(submission.student)
+        response = client.post(reverse('upload-session'), {'submission': submission.pk, 'file_name': 'main.py',
+                                                           'size': len(content)})
+        assert response.status_code == 201
+        url = reverse('upload-session-detail', args=[response.data['id']])
+
+        def patch(offset, data):
+            return client.generic('PATCH', url, data, content_type='application/offset+octet-stream',
+                                  HTTP_UPLOAD_OFFSET=str(offset))
+
+        assert patch(0, content[:11])['Upload-Offset'] == '11'
+        resumable._hashers.clear()  # keyingi bo'lak boshqa workerga tushgandek
+        response = patch(5, content[11:])
+        assert response.status_code == 409 and response['Upload-Offset'] == '11'
+        assert patch(11, content[11:20])['Upload-Offset'] == '20'
+        assert client.head(url)['Upload-Offset'] == '20'
+        assert client.post(f'{url}finalize/').status_code == 400
+        assert patch(20, content[20:]).status_code == 204
+
+        response = client.post(f'{url}finalize/')
+        assert response.status_code == 201
+        file = SubmissionFile.objects.get()
+        assert (file.line_count, file.size_bytes) == (3, len(content))
+        assert file.sha256 == hashlib.sha256(content).hexdigest()
+        assert file.content.read() == content
+        assert not UploadSession.objects.exists() and not list((media_root / 'uploads').iterdir())
+
+        response = client.post(reverse('upload-session'), {'submission': submission.pk, 'file_name': 'big.py',
+                                                           'size': 100})
+        url = reverse('upload-session-detail', args=[response.data['id']])
+        assert patch(0, b'x = 1\n' * 4).status_code == 400
+        assert not UploadSession.objects.exists()
+
+    @pytest.mark.django_db
+    def test_concurrent_finalize_creates_one_file(self, submission, media_root):
+        content = b'print(1)\n'
+        session = UploadSession.objects.create(submission=submission, student=submission.student,
+                                               file_name='main.py', size=len(content))
+        resumable.append_chunk(session.pk, 0, io.BytesIO(content))
+        # ikkala so'rov ham sessiyani qulfdan oldin o'qib bo'lgan
+        first, second = UploadSession.objects.get(), UploadSession.objects.get()
+        assert resumable.finalize(first).sha256 == hashlib.sha256(content).hexdigest()
+        with pytest.raises(NotFound):
+            resumable.finalize(second)
+        assert SubmissionFile.objects.count() == 1
+
+    @pytest.mark.django_db
+    def test_stale_rows_that_kill_their_worker_fail_after_max_attempts(self, submission, settings):
+        settings.SUBMISSION_PIPELINE = {'STAGES': {'similarity': True, 'highlight': False}, 'MAX_ATTEMPTS': 2}
+        settings.AI_GRADING = {'MAX_ATTEMPTS': 2, 'CACHE': None}
+        assert self.upload(submission, 'main.py', b'print(1)\n').status_code == 201
+        enqueue_grading([submission.pk])
+        task, job = ProcessingTask.objects.get(), GradingJob.objects.get()
+        current = now()
+        for attempt in (1, 2):
+            # worker vazifani oldi va jarayon bilan birga o'ldi (OOM, segfault)
+            ProcessingTask.objects.update(status='running', attempts=attempt, started_at=current - timedelta(days=1))
+            GradingJob.objects.update(status='running', attempts=attempt, started_at=current - timedelta(days=1))
+            requeue_stale(current)
+            requeue_stale_jobs(current)
+            task.refresh_from_db()
+            job.refresh_from_db()
+            expected = 'pending' if attempt == 1 else 'failed'
+            assert (task.status, job.status) == (expected, expected)
+        assert "to'xtab qoldi" in task.last_error and "to'xtab qoldi" in job.last_error
+
+    @pytest.mark.django_db
+    def test_pipeline_runs_stages_in_background_with_retries(self, submission, settings, monkeypatch):
+        calls = []
+
+        def flaky(file):
+            calls.append(file.pk)
+            if len(calls) == 1:
+                raise OSError('disk hiccup')
+
+        monkeypatch.setitem(STAGES, 'flaky', flaky)
+        settings.SUBMISSION_PIPELINE = {'STAGES': {'similarity': True, 'highlight': False}, 'RETRY_DELAY': 0}
+        response = self.upload(submission, 'main.py', b'print(1)\n')
+        assert response.status_code == 201 and response.data['processing_status'] == 'pending'
+        assert calls == []
+
+        file = SubmissionFile.objects.get()
+        assert sorted(file.processing_tasks.values_list('stage', flat=True)) == ['flaky', 'similarity']
+        process_pending()
+        file.refresh_from_db()
+        assert calls == [file.pk, file.pk] and file.processing_status == 'ready'
+        flaky_task = file.processing_tasks.get(stage='flaky')
+        assert (flaky_task.status, flaky_task.attempts, flaky_task.last_error) == ('done', 2, 'OSError: disk hiccup')
+        assert {row['stage']: row['done'] for row in pipeline_stats()} == {'flaky': 1, 'similarity': 1}
+
+    @pytest.mark.django_db
+    def test_pipeline_survives_file_deleted_while_task_runs(self, submission, settings, monkeypatch):
+        monkeypatch.setitem(STAGES, 'vanish', lambda file: SubmissionFile.objects.filter(pk=file.pk).delete())
+        settings.SUBMISSION_PIPELINE = {'STAGES': {'similarity': False, 'highlight': False}}
+        self.upload(submission, 'main.py', b'print(1)\n')
+        assert process_pending() == 1
+        assert not SubmissionFile.objects.exists() and not ProcessingTask.objects.exists()
+
+    @pytest.mark.django_db
+    def test_grading_worker_runs_backend_calls_concurrently(self, submission, settings):
+        settings.AI_GRADING = {'CONCURRENCY': 4, 'RETRY_DELAY': 0, 'MAX_ATTEMPTS': 3, 'CACHE': None,
+                               'BATCH': {'MAX_SUBMISSIONS': 1}}
+        self.upload(submission, 'main.py', b'print(1)\n')
+        submissions = [submission] + [Submission.objects.create(homework=submission.homework,
+                                                                student=submission.student) for _ in range(5)]
+        assert enqueue_grading([item.pk for item in submissions]) == 6
+        assert enqueue_grading([submission.pk]) == 0
+
+        class Backend(FakeGradingBackend):
+            active = peak = 0
+            lock = threading.Lock()
+            calls = []
+
+            def grade(self, request):
+                with self.lock:
+                    self.calls.append(request.submission_id)
+                    first = self.calls.count(request.submission_id) == 1
+                    Backend.active += 1
+                    Backend.peak = max(Backend.peak, Backend.active)
+                try:
+                    if request.submission_id == submissions[1].pk and first:
+                        raise RetryableGradingError('429')
+                    if request.submission_id == submissions[2].pk:
+                        return parse_result('not json')
+                    return super().grade(request)
+                finally:
+                    with self.lock:
+                        Backend.active -= 1
+
+        Grade.objects.create(submission=submission, ai_task_completeness=0, ai_code_quality=0, ai_correctness=0,
+                             ai_total=0, teacher_total=90)
+        started = time.perf_counter()
+        stats = GradingWorker(backend=Backend(latency=0.1)).run(once=True)
+        assert time.perf_counter() - started < 0.6 and Backend.peak == 4
+        assert (stats['done'], stats['failed'], stats['retried']) == (5, 1, 1)
+
+        submission.refresh_from_db()
+        grade = submission.grades.get()
+        assert grade.teacher_total == 90 and grade.ai_feedback == '1 ta fayl tekshirildi.'
+        assert submission.ai_grade == round(grade.ai_total) and 50 <= grade.ai_total <= 100
+        failed = GradingJob.objects.get(status='failed')
+        assert failed.submission_id == submissions[2].pk and failed.attempts == 1
+        assert GradingJob.objects.get(submission=submissions[1]).attempts == 2
+        assert parse_result('```json\n{"task_completeness": 80, "code_quality": 70, "correctness": 90}\n```')[
+                   'correctness'] == 90
+
+    @pytest.mark.django_db
+    def test_grading_cache_skips_model_for_identical_content(self, submission, settings):
+        settings.AI_GRADING = {'RETRY_DELAY': 0, 'BATCH': {'MAX_SUBMISSIONS': 1}}
+        caches['grading'].clear()
+        copy, other = [Submission.objects.create(homework=submission.homework, student=submission.student)
+                       for _ in range(2)]
+        self.upload(submission, 'main.py', b'print(1)\n')
+        self.upload(copy, 'solution.py', b'print(1)\n')
+        self.upload(other, 'main.py', b'print(2)\n')
+
+        class Backend(FakeGradingBackend):
+            calls = 0
+
+            def grade(self, request):
+                Backend.calls += 1
+                return super().grade(request)
+
+        def run():
+            return GradingWorker(backend=Backend(latency=0.05)).run(once=True)
+
+        enqueue_grading([submission.pk, copy.pk, other.pk])
+        assert run()['cache_hits'] == 1 and Backend.calls == 2
+        assert submission.grades.get().ai_total == copy.grades.get().ai_total
+
+        enqueue_grading([submission.pk])
+        assert run()['cache_hits'] == 1 and Backend.calls == 2
+        enqueue_grading([submission.pk], use_cache=False)
+        assert run()['cache_hits'] == 0 and Backend.calls == 3
+        stats = grading_stats()
+        assert (stats['cache_hits'], stats['cache_misses']) == (2, 3) and stats['saved_ms'] >= 2 * 50
+
+    @pytest.mark.django_db
+    def test_grading_packs_submissions_into_batches(self, submission, settings):
+        settings.AI_GRADING = {'CONCURRENCY': 2, 'CACHE': None,
+                               'BATCH': {'MAX_SUBMISSIONS': 3, 'MAX_TOKENS': 10_000, 'RESPONSE_TOKENS': 0}}
+        submissions = [submission] + [Submission.objects.create(homework=submission.homework,
+                                                                student=submission.student) for _ in range(4)]
+        for number, item in enumerate(submissions):
+            self.upload(item, 'main.py', f'print({number})\n'.encode())
+
+        class Backend(FakeGradingBackend):
+            calls = []
+
+            def grade(self, request):
+                self.calls.append(1)
+                return super().grade(request)
+
+            def grade_batch(self, requests):
+                # model bittasini tushirib qoldiradi - u alohida baholanishi kerak
+                self.calls.append(len(requests))
+                results = super().grade_batch(requests)
+                del results[requests[0].submission_id]
+                return results
+
+        enqueue_grading([item.pk for item in submissions])
+        stats = GradingWorker(backend=Backend()).run(once=True)
+        assert sorted(Backend.calls) == [1, 1, 2, 3]
+        assert (stats['done'], stats['batched'], stats['batch_fallbacks']) == (5, 3, 2)
+        assert Grade.objects.count() == 5 and not Submission.objects.filter(ai_grade__isnull=True).exists()
+
+        jobs = list(GradingJob.objects.select_related('submission__homework').prefetch_related('submission__files'))
+        entries = [(job, build_request(job.submission)) for job in jobs]
+        assert [len(batch) for batch in pack_batches(entries, 10, 10_000)] == [5]
+        assert [len(batch) for batch in pack_batches(entries, 10, 200)] == [1] * 5
+        reply = '```json\n{"results": [{"submission": 7, "task_completeness": 90, "code_quality": 80, ' \
+                '"correctness": 70}, {"submission": 8, "correctness": "bad"}, {"submission": 99}]}\n```'
+        requests = [entry[1]._replace(submission_id=number) for number, entry in zip((7, 8), entries)]
+        assert list(parse_batch_result(reply, requests)) == [7]
+
+    @pytest.mark.django_db
+    def test_grading_queue_shares_between_groups_by_deadline(self, submission, settings):
+        settings.AI_GRADING = {'SCHEDULING': {'SHARE_COST': 60}}
+        big = submission.homework
+        teacher = User.objects.create(full_name='Teacher 2', phone='983000000', role='teacher')
+        group = Group.objects.create(name='G-2', teacher=teacher)
+        student = User.objects.create(full_name='Student 2', phone='984000000', role='student', group=group)
+        small = Homework.objects.create(title='Loops', description='-', points=100, start_date=big.start_date,
+                                        deadline=big.deadline, line_limit=3, teacher=teacher, group=group,
+                                        ai_grading_prompt='Evaluate.')
+        crowd = [submission] + [Submission.objects.create(homework=big, student=submission.student) for _ in range(5)]
+        late = [Submission.objects.create(homework=small, student=student) for _ in range(2)]
+        enqueue_grading([item.pk for item in crowd])
+        enqueue_grading([item.pk for item in late])
+
+        def groups(ids):
+            return [GradingJob.objects.get(pk=job_id).group_id for job_id in ids]
+
+        # katta guruh navbatni band qilmaydi: navbat bilan
+        assert groups(pick_jobs(4)) == [big.group_id, group.pk, big.group_id, group.pk]
+        # o'qituvchi so'ragan qayta baholash oldinga o'tadi
+        enqueue_grading([crowd[-1].pk], regrade=True)
+        assert GradingJob.objects.get(pk=pick_jobs(1)[0]).submission_id == crowd[-1].pk
+        # kichik guruh deadline'i ertaroq bo'lsa u birinchi
+        small.deadline = big.deadline - timedelta(days=2)
+        small.save()
+        assert groups(pick_jobs(3)) == [group.pk, group.pk, big.group_id]
+
+        claimed = claim_jobs(3)
+        assert {job.group_id for job in claimed} == {group.pk, big.group_id}
+        stats = {row['group']: row for row in queue_stats()}
+        assert (stats[big.group_id]['pending'], stats[big.group_id]['started']) == (5, 1)
+        assert stats[group.pk]['started'] == 2 and round(stats[group.pk]['share'], 2) == 0.67
+
+    @pytest.mark.django_db
+    def test_streamed_feedback_is_saved_progressively(self, submission, settings, monkeypatch):
+        settings.AI_GRADING = {'STREAM': True, 'STREAM_FLUSH_INTERVAL': 0.05, 'CACHE': None}
+        settings.AI_FEEDBACK_STREAM_INTERVAL = 0.01
+        settings.AI_FEEDBACK_STREAM_TIMEOUT = 0.05
+        self.upload(submission, 'main.py', b'print(1)\n')
+        enqueue_grading([submission.pk])
+        client = APIClient()
+        url = reverse('submission-feedback-stream', args=[submission.pk])
+        token = str(AccessToken.for_user(submission.student))
+
+        @async_to_sync
+        async def read_events(response):
+            # sync_to_async chaqiruvlari shu oqimda (test tranzaksiyasida) bajariladi
+            return b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+        class Backend(FakeGradingBackend):
+            def _scores(self, request):
+                return {**super()._scores(request), 'feedback': 'Yaxshi ish, lekin testlar yetishmaydi.'}
+
+        started, writes = time.perf_counter(), []
+        write = FeedbackDraft.write
+
+        def record(draft, text):
+            written = write(draft, text)
+            writes.append((time.perf_counter() - started, Submission.objects.get(pk=submission.pk).ai_feedback))
+            return written
+
+        monkeypatch.setattr(FeedbackDraft, 'write', record)
+        assert GradingWorker(backend=Backend(latency=0.6)).run(once=True)['done'] == 1
+        total = time.perf_counter() - started
+        submission.refresh_from_db()
+        feedback = 'Yaxshi ish, lekin testlar yetishmaydi.'
+        assert submission.ai_feedback == feedback and submission.grades.get().ai_feedback == feedback
+        assert writes[0][0] < 0.3 < total and 2 <= len(writes) < 6
+        assert all(feedback.startswith(text) for _, text in writes)
+
+        body = read_events(client.get(url, {'token': token}))
+        assert 'event: feedback' in body and f'"ai_grade":{submission.ai_grade}' in body
+        enqueue_grading([submission.pk], use_cache=False)
+        body = read_events(client.get(url, {'token': token}))
+        assert 'event: feedback' in body and 'event: done' not in body
+        assert stream_feedback('Yaxshi.\nSCO') == 'Yaxshi.\n'
+        assert parse_stream_result('Yaxshi.\nSCORES: {"task_completeness": 90, "code_quality": 80, '
+                                   '"correctness": 70}')['feedback'] == 'Yaxshi.'
+
+    @pytest.mark.django_db
+    def test_benchmark_grades_synthetic_submissions_against_fake_server(self, settings, tmp_path):
+        settings.MEDIA_ROOT = str(tmp_path)
+        settings.AI_GRADING = {'CACHE': None, 'STREAM': False, 'BATCH': {'MAX_SUBMISSIONS': 3}}
+        homework = create_benchmark_homework(12, files=2, lines=10, seed=1)
+        assert SubmissionFile.objects.filter(submission__homework=homework).count() == 24
+        with FakeModelServer(latency=0.05, error_rate=0.2, rate_limit=50, seed=1) as server:
+            report = run_benchmark(homework, server, concurrency=4, retry_delay=0)
+            assert report['done'] == 12 and report['failed'] == report['unfinished'] == 0
+            assert report['batch'] == 3 and report['batched'] > 0 and report['throughput'] > 0
+            assert report['server']['requests'] >= 4 and report['retried'] >= report['server'].get('errors', 0)
+            assert None not in (report['latency'][99], report['queue_wait'][50], report['db_write'][95])
+            assert report['model'][50] >= 0.05
+
+            streamed = create_benchmark_homework(3, seed=2)
+            report = run_benchmark(streamed, server, stream=True, retry_delay=0)
+            assert report['done'] == 3 and report['batch'] == 1
+            assert Submission.objects.filter(homework=streamed, ai_feedback__startswith='Yaxshi ish').count() == 3
+        delete_benchmark_homework(homework)
+        assert not GradingJob.objects.filter(submission__homework=homework).exists()
+        assert percentiles([3, 1, 2, 4]) == {50: 2, 95: 4, 99: 4} and percentiles([])[50] is None
+
+    @pytest.mark.django_db
+    def test_every_upload_path_queues_grading_after_commit(self, submission, settings,
+                                                          django_capture_on_commit_callbacks):
+        settings.AI_GRADING = {'AUTO_ENQUEUE': True}
+        with django_capture_on_commit_callbacks(execute=True):
+            assert self.upload(submission, 'main.py', b'print(1)\n').status_code == 201
+            assert not GradingJob.objects.exists()
+        assert list(GradingJob.objects.values_list('submission_id', flat=True)) == [submission.pk]
+
+        client = APIClient()
+        client.force_authenticate(submission.student)
+        with django_capture_on_commit_callbacks(execute=True):
+            response = client.post(reverse('save-submission-bulk'), {
+                'homework': submission.homework.pk, 'files': [SimpleUploadedFile('a.py', b'x = 1\n')],
+            }, format='multipart')
+        assert response.status_code == 201
+        assert GradingJob.objects.count() == 2
+
+    def test_grading_pause_holds_ready_calls(self):
+        worker = GradingWorker(backend=FakeGradingBackend())
+        worker._ready.append([(None, None, None)])
+        worker._paused_until = time.monotonic() + 60
+        in_flight = {}
+        worker._fill(None, in_flight)
+        assert not in_flight and len(worker._ready) == 1
@@ -0,0 +1,374 @@
+import codecs
+import re
+import tarfile
+import zipfile
+from hashlib import sha256
+from os.path import splitext
+from pathlib import PurePosixPath
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http.multipartparser import MultiPartParser as DjangoMultiPartParser, MultiPartParserError
+from rest_framework.exceptions import ValidationError, ParseError
+from rest_framework.parsers import MultiPartParser, DataAndFiles
+
+from apps.models import Homework
+
+NEWLINE = re.compile(r'\r\n|\r|\n')
+BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+
+CHUNK_SIZE = 64 * 1024
+# ko'p faylli yuklashda bir vaqtda ochiq turadigan (hisoblanib, yozilishini kutayotgan) fayllar soni
+STORE_BATCH_SIZE = 10
+# so'rov o'qilayotganda tekshiriladigan fayl maydonlari (``archive`` faqat hajm bo'yicha)
+INSPECTED_FIELDS = ('content', 'files')
+
+
+def max_upload_size():
+    return getattr(settings, 'SUBMISSION_MAX_UPLOAD_SIZE', 5 * 1024 * 1024)
+
+
+def max_files():
+    return getattr(settings, 'SUBMISSION_MAX_FILES', 50)
+
+
+def allowed_extensions(homework):
+    # '.py', 'py,txt' va '.py, .txt' ko'rinishlari ham qabul qilinadi
+    return {'.' + ext.strip().lstrip('.').lower() for ext in homework.file_extensions.split(',') if ext.strip()}
+
+
+def check_extension(file_name, homework):
+    allowed = allowed_extensions(homework)
+    extension = splitext(file_name)[1].lower()
+    if allowed and extension not in allowed:
+        raise ValidationError({'content': f"Fayl turi ruxsat etilmagan: {extension or file_name}. "
+                                          f"Ruxsat etilganlar: {', '.join(sorted(allowed))}"})
+
+
+class LineCounter:
+    """
+    Same result as ``len(text.strip().splitlines())`` for \\n, \\r\\n and \\r endings,
+    fed chunk by chunk: only the current line's "has content" flag is kept.
+    """
+
+    def __init__(self):
+        self.line = 0
+        self.first = None
+        self.last = None
+        self.current_has_content = False
+        self.pending_cr = False
+
+    def _mark(self):
+        if self.current_has_content:
+            if self.first is None:
+                self.first = self.line
+            self.last = self.line
+
+    def get_state(self):
+        return [self.line, self.first, self.last, self.current_has_content, self.pending_cr]
+
+    def set_state(self, state):
+        self.line, self.first, self.last, self.current_has_content, self.pending_cr = state
+
+    def feed(self, text):
+        if self.pending_cr and text.startswith('\n'):
+            text = text[1:]
+        if not text:
+            return
+        self.pending_cr = text.endswith('\r')
+        pieces = NEWLINE.split(text)
+        for piece in pieces[:-1]:
+            self.current_has_content = self.current_has_content or bool(piece.strip())
+            self._mark()
+            self.line += 1
+            self.current_has_content = False
+        self.current_has_content = self.current_has_content or bool(pieces[-1].strip())
+
+    @property
+    def count(self):
+        last = self.last
+        if self.current_has_content:
+            last = self.line
+        first = self.first if self.first is not None else (self.line if self.current_has_content else None)
+        return 0 if first is None else last - first + 1
+
+
+class UploadInspector:
+    """Streams an upload once: size, SHA-256, encoding and line count, aborting as soon as a limit is crossed."""
+
+    def __init__(self, line_limit=None, max_size=None, homework_id=None):
+        self.line_limit = line_limit
+        # qaysi topshiriq limitlari bilan tekshirilgani - natija faqat shu topshiriq uchun qayta ishlatiladi
+        self.homework_id = homework_id
+        self.max_size = max_size if max_size is not None else max_upload_size()
+        self.size = 0
+        self.digest = sha256()
+        self.encoding = None
+        self.decoder = None
+        self.lines = LineCounter()
+
+    def get_state(self):
+        """JSON-able progress (everything but the hash) so an upload can continue in another request."""
+        buffer, flag = self.decoder.getstate() if self.decoder else (b'', 0)
+        return {'size': self.size, 'encoding': self.encoding, 'decoder': [buffer.hex(), flag],
+                'lines': self.lines.get_state()}
+
+    def set_state(self, state):
+        self.size = state.get('size', 0)
+        self.encoding = state.get('encoding')
+        if self.encoding:
+            self.decoder = codecs.getincrementaldecoder(self.encoding)()
+            buffer, flag = state['decoder']
+            self.decoder.setstate((bytes.fromhex(buffer), flag))
+        if 'lines' in state:
+            self.lines.set_state(state['lines'])
+        return self
+
+    def _start(self, chunk):
+        self.encoding = next((encoding for bom, encoding in BOMS if chunk.startswith(bom)), 'utf-8')
+        self.decoder = codecs.getincrementaldecoder(self.encoding)()
+
+    def _decode(self, chunk, final=False):
+        try:
+            return self.decoder.decode(chunk, final)
+        except UnicodeDecodeError:
+            if self.encoding not in ('utf-8', 'utf-8-sig'):
+                raise ValidationError({'content': "Fayl kodirovkasini o'qib bo'lmadi"})
+            # UTF-8 emas: qator chegaralari ASCII bo'lgani uchun latin-1 bilan sanash davom etadi
+            pending = self.decoder.getstate()[0]
+            self.encoding = 'latin-1'
+            self.decoder = codecs.getincrementaldecoder('latin-1')()
+            return self.decoder.decode(pending + chunk, final)
+
+    def feed(self, chunk):
+        if self.decoder is None:
+            self._start(chunk)
+        self.size += len(chunk)
+        if self.max_size and self.size > self.max_size:
+            raise ValidationError({'content': f"Fayl hajmi {self.max_size} baytdan oshmasligi kerak"})
+        self.digest.update(chunk)
+        self.lines.feed(self._decode(chunk))
+        self.check_lines()
+
+    def check_lines(self):
+        if self.line_limit and self.lines.count > self.line_limit:
+            raise ValidationError({'content': f"Qatorlar soni {self.line_limit} tadan oshmasligi kerak"})
+
+    def finish(self):
+        if self.decoder is not None:
+            self.lines.feed(self._decode(b'', final=True))
+            self.check_lines()
+        return self
+
+    @property
+    def line_count(self):
+        return self.lines.count
+
+    @property
+    def sha256(self):
+        return self.digest.hexdigest()
+
+
+def inspect_upload(uploaded_file, homework=None, file_name=None):
+    if homework is not None:
+        check_extension(file_name or uploaded_file.name, homework)
+    homework_id = homework.pk if homework is not None else None
+    inspector = getattr(uploaded_file, 'inspector', None)
+    if inspector is not None and inspector.homework_id == homework_id:
+        # UploadLimitHandler so'rov kelayotgan paytda tekshirib bo'lgan - fayl qayta o'qilmaydi
+        return inspector
+    inspector = UploadInspector(line_limit=homework.line_limit if homework is not None else None,
+                                homework_id=homework_id)
+    uploaded_file.seek(0)
+    for chunk in uploaded_file.chunks():
+        inspector.feed(chunk)
+    uploaded_file.seek(0)
+    uploaded_file.inspector = inspector.finish()
+    return inspector
+
+
+def inspect_stream(stream, homework, file_name):
+    """Like ``inspect_upload`` for a read-only stream (archive member), spooling it so it can be stored."""
+    check_extension(file_name, homework)
+    inspector = UploadInspector(line_limit=homework.line_limit)
+    spool = SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+        inspector.feed(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+    return inspector.finish(), File(spool, name=file_name)
+
+
+def member_name(name):
+    parts = [part for part in PurePosixPath(name.replace('\\', '/')).parts if part not in ('/', '.')]
+    if parts and parts[0] == '__MACOSX':
+        return None
+    if not parts or '..' in parts:
+        raise ValidationError({'archive': f"Arxivdagi fayl nomi noto'g'ri: {name}"})
+    return '/'.join(parts)[-255:]
+
+
+def archive_members(archive):
+    """Yields ``(name, stream)`` for each regular file of a zip or tar(.gz/.bz2/.xz) archive, one at a time."""
+    archive.seek(0)
+    try:
+        if zipfile.is_zipfile(archive):
+            archive.seek(0)
+            with zipfile.ZipFile(archive) as bundle:
+                for info in bundle.infolist():
+                    name = None if info.is_dir() else member_name(info.filename)
+                    if name is None:
+                        continue
+                    if info.file_size > max_upload_size():
+                        raise ValidationError(
+                            {'archive': f"{name}: fayl hajmi {max_upload_size()} baytdan oshmasligi kerak"})
+                    with bundle.open(info) as stream:
+                        yield name, stream
+            return
+        archive.seek(0)
+        # 'r|*' - arxiv ketma-ket o'qiladi, butunlay ochib qo'yilmaydi
+        with tarfile.open(fileobj=archive, mode='r|*') as bundle:
+            for member in bundle:
+                name = member_name(member.name) if member.isfile() else None
+                if name is not None:
+                    yield name, bundle.extractfile(member)
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError):
+        raise ValidationError({'archive': "Arxiv zip yoki tar formatida bo'lishi kerak"})
+
+
+def inspect_files(homework, uploads=None, archive=None):
+    """
+    Yields ``(file_name, inspector, file)`` for every file of a multi-file or archive submission,
+    one at a time, so the caller can store and close each member before the next is spooled.
+    """
+    members = ((upload.name, upload) for upload in uploads) if uploads else archive_members(archive)
+    count = 0
+    for name, stream in members:
+        if count >= max_files():
+            raise ValidationError({'files': f"Fayllar soni {max_files()} tadan oshmasligi kerak"})
+        count += 1
+        if uploads:
+            yield name, inspect_upload(stream, homework, name), stream
+        else:
+            yield (name, *inspect_stream(stream, homework, name))
+    if not count:
+        raise ValidationError({'files': "Kamida bitta fayl yuborilishi kerak"})
+
+
+def upload_homework(fields):
+    """Homework of a multipart request from the ``homework``/``submission`` fields read before the file, if any."""
+    try:
+        if fields.get('homework'):
+            return Homework.objects.filter(pk=fields['homework']).first()
+        if fields.get('submission'):
+            return Homework.objects.filter(submissions__pk=fields['submission']).first()
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class UploadLimitHandler(FileUploadHandler):
+    """
+    Inspects each file while the body is still arriving and stops reading the request at the first breach.
+
+    The size is always checked. The extension and line limit need the homework, and a handler only sees the form
+    fields parsed before the file, so they are checked early only when ``homework``/``submission`` (and
+    ``file_name``) come before the file part in the body. Otherwise, or if Django's parser no longer exposes the
+    fields read so far, the handler falls back to the size check and the serializer inspects the stored file.
+    """
+
+    parser = None
+    error = None
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.homeworks = {}
+        # (maydon, inspector) - fayllar kelish tartibida, parser ularni UploadedFile'larga biriktiradi
+        self.inspected = []
+
+    def get_homework(self, fields):
+        # bir nechta fayl bitta topshiriqqa tegishli - har fayl uchun so'rov yuborilmaydi
+        key = (fields.get('homework'), fields.get('submission'))
+        if key not in self.homeworks:
+            self.homeworks[key] = upload_homework(fields)
+        return self.homeworks[key]
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        super().new_file(field_name, file_name, *args, **kwargs)
+        # Django'ning ichki atributi: yo'q bo'lsa (boshqa versiya) faqat hajm tekshiriladi
+        fields = getattr(self.parser, '_post', None) or {}
+        homework = self.get_homework(fields) if field_name in INSPECTED_FIELDS else None
+        self.received = 0
+        self.inspector = None
+        if homework is not None:
+            self.inspector = UploadInspector(line_limit=homework.line_limit, homework_id=homework.pk)
+            # ``file_name`` maydoni faqat bitta faylli yuklashda (``content``) fayl nomini almashtiradi
+            name = fields.get('file_name') if field_name == 'content' else None
+            self.check(check_extension, name or file_name, homework)
+        self.inspected.append((field_name, self.inspector))
+
+    def stop(self, error):
+        self.error = error
+        raise StopUpload(connection_reset=True)
+
+    def check(self, check, *args):
+        try:
+            return check(*args)
+        except ValidationError as error:
+            self.stop(error)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.inspector is not None:
+            self.check(self.inspector.feed, raw_data)
+            return raw_data
+        # topshiriq noma'lum (yoki arxiv) - faqat hajm tekshiriladi
+        self.received += len(raw_data)
+        if self.received > max_upload_size():
+            self.stop(ValidationError({self.field_name: f"Fayl hajmi {max_upload_size()} baytdan oshmasligi kerak"}))
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.inspector is not None:
+            self.check(self.inspector.finish)
+        return None
+
+
+def attach_inspectors(files, inspected):
+    """Hands each handler result to its ``UploadedFile`` so ``inspect_upload`` doesn't read the file again."""
+    remaining = {field_name: iter(files.getlist(field_name)) for field_name in files}
+    for field_name, inspector in inspected:
+        uploaded_file = next(remaining.get(field_name, iter(())), None)
+        if uploaded_file is not None and inspector is not None:
+            uploaded_file.inspector = inspector
+
+
+class UploadLimitMultiPartParser(MultiPartParser):
+    """``MultiPartParser`` that shows ``UploadLimitHandler`` the fields read so far and answers with its error."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context['request']
+        meta = request.META.copy()
+        meta['CONTENT_TYPE'] = media_type
+        handlers = request.upload_handlers
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            parser = DjangoMultiPartParser(meta, stream, handlers, encoding)
+            limits = [handler for handler in handlers if isinstance(handler, UploadLimitHandler)]
+            for handler in limits:
+                handler.parser = parser
+            data, files = parser.parse()
+        except MultiPartParserError as exc:
+            raise ParseError(f'Multipart form parse error - {exc}')
+        error = next((handler.error for handler in limits if handler.error is not None), None)
+        if error is not None:
+            raise error
+        for handler in limits:
+            attach_inspectors(files, handler.inspected)
+        return DataAndFiles(data, files)
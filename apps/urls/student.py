@@ -1,10 +1,23 @@
 from django.urls import path
 
 from apps.views import SubmissionCreatAPIView, SubmissionListAPIView, HomeworkListAPIView, StudentLeaderboardAPIView
+from apps.views import StudentRankAPIView, leaderboard_stream, StudentCourseLeaderboardAPIView, SubmissionUploadAPIView
+from apps.views import UploadSessionCreateAPIView, UploadSessionAPIView, UploadSessionFinalizeAPIView
+from apps.views import submission_feedback_stream
 
 urlpatterns = [
     path('save/submissions/', SubmissionCreatAPIView.as_view(), name='save-submission'),
+    path('save/submissions/bulk/', SubmissionUploadAPIView.as_view(), name='save-submission-bulk'),
+    path('save/submissions/uploads/', UploadSessionCreateAPIView.as_view(), name='upload-session'),
+    path('save/submissions/uploads/<uuid:pk>/', UploadSessionAPIView.as_view(), name='upload-session-detail'),
+    path('save/submissions/uploads/<uuid:pk>/finalize/', UploadSessionFinalizeAPIView.as_view(),
+         name='upload-session-finalize'),
     path('student/submissions/', SubmissionListAPIView.as_view(), name='submission-list'),
+    path('student/submissions/<int:pk>/feedback/stream/', submission_feedback_stream,
+         name='submission-feedback-stream'),
     path('student/homework/', HomeworkListAPIView.as_view(), name='homework-list'),
     path('student/leaderboard/', StudentLeaderboardAPIView.as_view(), name='leader-board'),
+    path('student/leaderboard/me/', StudentRankAPIView.as_view(), name='leader-board-me'),
+    path('student/leaderboard/stream/', leaderboard_stream, name='leader-board-stream'),
+    path('student/leaderboard/course/', StudentCourseLeaderboardAPIView.as_view(), name='leader-board-course'),
 ]
@@ -1,7 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from apps.views import TeacherGradeUpdateAPIView, TeacherLeaderboardAPIView
+from apps.views import TeacherGradeUpdateAPIView, TeacherLeaderboardAPIView, leaderboard_stream
+from apps.views import TeacherHomeworkLeaderboardAPIView, TeacherHomeworkDownloadAPIView, TeacherGroupDownloadAPIView
+from apps.views import TeacherSimilarSubmissionsAPIView, TeacherHomeworkSimilarityAPIView, TeacherFileHighlightAPIView
+from apps.views import TeacherHomeworkGradeAPIView, submission_feedback_stream
 from apps.views import TeacherModelViewSet, TeacherGroupListAPIView, TeacherSubmissionsListAPIView
 
 router = DefaultRouter()
@@ -12,6 +15,20 @@ urlpatterns = [
     path('teacher/groups/', TeacherGroupListAPIView.as_view(), name='teacher-groups'),
     path('teacher/groups/<int:pk>/submissions/', TeacherSubmissionsListAPIView.as_view(), name='teacher-submissions'),
     path('teacher/submissions/<int:pk>/grades/', TeacherGradeUpdateAPIView.as_view(), name='teacher-grades'),
-    path('teacher/groups/<int:pk>/leaderboard/', TeacherLeaderboardAPIView.as_view(), name='teacher-groups'),
+    path('teacher/groups/<int:pk>/leaderboard/', TeacherLeaderboardAPIView.as_view(), name='teacher-leaderboard'),
+    path('teacher/groups/<int:pk>/leaderboard/stream/', leaderboard_stream, name='teacher-leaderboard-stream'),
+    path('teacher/homework/<int:pk>/leaderboard/', TeacherHomeworkLeaderboardAPIView.as_view(),
+         name='teacher-homework-leaderboard'),
+    path('teacher/homework/<int:pk>/download/', TeacherHomeworkDownloadAPIView.as_view(),
+         name='teacher-homework-download'),
+    path('teacher/groups/<int:pk>/download/', TeacherGroupDownloadAPIView.as_view(), name='teacher-group-download'),
+    path('teacher/submissions/<int:pk>/similar/', TeacherSimilarSubmissionsAPIView.as_view(),
+         name='teacher-similar-submissions'),
+    path('teacher/homework/<int:pk>/similarity/', TeacherHomeworkSimilarityAPIView.as_view(),
+         name='teacher-homework-similarity'),
+    path('teacher/homework/<int:pk>/grade/', TeacherHomeworkGradeAPIView.as_view(), name='teacher-homework-grade'),
+    path('teacher/submissions/<int:pk>/feedback/stream/', submission_feedback_stream,
+         name='teacher-submission-feedback-stream'),
+    path('teacher/files/<int:pk>/highlight/', TeacherFileHighlightAPIView.as_view(), name='teacher-file-highlight'),
     path('teachers/', include(router.urls))
 ]
@@ -0,0 +1,65 @@
+from hashlib import blake2b
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum, Max
+from django.utils.http import http_date, quote_etag
+from django.utils.timezone import now
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from apps.models import GroupVersion
+
+
+def bump_group_version(group_id):
+    if group_id is None:
+        return
+    updated = GroupVersion.objects.filter(group_id=group_id).update(version=F('version') + 1, updated_at=now())
+    if not updated:
+        try:
+            with transaction.atomic():
+                GroupVersion.objects.create(group_id=group_id, version=1, updated_at=now())
+        except IntegrityError:
+            bump_group_version(group_id)
+
+
+def group_version_stamp(group_ids=None):
+    """``(version, updated_at)`` for the given groups, or for every group when ``group_ids`` is None."""
+    versions = GroupVersion.objects.all()
+    if group_ids is not None:
+        versions = versions.filter(group_id__in=[group_id for group_id in group_ids if group_id is not None])
+    # versiyalar faqat o'sadi, shuning uchun yig'indi ham har o'zgarishda o'sadi
+    stamp = versions.aggregate(version=Sum('version'), updated_at=Max('updated_at'))
+    return stamp['version'] or 0, stamp['updated_at']
+
+
+class GroupVersionConditionalMixin:
+    """
+    Answers ``If-None-Match``/``If-Modified-Since`` with 304 from the group version
+    table alone. Views return the group ids their response depends on, and anything
+    else the response depends on that the URL doesn't show (e.g. a resolved "last month")
+    from ``get_etag_extra``.
+    """
+
+    def get_version_group_ids(self):
+        raise NotImplementedError
+
+    def get_etag_extra(self):
+        return ''
+
+    def get_etag(self, version):
+        request = self.request
+        path = blake2b(f'{request.get_full_path()}|{self.get_etag_extra()}'.encode(), digest_size=8).hexdigest()
+        return quote_etag(f'{version}-{request.user.pk}-{request.user.group_id}-{path}')
+
+    def get(self, request, *args, **kwargs):
+        version, updated_at = group_version_stamp(self.get_version_group_ids())
+        etag = self.get_etag(version)
+        last_modified = int(updated_at.timestamp()) if updated_at else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
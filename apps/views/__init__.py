@@ -1,3 +1,4 @@
 
 from apps.views.student import *
 from apps.views.teachers import *
+from apps.views.stream import *
@@ -0,0 +1,120 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse, JsonResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from apps.leaderboard import hub, format_event
+from apps.models import GradingJob, Submission
+from authenticate.models import User, Group
+
+
+def _authenticate(request):
+    # EventSource header yubora olmaydi, shuning uchun ?token= ham qabul qilinadi
+    authentication = JWTAuthentication()
+    try:
+        result = authentication.authenticate(request)
+        if result is None and request.GET.get('token'):
+            token = authentication.get_validated_token(request.GET['token'])
+            return authentication.get_user(token)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+    return result[0] if result else None
+
+
+def _can_watch(user, group_id):
+    if user.role == User.RoleType.Admin:
+        return True
+    if user.role == User.RoleType.Teacher:
+        return Group.objects.filter(pk=group_id, teacher=user).exists()
+    return user.group_id == group_id
+
+
+async def leaderboard_stream(request, pk=None):
+    """Server-sent events: one ``snapshot`` event, then coalesced ``diff`` events per tick."""
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    group_id = pk if pk is not None else user.group_id
+    if group_id is None or not await sync_to_async(_can_watch)(user, group_id):
+        return JsonResponse({'detail': 'You do not have permission to perform this action.'}, status=403)
+
+    heartbeat = getattr(settings, 'LEADERBOARD_STREAM_HEARTBEAT', 15)
+
+    async def events():
+        queue, snapshot = await hub.subscribe(group_id)
+        try:
+            yield format_event('snapshot', snapshot)
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ': ping\n\n'
+                    continue
+                yield format_event(event, data)
+        finally:
+            hub.unsubscribe(group_id, queue)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _can_read_submission(user, submission_id):
+    submissions = Submission.objects.filter(pk=submission_id)
+    if user.role == User.RoleType.Admin:
+        return submissions.exists()
+    if user.role == User.RoleType.Teacher:
+        return submissions.filter(homework__group__teacher=user).exists()
+    return submissions.filter(student=user).exists()
+
+
+def load_feedback(submission_id):
+    # avval vazifa holati: u yopilgan bo'lsa matn allaqachon oxirgisi
+    grading = GradingJob.objects.filter(submission_id=submission_id, status__in=(
+        GradingJob.Status.PENDING, GradingJob.Status.RUNNING)).values_list('status', flat=True).first()
+    row = Submission.objects.filter(pk=submission_id).values('ai_feedback', 'ai_grade').first() or {}
+    return grading, row.get('ai_feedback') or '', row.get('ai_grade')
+
+
+async def submission_feedback_stream(request, pk):
+    """
+    Server-sent events while a submission is graded: ``feedback`` events carry the text from
+    ``offset`` on (offset 0 replaces it), ``done`` carries the AI grade and ends the stream.
+    """
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    if not await sync_to_async(_can_read_submission)(user, pk):
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+
+    interval = getattr(settings, 'AI_FEEDBACK_STREAM_INTERVAL', 0.25)
+    heartbeat = getattr(settings, 'LEADERBOARD_STREAM_HEARTBEAT', 15)
+    timeout = getattr(settings, 'AI_FEEDBACK_STREAM_TIMEOUT', 600)
+    load = sync_to_async(load_feedback)
+
+    async def events():
+        sent, quiet, waited = '', 0.0, 0.0
+        while waited < timeout:
+            grading, text, grade = await load(pk)
+            if text != sent:
+                offset = len(sent) if text.startswith(sent) else 0
+                yield format_event('feedback', {'offset': offset, 'text': text[offset:]})
+                sent, quiet = text, 0.0
+            if grading is None:
+                yield format_event('done', {'submission': pk, 'ai_grade': grade})
+                return
+            if quiet >= heartbeat:
+                yield ': ping\n\n'
+                quiet = 0.0
+            await asyncio.sleep(interval)
+            quiet, waited = quiet + interval, waited + interval
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
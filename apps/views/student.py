@@ -1,31 +1,123 @@
 from datetime import datetime, timedelta
+from http import HTTPStatus
 
-from django.utils.timezone import now
+from django.shortcuts import get_object_or_404
+from django.utils.timezone import localdate
 from drf_spectacular.utils import extend_schema, OpenApiParameter
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import CreateAPIView, ListAPIView
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import FormParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from apps.models import Homework, Submission, Grade
-from apps.serializer import SubmissionModelSerialize, HomeworkModelSerializer, GradeModelSerializer, \
-    SubmissionFileModelSerializer
+from apps.leaderboard import get_rank_index, with_ranks, merged_top, merged_rank
+from apps.models import Homework, Submission, LeaderboardEntry, DailyGradeRollup, MonthlyGradeRollup, UploadSession
+from apps.resumable import append_chunk, finalize, cancel, OffsetMismatch
+from apps.serializer import SubmissionModelSerialize, HomeworkModelSerializer, SubmissionFileModelSerializer, \
+    SubmissionUploadSerializer, LeaderboardEntryModelSerializer, DailyGradeRollupModelSerializer, \
+    MonthlyGradeRollupModelSerializer, UploadSessionModelSerializer
+from apps.uploads import UploadLimitHandler, UploadLimitMultiPartParser
+from apps.versions import GroupVersionConditionalMixin
+from authenticate.models import User
 
 
 @extend_schema(tags=['students'])
 class SubmissionCreatAPIView(CreateAPIView):
     serializer_class = SubmissionFileModelSerializer
-    parser_classes = [MultiPartParser, FormParser]
+    parser_classes = [UploadLimitMultiPartParser, FormParser]
+
+    def initial(self, request, *args, **kwargs):
+        # limitdan oshgan fayl (hajm, kengaytma, qatorlar) butunlay qabul qilinmasdan oldin uziladi
+        request._request.upload_handlers.insert(0, UploadLimitHandler(request._request))
+        super().initial(request, *args, **kwargs)
+
+
+@extend_schema(tags=['students'])
+class SubmissionUploadAPIView(SubmissionCreatAPIView):
+    # bir so'rovda butun topshiriq: bir nechta ``files`` yoki bitta zip/tar ``archive``
+    serializer_class = SubmissionUploadSerializer
+
+
+@extend_schema(tags=['students'])
+class UploadSessionCreateAPIView(CreateAPIView):
+    serializer_class = UploadSessionModelSerializer
+
+    def perform_create(self, serializer):
+        serializer.save(student=self.request.user)
+
+
+def upload_offset_response(session, status=HTTPStatus.NO_CONTENT):
+    data = None if status == HTTPStatus.NO_CONTENT else UploadSessionModelSerializer(session).data
+    response = Response(data, status=status)
+    response['Upload-Offset'] = session.offset
+    response['Upload-Length'] = session.size
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@extend_schema(tags=['students'], parameters=[
+    OpenApiParameter(name='Upload-Offset', location=OpenApiParameter.HEADER, type=int, required=False,
+                     description="PATCH: bo'lak fayldagi qaysi baytdan boshlanishi"),
+])
+class UploadSessionAPIView(APIView):
+    # GET/HEAD - qayerdan davom etish; PATCH - keyingi bo'lak (xom baytlar); DELETE - bekor qilish
+
+    def get_session(self, pk):
+        return get_object_or_404(UploadSession, pk=pk, student=self.request.user)
+
+    def get(self, request, pk):
+        return upload_offset_response(self.get_session(pk), HTTPStatus.OK)
+
+    def patch(self, request, pk):
+        session = self.get_session(pk)
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            raise ValidationError({'Upload-Offset': "Upload-Offset sarlavhasi butun son bo'lishi kerak"})
+        try:
+            session = append_chunk(session.pk, offset, request.stream)
+        except OffsetMismatch as error:
+            session.offset = error.args[0]
+            return upload_offset_response(session, HTTPStatus.CONFLICT)
+        return upload_offset_response(session)
+
+    def delete(self, request, pk):
+        cancel(self.get_session(pk))
+        return Response(status=HTTPStatus.NO_CONTENT)
+
+
+@extend_schema(tags=['students'], request=None, responses=SubmissionFileModelSerializer)
+class UploadSessionFinalizeAPIView(APIView):
+    def post(self, request, pk):
+        session = get_object_or_404(UploadSession.objects.select_related('submission__homework'), pk=pk,
+                                    student=request.user)
+        file = finalize(session)
+        return Response(SubmissionFileModelSerializer(file).data, status=HTTPStatus.CREATED)
 
 
 @extend_schema(tags=['students'])
 class SubmissionListAPIView(ListAPIView):
     serializer_class = SubmissionModelSerialize
     queryset = Submission.objects.all()
+    pagination_ordering = ('-created_at', '-id')
 
 
 @extend_schema(tags=['students'])
-class HomeworkListAPIView(ListAPIView):
+class HomeworkListAPIView(GroupVersionConditionalMixin, ListAPIView):
     serializer_class = HomeworkModelSerializer
     queryset = Homework.objects.all()
+    pagination_ordering = ('-created_at', '-id')
+
+    def is_student(self):
+        return self.request.user.role == User.RoleType.Student
+
+    def get_version_group_ids(self):
+        return [self.request.user.group_id] if self.is_student() else None
+
+    def get_queryset(self):
+        if self.is_student():
+            return self.queryset.filter(group_id=self.request.user.group_id)
+        return self.queryset
 
 
 @extend_schema(tags=['students'], parameters=[
@@ -48,32 +140,124 @@ class HomeworkListAPIView(ListAPIView):
         type=str,
     ),
 ])
-class StudentLeaderboardAPIView(ListAPIView):
-    queryset = Grade.objects.all()
-    serializer_class = GradeModelSerializer
+class StudentLeaderboardAPIView(GroupVersionConditionalMixin, ListAPIView):
+    queryset = LeaderboardEntry.objects.all()
+    serializer_class = LeaderboardEntryModelSerializer
+    pagination_ordering = ('-total_points', 'id')
 
-    def get_queryset(self):
-        user = self.request.user
-        queryset = Grade.objects.filter(submission__student_id=user.id)
+    def get_version_group_ids(self):
+        return [self.request.user.group_id]
+
+    def get_period(self):
         monthly = self.request.query_params.get('monthly')  # '2025-06'
         day = self.request.query_params.get('day')  # '2025-06-20'
         last_month = self.request.query_params.get('last month')  # har qanday string (faqat mavjudligi)
-        if monthly:
-            year, month = map(int, monthly.split('-'))
-            start_date = datetime(year, month, 1)
-            if month == 12:
-                end_date = datetime(year + 1, 1, 1)
-            else:
-                end_date = datetime(year, month + 1, 1)
-            queryset = queryset.filter(created_at__gte=start_date, created_at__lt=end_date)
-        if day:
-            target_day = datetime.strptime(day, "%Y-%m-%d").date()
-            queryset = queryset.filter(created_at__date=target_day)
+        try:
+            if day:
+                return 'day', datetime.strptime(day, "%Y-%m-%d").date()
+            if monthly:
+                return 'month', datetime.strptime(monthly, "%Y-%m").date()
+        except ValueError:
+            raise ValidationError({'detail': "Sana formati noto'g'ri: day=YYYY-MM-DD, monthly=YYYY-MM"})
         if last_month is not None:
-            today = now().date()
-            first_day_this_month = today.replace(day=1)
-            last_month_end = first_day_this_month - timedelta(days=1)
-            last_month_start = last_month_end.replace(day=1)
-            queryset = queryset.filter(created_at__date__gte=last_month_start, created_at__date__lte=last_month_end)
+            first_day_this_month = localdate().replace(day=1)
+            return 'month', (first_day_this_month - timedelta(days=1)).replace(day=1)
+        return None, None
+
+    def get_etag_extra(self):
+        # "last month" oy almashganda boshqa oyni bildiradi, URL esa o'zgarmaydi
+        period, value = self.get_period()
+        return f'{period}:{value}' if period else ''
+
+    def get_serializer_class(self):
+        period, _ = self.get_period()
+        if period == 'day':
+            return DailyGradeRollupModelSerializer
+        if period == 'month':
+            return MonthlyGradeRollupModelSerializer
+        return LeaderboardEntryModelSerializer
+
+    def get_queryset(self):
+        group_id = self.request.user.group_id
+        period, value = self.get_period()
+        if period == 'day':
+            queryset = DailyGradeRollup.objects.filter(group_id=group_id, day=value)
+        elif period == 'month':
+            queryset = MonthlyGradeRollup.objects.filter(group_id=group_id, month=value)
+        else:
+            queryset = LeaderboardEntry.objects.filter(group_id=group_id)
+        return queryset.select_related('student').order_by('rank', 'id')
+
+
+@extend_schema(tags=['students'], parameters=[
+    OpenApiParameter(name='top', description='top K (max 100)', required=False, type=int),
+    OpenApiParameter(name='radius', description='neighbours above/below (max 25)', required=False, type=int),
+])
+class StudentRankAPIView(GroupVersionConditionalMixin, APIView):
+    max_top = 100
+    max_radius = 25
+
+    def get_version_group_ids(self):
+        return [self.request.user.group_id]
+
+    def get_int_param(self, name, default, maximum):
+        try:
+            value = int(self.request.query_params.get(name, default))
+        except ValueError:
+            value = default
+        return min(max(value, 0), maximum)
+
+    def get(self, request, *args, **kwargs):
+        group_id, student_id = request.user.group_id, request.user.id
+        top_k = self.get_int_param('top', 10, self.max_top)
+        radius = self.get_int_param('radius', 2, self.max_radius)
+
+        index = get_rank_index()
+        score = index.score(group_id, student_id) if group_id else None
+        rank = index.rank_for_score(group_id, score) if score is not None else None
+        top = with_ranks(index.top(group_id, top_k), 1) if group_id else []
+        around = []
+        if score is not None:
+            window = index.around(group_id, student_id, radius)
+            if window:
+                around = with_ranks(window, index.rank_for_score(group_id, window[0][1]))
+
+        movement = LeaderboardEntry.objects.filter(group_id=group_id, student_id=student_id).values(
+            'daily_rank_delta', 'weekly_rank_delta').first() or {}
+        names = dict(User.objects.filter(id__in={row['student'] for row in top + around}).values_list(
+            'id', 'full_name'))
+        for row in top + around:
+            row['full_name'] = names.get(row['student'])
+
+        return Response({
+            'group': group_id,
+            'student': student_id,
+            'rank': rank,
+            'total_points': score,
+            'daily_rank_delta': movement.get('daily_rank_delta'),
+            'weekly_rank_delta': movement.get('weekly_rank_delta'),
+            'top': top,
+            'around': around,
+        })
+
+
+@extend_schema(tags=['students'], parameters=[
+    OpenApiParameter(name='top', description='top K (max 200)', required=False, type=int),
+])
+class StudentCourseLeaderboardAPIView(APIView):
+    max_top = 200
 
-        return queryset
+    def get(self, request, *args, **kwargs):
+        try:
+            top_k = min(max(int(request.query_params.get('top', 50)), 1), self.max_top)
+        except ValueError:
+            top_k = 50
+        group = request.user.group
+        course_id = group.course_id if group else None
+        if course_id is None:
+            return Response({'course': None, 'top': [], 'me': None})
+        return Response({
+            'course': course_id,
+            'top': merged_top(course_id, top_k),
+            'me': merged_rank(request.user.id, course_id),
+        })
@@ -1,13 +1,25 @@
 from http import HTTPStatus
 
-from drf_spectacular.utils import extend_schema
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import ListAPIView, UpdateAPIView
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
-from apps.models import Homework, Submission, Grade
+from apps.downloads import submission_manifest, stream_zip, release_connection, homework_files, group_files, \
+    safe_name
+from apps.grading import enqueue_grading
+from apps.highlight import render_file, stylesheet
+from apps.leaderboard import homework_ranking
+from apps.models import Homework, Submission, Grade, LeaderboardEntry, SubmissionFile
 from apps.permissions import IsTeacher
-from apps.serializer import HomeworkModelSerializer, SubmissionModelSerialize, GradeModelSerializer
+from apps.similarity import similar_submissions, homework_report
+from apps.serializer import HomeworkModelSerializer, SubmissionModelSerialize, GradeModelSerializer, \
+    LeaderboardEntryModelSerializer, RankingRowSerializer
+from apps.versions import GroupVersionConditionalMixin
 from authenticate.models import Group
 from authenticate.serializer import GroupModelSerializer
 
@@ -17,6 +29,7 @@ class TeacherModelViewSet(ModelViewSet):
     queryset = Homework.objects.all()
     serializer_class = HomeworkModelSerializer
     permission_classes = [IsTeacher]
+    pagination_ordering = ('-created_at', '-id')
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -39,6 +52,7 @@ class TeacherGroupListAPIView(ListAPIView):
 class TeacherSubmissionsListAPIView(ListAPIView):
     serializer_class = SubmissionModelSerialize
     permission_classes = [IsTeacher]
+    pagination_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         group_id = self.kwargs.get('pk')
@@ -54,11 +68,122 @@ class TeacherGradeUpdateAPIView(UpdateAPIView):
 
 
 @extend_schema(tags=['teachers'])
-class TeacherLeaderboardAPIView(ListAPIView):
-    serializer_class = GradeModelSerializer
+class TeacherLeaderboardAPIView(GroupVersionConditionalMixin, ListAPIView):
+    serializer_class = LeaderboardEntryModelSerializer
     permission_classes = [IsTeacher]  # yoki IsTeacher
     lookup_field = 'pk'
+    pagination_ordering = ('-total_points', 'id')
+
+    def get_version_group_ids(self):
+        return [self.kwargs['pk']]
 
     def get_queryset(self):
         group_id = self.kwargs['pk']
-        return Grade.objects.filter(submission__homework__group_id=group_id)
+        return LeaderboardEntry.objects.filter(group_id=group_id).select_related('student').order_by('rank', 'id')
+
+
+@extend_schema(tags=['teachers'], parameters=[
+    OpenApiParameter(name='dense', description='1 = DENSE_RANK (1, 2, 2, 3)', required=False, type=bool),
+])
+class TeacherHomeworkLeaderboardAPIView(ListAPIView):
+    serializer_class = RankingRowSerializer
+    permission_classes = [IsTeacher]
+    pagination_ordering = ('position',)
+
+    def get_queryset(self):
+        homework = get_object_or_404(Homework, pk=self.kwargs['pk'], group__teacher=self.request.user)
+        dense = self.request.query_params.get('dense') in ('1', 'true')
+        return homework_ranking(homework.pk, dense=dense)
+
+
+class SubmissionArchiveMixin:
+    permission_classes = [IsTeacher]
+
+    def archive_response(self, files, filename, with_homework=False):
+        manifest = submission_manifest(files, with_homework)
+        release_connection()
+        response = StreamingHttpResponse(stream_zip(manifest), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.zip"'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+@extend_schema(tags=['teachers'], responses={(200, 'application/zip'): bytes})
+class TeacherHomeworkDownloadAPIView(SubmissionArchiveMixin, APIView):
+    def get(self, request, pk):
+        homework = get_object_or_404(Homework, pk=pk, group__teacher=request.user)
+        return self.archive_response(homework_files(homework.pk), safe_name(homework.title))
+
+
+@extend_schema(tags=['teachers'], responses={(200, 'application/zip'): bytes})
+class TeacherGroupDownloadAPIView(SubmissionArchiveMixin, APIView):
+    def get(self, request, pk):
+        group = get_object_or_404(Group, pk=pk, teacher=request.user)
+        return self.archive_response(group_files(group.pk), safe_name(group.name), with_homework=True)
+
+
+class SimilarityMixin:
+    permission_classes = [IsTeacher]
+
+    def get_threshold(self):
+        value = self.request.query_params.get('threshold')
+        if value is None:
+            return None
+        try:
+            threshold = float(value)
+        except ValueError:
+            threshold = -1
+        if not 0 <= threshold <= 1:
+            raise ValidationError({'threshold': "0 va 1 orasidagi son bo'lishi kerak"})
+        return threshold
+
+
+similarity_parameters = [
+    OpenApiParameter(name='threshold', description="Minimal o'xshashlik (0..1), standart 0.6", required=False,
+                     type=float),
+]
+
+
+@extend_schema(tags=['teachers'], parameters=similarity_parameters)
+class TeacherSimilarSubmissionsAPIView(SimilarityMixin, APIView):
+    def get(self, request, pk):
+        submission = get_object_or_404(Submission, pk=pk, homework__group__teacher=request.user)
+        return Response(similar_submissions(submission.pk, self.get_threshold()))
+
+
+@extend_schema(tags=['teachers'], parameters=similarity_parameters)
+class TeacherHomeworkSimilarityAPIView(SimilarityMixin, APIView):
+    def get(self, request, pk):
+        homework = get_object_or_404(Homework, pk=pk, group__teacher=request.user)
+        return Response(homework_report(homework.pk, self.get_threshold()))
+
+
+@extend_schema(tags=['teachers'], parameters=[
+    OpenApiParameter(name='css', description='1 = Pygments CSS ham qaytarilsin', required=False, type=bool),
+])
+class TeacherFileHighlightAPIView(APIView):
+    permission_classes = [IsTeacher]
+
+    def get(self, request, pk):
+        file = get_object_or_404(SubmissionFile.objects.select_related('submission__homework'), pk=pk,
+                                 submission__homework__group__teacher=request.user)
+        data = render_file(file)
+        if request.query_params.get('css') in ('1', 'true'):
+            data['css'] = stylesheet()
+        return Response(data)
+
+
+@extend_schema(tags=['teachers'], request=None, parameters=[
+    OpenApiParameter(name='all', description='1 = AI bahosi borlari ham qayta baholansin (keshsiz)', required=False, type=bool),
+])
+class TeacherHomeworkGradeAPIView(APIView):
+    permission_classes = [IsTeacher]
+
+    def post(self, request, pk):
+        homework = get_object_or_404(Homework, pk=pk, group__teacher=request.user)
+        submissions = homework.submissions.all()
+        regrade = request.query_params.get('all') in ('1', 'true')
+        if not regrade:
+            submissions = submissions.filter(ai_grade__isnull=True)
+        queued = enqueue_grading(submissions.values_list('id', flat=True), use_cache=not regrade, regrade=regrade)
+        return Response({'queued': queued}, status=HTTPStatus.ACCEPTED)
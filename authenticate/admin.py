@@ -95,7 +95,7 @@ class UserAdmin(BaseUserAdmin):
             'fields': ('phone', 'full_name', 'password')
         }),
         ('Rol va Guruh', {
-            'fields': ('role', 'group', 'level')
+            'fields': ('role', 'group', 'level', 'xp')
         }),
         ('Profil Ma\'lumotlari', {
             'fields': ('avatar',)
@@ -112,11 +112,12 @@ class UserAdmin(BaseUserAdmin):
 
     add_fieldsets = (
         ('Yangi Foydalanuvchi', {
-            'fields': ('phone', 'full_name', 'password1', 'password2', 'role', 'group', 'level')
+            'fields': ('phone', 'full_name', 'password1', 'password2', 'role', 'group')
         }),
     )
 
-    readonly_fields = ('last_login', 'date_joined')
+    # daraja XP'dan hisoblanadi: qo'lda kiritilgan qiymat keyingi bahoda baribir almashadi
+    readonly_fields = ('last_login', 'date_joined', 'level', 'xp')
     filter_horizontal = ('groups', 'user_permissions')
 
     def phone_display(self, obj):
@@ -1,6 +1,7 @@
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import UserManager, AbstractUser
 from django.db.models import Model, CharField, TextChoices, ForeignKey, CASCADE, DateTimeField, SET_NULL, ImageField
+from django.db.models import Index, DecimalField
 from django.db.models.fields import PositiveIntegerField
 
 
@@ -36,6 +37,9 @@ class CustomUserManager(UserManager):
 class User(AbstractUser):
     class Meta:
         verbose_name = 'User'
+        indexes = [
+            Index(fields=('date_joined', 'id')),
+        ]
 
     class RoleType(TextChoices):
         Admin = 'admin', 'Admin'
@@ -51,6 +55,7 @@ class User(AbstractUser):
     password = CharField(max_length=128, null=True, blank=True)
     role = CharField(max_length=30, choices=RoleType, default=RoleType.Student)
     level = PositiveIntegerField(default=1)
+    xp = DecimalField(max_digits=12, decimal_places=2, default=0)
     avatar = ImageField(upload_to='avatars/', null=True, blank=True)
     USERNAME_FIELD = 'phone'
     REQUIRED_FIELDS = []
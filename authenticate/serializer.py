@@ -7,8 +7,8 @@ from authenticate.models import User, Group, Sessions
 class UserProfileSerializer(ModelSerializer):
     class Meta:
         model = User
-        fields = 'id', 'full_name', 'phone', 'group', 'date_joined', 'last_login', 'role',
-        read_only_fields = 'id', 'date_joined', 'last_login',
+        fields = 'id', 'full_name', 'phone', 'group', 'date_joined', 'last_login', 'role', 'level', 'xp',
+        read_only_fields = 'id', 'date_joined', 'last_login', 'level', 'xp',
 
 
 class GroupUpdateSerializer(ModelSerializer):
@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
 from authenticate.views import StudentModelViewSet, TeacherModelViewSet, GroupModelViewSet
-from authenticate.views import TeacherUpdateAPIView, LeaderboardAPIView, StudentUpdateAPIView
+from authenticate.views import TeacherUpdateAPIView, LeaderboardAPIView, StudentUpdateAPIView, CourseLeaderboardAPIView
 
 router = DefaultRouter()
 
@@ -14,6 +14,8 @@ urlpatterns = [
     path('admin/students/group/<int:pk>/', StudentUpdateAPIView.as_view()),
     path('admin/groups/teacher/<int:pk>/', TeacherUpdateAPIView.as_view()),
     path('admin/groups/leaderboard/<int:pk>/', LeaderboardAPIView.as_view()),
+    path('admin/courses/leaderboard/<int:pk>/', CourseLeaderboardAPIView.as_view(), name='course-leaderboard'),
+    path('admin/leaderboard/', CourseLeaderboardAPIView.as_view(), name='global-leaderboard'),
 
     path('admin/', include(router.urls))
 ]
@@ -1,9 +1,13 @@
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework.generics import UpdateAPIView, ListAPIView
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
-from apps.models import Grade
-from apps.serializer import GradeModelSerializer
+from apps.models import LeaderboardEntry
+from apps.leaderboard import merged_top, merged_rank
+from apps.serializer import LeaderboardEntryModelSerializer
+from apps.versions import GroupVersionConditionalMixin
 from authenticate.models import User, Group
 from authenticate.permissions import IsAdmin
 from authenticate.serializer import UserProfileSerializer, GroupModelSerializer, GroupUpdateSerializer
@@ -14,6 +18,7 @@ class TeacherModelViewSet(ModelViewSet):
     serializer_class = UserProfileSerializer
     queryset = User.objects.all()
     permission_classes = [IsAdmin]
+    pagination_ordering = ('-date_joined', '-id')
 
 
 @extend_schema(tags=['admin-students'])
@@ -21,6 +26,7 @@ class StudentModelViewSet(ModelViewSet):
     serializer_class = UserProfileSerializer
     queryset = User.objects.all()
     permission_classes = [IsAdmin]
+    pagination_ordering = ('-date_joined', '-id')
 
     def get_queryset(self):
         query = super().get_queryset()
@@ -36,14 +42,18 @@ class GroupModelViewSet(ModelViewSet):
 
 
 @extend_schema(tags=['admin'])
-class LeaderboardAPIView(ListAPIView):
-    serializer_class = GradeModelSerializer
+class LeaderboardAPIView(GroupVersionConditionalMixin, ListAPIView):
+    serializer_class = LeaderboardEntryModelSerializer
     permission_classes = [IsAdmin]  # yoki IsTeacher
     lookup_field = 'pk'
+    pagination_ordering = ('-total_points', 'id')
+
+    def get_version_group_ids(self):
+        return [self.kwargs['pk']]
 
     def get_queryset(self):
         group_id = self.kwargs['pk']
-        return Grade.objects.filter(submission__homework__group_id=group_id)
+        return LeaderboardEntry.objects.filter(group_id=group_id).select_related('student').order_by('rank', 'id')
 
 
 @extend_schema(tags=['admin'])
@@ -60,3 +70,24 @@ class StudentUpdateAPIView(UpdateAPIView):
     serializer_class = GroupUpdateSerializer
     permission_classes = [IsAdmin]
     lookup_field = 'pk'
+
+
+@extend_schema(tags=['admin'], parameters=[
+    OpenApiParameter(name='top', description='top K (max 200)', required=False, type=int),
+    OpenApiParameter(name='student', description='exact rank of this student', required=False, type=int),
+])
+class CourseLeaderboardAPIView(APIView):
+    permission_classes = [IsAdmin]
+    max_top = 200
+
+    def get(self, request, pk=None, *args, **kwargs):
+        try:
+            top_k = min(max(int(request.query_params.get('top', 50)), 1), self.max_top)
+            student_id = int(request.query_params['student']) if 'student' in request.query_params else None
+        except ValueError:
+            top_k, student_id = 50, None
+        return Response({
+            'course': pk,
+            'top': merged_top(pk, top_k),
+            'student': merged_rank(student_id, pk) if student_id else None,
+        })
@@ -109,6 +109,70 @@ STATIC_ROOT = join(BASE_DIR, 'static')
 
 MEDIA_URL = 'media/'
 MEDIA_ROOT = join(BASE_DIR, 'media')
+SUBMISSION_MAX_UPLOAD_SIZE = int(getenv('SUBMISSION_MAX_UPLOAD_SIZE', 5 * 1024 * 1024))
+SUBMISSION_MAX_FILES = 50
+SUBMISSION_UPLOAD_SESSION_TTL = 24 * 60 * 60  # tugallanmagan yuklash shuncha turadi
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # hash bo'yicha tayyor HTML; LocMem eng kam ishlatilganlarini o'chiradi (LRU)
+    'highlight': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'highlight',
+        'TIMEOUT': 24 * 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 500, 'CULL_FREQUENCY': 4},
+    },
+    # AI baholash natijalari (apps.grading.cache); bir nechta worker bo'lsa umumiy backend (Redis, DB) kerak
+    'grading': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'grading',
+        'TIMEOUT': 30 * 24 * 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 20_000, 'CULL_FREQUENCY': 10},
+    },
+}
+HIGHLIGHT_MAX_CACHED_SIZE = 512 * 1024
+
+# Yuklashdan keyingi bosqichlar (apps.pipeline): har biri alohida yoqiladi/o'chiriladi.
+# `python manage.py process_uploads` ishlab turishi kerak; IN_PROCESS=True (faqat lokal ishlab chiqish uchun) -
+# web jarayonidagi fon oqimi bajaradi. 'highlight' faqat 'highlight' keshi umumiy (Redis, DB, fayl) bo'lsa ishlaydi.
+SUBMISSION_PIPELINE = {
+    'STAGES': {'similarity': True, 'highlight': True},
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 30,
+    'STALE_AFTER': 600,
+    'IN_PROCESS': getenv('SUBMISSION_PIPELINE_IN_PROCESS', '0') == '1',
+}
+
+# AI baholash: grading_worker buyrug'i. API kaliti bo'lmasa FakeGradingBackend (testlar, lokal ishlab chiqish)
+AI_GRADING = {
+    'BACKEND': getenv('AI_GRADING_BACKEND', 'apps.grading.backends.OpenAIGradingBackend' if getenv('AI_GRADING_API_KEY')
+                      else 'apps.grading.backends.FakeGradingBackend'),
+    'OPTIONS': {
+        'url': getenv('AI_GRADING_URL', 'https://api.openai.com/v1'),
+        'api_key': getenv('AI_GRADING_API_KEY'),
+        'model': getenv('AI_GRADING_MODEL', 'gpt-4o-mini'),
+        'timeout': 60,
+    } if getenv('AI_GRADING_API_KEY') else {},
+    'CONCURRENCY': int(getenv('AI_GRADING_CONCURRENCY', 8)),
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': 10,
+    'STALE_AFTER': 900,
+    'MAX_PROMPT_CHARS': 60_000,
+    'CACHE': 'grading',  # CACHES kaliti; None - keshsiz
+    # izoh model yozayotganda qismlab saqlanadi (talaba SSE orqali kuzatadi). Ixtiyoriy: yoqilganda BATCH
+    # ishlatilmaydi - har bir topshiriq alohida so'rov bo'ladi
+    'STREAM': getenv('AI_GRADING_STREAM', '0') == '1',
+    'STREAM_FLUSH_INTERVAL': 0.3,
+    # bitta so'rovda bir vazifaning bir nechta topshirig'i; MAX_SUBMISSIONS=1 - har biri alohida
+    'BATCH': {'MAX_SUBMISSIONS': 8, 'MAX_TOKENS': 12_000, 'RESPONSE_TOKENS': 300},
+    # navbat tartibi: deadline + yosh + qayta baholash, guruh/o'qituvchilar orasida vaznli adolatli taqsimot
+    # (GROUP_WEIGHTS / TEACHER_WEIGHTS: {id: vazn}, standart 1)
+    'SCHEDULING': {'AGE_WEIGHT': 1.0, 'REGRADE_BOOST': 24 * 60 * 60, 'SHARE_WINDOW': 60 * 60, 'SHARE_COST': 60},
+    # bulk yuklashdan keyin avtomatik navbatga qo'yish
+    'AUTO_ENQUEUE': bool(getenv('AI_GRADING_API_KEY')),
+}
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -128,7 +192,8 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.FormParser',
         'rest_framework.parsers.MultiPartParser',
         'rest_framework.parsers.FileUploadParser',
-    ]
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'apps.pagination.KeysetPagination',
 
 }
 SPECTACULAR_SETTINGS = {
@@ -177,3 +242,19 @@ SIMPLE_JWT = {
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer"}
+
+# Leaderboard
+# BACKEND: apps.leaderboard.index.DatabaseRankIndex | MemoryRankIndex | RedisRankIndex
+LEADERBOARD_RANK_INDEX = {
+    'BACKEND': getenv('LEADERBOARD_RANK_INDEX', 'apps.leaderboard.index.DatabaseRankIndex'),
+    'OPTIONS': {'url': getenv('REDIS_URL')} if getenv('LEADERBOARD_RANK_INDEX', '').endswith('RedisRankIndex') else {},
+}
+# SSE stream (faqat ASGI orqali): har tick'da guruh versiyasi bir marta tekshiriladi
+LEADERBOARD_STREAM_INTERVAL = 1.0
+LEADERBOARD_STREAM_HEARTBEAT = 15
+LEADERBOARD_STREAM_LIMIT = 500
+# AI izohi oqimi (student/submissions/<pk>/feedback/stream/): worker STREAM_FLUSH_INTERVAL'da yozadi
+AI_FEEDBACK_STREAM_INTERVAL = 0.25
+AI_FEEDBACK_STREAM_TIMEOUT = 600
+LEADERBOARD_WEEKLY_SNAPSHOT_WEEKDAY = 0  # dushanba
+LEADERBOARD_MERGED_CACHE_TIMEOUT = 300
@@ -20,3 +20,12 @@ def admin(c):
 def apps(c):
     c.run("python manage.py startapp apps")
 
+
+@task
+def snapshot(c):
+    c.run("python manage.py snapshot_leaderboards")
+
+
+@task
+def bench(c):
+    c.run("python manage.py benchmark_grading")